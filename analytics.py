@@ -0,0 +1,149 @@
+"""
+Time-series and cohort analytics over a doctor's reports.
+
+All of a doctor's report rows (patient, disease, upload date) are loaded with one query
+into a pandas DataFrame, and every aggregate is computed on whole columns: uploads per
+disease per week or month, new diagnoses (a patient's first report for a disease) per
+period, and how many patients share each pair of diseases. The frame and the results
+computed from it are cached per doctor until the doctor's data version moves.
+
+pandas and numpy are imported on first use, so workers that never serve analytics do not
+pay for loading them.
+"""
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List
+from sqlalchemy import select
+from app import db
+from models import MedicalReport, DoctorAccess
+from data_access import VersionedCache
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+PERIODS = ('week', 'month')
+DEFAULT_TOP_DISEASES = 10
+MAX_TOP_DISEASES = 50
+DEFAULT_TOP_PAIRS = 20
+
+# Number of doctors whose analytics are kept in memory per worker process
+ANALYTICS_CACHE_SIZE = 64
+
+
+def load_report_frame(doctor_id: int) -> pd.DataFrame:
+    """patient_id, disease and upload_date of every report the doctor can see, in one query."""
+    import numpy as np
+    import pandas as pd
+    # Rows are fetched straight from the DBAPI cursor, skipping per-row Result processing; dates
+    # come back in the driver's own form (ISO strings on SQLite) and pandas parses them in one call
+    result = db.session.connection().execute(
+        select(MedicalReport.patient_id, MedicalReport.disease_name, MedicalReport.upload_date).join(
+            DoctorAccess, DoctorAccess.patient_id == MedicalReport.patient_id
+        ).where(DoctorAccess.doctor_id == doctor_id)
+    )
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    frame = pd.DataFrame.from_records(rows, columns=['patient_id', 'disease', 'upload_date'], nrows=len(rows))
+    return frame.astype({'patient_id': np.int64, 'disease': 'category'}).assign(
+        upload_date=pd.to_datetime(frame['upload_date'], format='ISO8601', errors='coerce')
+    )
+
+
+def period_start(dates: pd.Series, period: str) -> np.ndarray:
+    """First day of the week (Monday) or month containing each date, as datetime64[D]."""
+    import numpy as np
+    days = dates.to_numpy(dtype='datetime64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    # 1970-01-01 was a Thursday, so Monday-based weekdays are (day number + 3) % 7
+    day_numbers = days.astype(np.int64)
+    return (day_numbers - (day_numbers + 3) % 7).astype('datetime64[D]')
+
+
+class DoctorAnalytics:
+    """Vectorized aggregates over one doctor's report frame; each result is computed once."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.dropna(subset=['upload_date'])
+        self._results: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _memoize(self, key: tuple, compute):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def top_diseases(self, top: int) -> List[str]:
+        counts = self.frame['disease'].value_counts()
+        return [str(disease) for disease in counts[counts > 0].index[:top]]
+
+    def _series(self, frame: pd.DataFrame, period: str, diseases: List[str]) -> Dict[str, Any]:
+        """Counts per disease per period, as aligned lists that chart libraries take directly."""
+        import pandas as pd
+        frame = frame[frame['disease'].isin(diseases)]
+        if frame.empty:
+            return {'periods': [], 'series': {}}
+        counts = pd.crosstab(period_start(frame['upload_date'], period),
+                             frame['disease'].cat.remove_unused_categories())
+        # Periods without any report still get a zero so the x axis is continuous
+        step = 'MS' if period == 'month' else 'W-MON'
+        counts = counts.reindex(pd.date_range(counts.index.min(), counts.index.max(), freq=step), fill_value=0)
+        return {
+            'periods': [day.date().isoformat() for day in counts.index],
+            'series': {disease: counts[disease].astype(int).tolist() for disease in diseases if disease in counts}
+        }
+
+    def uploads(self, period: str, top: int = DEFAULT_TOP_DISEASES) -> Dict[str, Any]:
+        return self._memoize(('uploads', period, top),
+                             lambda: self._series(self.frame, period, self.top_diseases(top)))
+
+    def new_diagnoses(self, period: str, top: int = DEFAULT_TOP_DISEASES) -> Dict[str, Any]:
+        """Patients whose first report for a disease falls in each period."""
+        def compute():
+            first = self.frame.groupby(['patient_id', 'disease'], observed=True, as_index=False)['upload_date'].min()
+            first['disease'] = first['disease'].astype(self.frame['disease'].dtype)
+            return self._series(first, period, self.top_diseases(top))
+        return self._memoize(('new_diagnoses', period, top), compute)
+
+    def co_occurrence(self, top: int = DEFAULT_TOP_PAIRS) -> List[Dict[str, Any]]:
+        """Disease pairs ranked by the number of patients with reports for both."""
+        def compute():
+            pairs = self.frame[['patient_id']].assign(code=self.frame['disease'].cat.codes).drop_duplicates()
+            joined = pairs.merge(pairs, on='patient_id')
+            joined = joined[joined['code_x'] < joined['code_y']]
+            counts = joined.groupby(['code_x', 'code_y']).size().nlargest(top)
+            categories = self.frame['disease'].cat.categories
+            return [
+                {'diseases': [str(categories[a]), str(categories[b])], 'patients': int(count)}
+                for (a, b), count in counts.items()
+            ]
+        return self._memoize(('co_occurrence', top), compute)
+
+    def summary(self, period: str, top: int = DEFAULT_TOP_DISEASES) -> Dict[str, Any]:
+        return {
+            'period': period,
+            'total_reports': len(self.frame),
+            'total_patients': int(self.frame['patient_id'].nunique()),
+            'uploads': self.uploads(period, top),
+            'new_diagnoses': self.new_diagnoses(period, top),
+            'co_occurrence': self.co_occurrence()
+        }
+
+
+_analytics_cache = VersionedCache(ANALYTICS_CACHE_SIZE)
+
+
+def get_doctor_analytics(doctor_id: int) -> DoctorAnalytics:
+    """Cached analytics for a doctor, rebuilt only when the doctor's data version has moved."""
+    return _analytics_cache.get(doctor_id, lambda: DoctorAnalytics(load_report_frame(doctor_id)))
+
+
+def clear_analytics_cache() -> None:
+    _analytics_cache.clear()
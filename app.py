@@ -1,6 +1,6 @@
 import os
 import logging
-from flask import Flask
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
@@ -14,42 +14,69 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 login_manager = LoginManager()
-
-# create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "fallback-secret-key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure file uploads
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///medical_reports.db"
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# initialize extensions
-db.init_app(app)
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
-# Import models and routes only after initializing app and extensions to avoid circular imports
-from models import *  # noqa: F401, E402
-from routes import *  # noqa: F401, E402
-
-# Create uploads directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    from authz_cache import load_user_cached
+    return load_user_cached(int(user_id))
+
+
+def get_setting(name: str, default=None):
+    """A setting from the app config, else the environment variable of the same name."""
+    return current_app.config.get(name, os.getenv(name, default))
+
+
+def create_app(config=None):
+    """
+    Build a configured app. Nothing here touches the database: create the schema with
+    `flask init-db`, and apply later schema changes with `flask migrate`.
+    """
+    # .env is read here rather than at import so settings below can come from it
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "fallback-secret-key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure file uploads
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+
+    # configure the database (DATABASE_URL selects SQLite or PostgreSQL, see database.py)
+    from database import get_database_url, get_engine_options
+    app.config["SQLALCHEMY_DATABASE_URI"] = get_database_url()
+    app.config.update(config or {})
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", get_engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    # Live dashboard updates keep a worker thread per open dashboard, so they need threaded
+    # or async workers and are off unless LIVE_UPDATES=1
+    app.config.setdefault('LIVE_UPDATES', os.getenv('LIVE_UPDATES', '').lower() in ('1', 'true', 'yes'))
+
+    # initialize extensions
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Models and routes import `db` from this module, so they are loaded once it exists
+    import models  # noqa: F401
+    from routes import init_routes
+    init_routes(app)
+
+    from migrations import init_db_command, migrate_command
+    from bulk_import import import_reports_command
+    from report_processing import process_reports_command
+    for command in (init_db_command, migrate_command, import_reports_command, process_reports_command):
+        app.cli.add_command(command)
+
+    # Per-endpoint latency, SQL and status metrics, served at /metrics
+    from metrics import init_metrics
+    init_metrics(app)
+    # Opt-in per-request SQL profiling and N+1 warnings (SQL_PROFILING=1 or debug mode)
+    from sql_profiler import init_sql_profiler
+    init_sql_profiler(app)
 
-with app.app_context():
-    # Create all database tables
-    db.create_all()
\ No newline at end of file
+    # Create uploads directory if it doesn't exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    return app
@@ -0,0 +1,196 @@
+"""
+Append-only audit trail of who viewed or downloaded which patient's records.
+
+Request handlers call record_access(), which only puts a tuple on a bounded in-process
+queue. A background thread per worker drains the queue and inserts the events in batches,
+one transaction per batch, so auditing adds no commit to the request. When the database
+falls behind and the queue fills, record_access() blocks for up to AUDIT_PUT_TIMEOUT
+seconds (backpressure); only if the writer stays stuck past that is an event dropped,
+and every drop is logged and counted in /metrics.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from flask import current_app
+from sqlalchemy import insert, tuple_
+from app import db, get_setting
+from models import AuditEvent, User
+from data_access import REPORTS_PER_PAGE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from metrics import inc as inc_metric
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PUT_TIMEOUT = 1.0
+FLUSH_INTERVAL_SECONDS = 0.5
+RETRY_DELAY_SECONDS = 1.0
+
+_COLUMNS = ('occurred_at', 'actor_id', 'patient_id', 'report_id', 'action', 'ip_address')
+
+
+class AuditWriter:
+    """Bounded queue of pending events and the thread that writes them in batches."""
+
+    def __init__(self, app, max_size: int, batch_size: int, put_timeout: float):
+        self.app = app
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.written = 0
+        self.generation = 0
+        self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self.thread.start()
+
+    def put(self, event: tuple) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+        try:
+            self.queue.put(event, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            inc_metric('srhs_audit_events_dropped_total')
+            self.app.logger.error(f"Audit queue full, dropped {event[4]} event of user {event[1]}")
+            return False
+
+    def _next_batch(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            generation = self.generation
+            batch = self._next_batch()
+            # Keep retrying the same batch; meanwhile the full queue pushes back on requests
+            while not self._write(batch, generation) and generation == self.generation:
+                time.sleep(RETRY_DELAY_SECONDS)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write(self, batch: list, generation: int) -> bool:
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(AuditEvent), [dict(zip(_COLUMNS, event)) for event in batch])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                if generation == self.generation:
+                    self.app.logger.error(f"Failed to write {len(batch)} audit events: {e}")
+                return False
+            finally:
+                db.session.remove()
+        self.written += len(batch)
+        return True
+
+    def discard(self) -> None:
+        """Drop every pending event, including a batch stuck retrying. Used between tests."""
+        self.generation += 1
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.queue.task_done()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every event queued so far has been written; False if timeout passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+_writer: Optional[AuditWriter] = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    """
+    This worker's writer, started on first use so forked workers each get their own thread.
+    Its thread writes through the app that was current at that first call.
+    """
+    global _writer, _writer_pid
+    if _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer_pid != os.getpid():
+                _writer = AuditWriter(
+                    current_app._get_current_object(),
+                    max_size=int(get_setting('AUDIT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)),
+                    batch_size=int(get_setting('AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+                    put_timeout=float(get_setting('AUDIT_PUT_TIMEOUT', DEFAULT_PUT_TIMEOUT))
+                )
+                _writer_pid = os.getpid()
+    return _writer
+
+
+def record_access(actor_id: int, patient_id: int, action: str, report_id: int = None,
+                  ip_address: str = None) -> bool:
+    """Queue one audit event. Returns False only if it had to be dropped."""
+    return get_audit_writer().put((datetime.utcnow(), actor_id, patient_id, report_id, action, ip_address))
+
+
+def record_accesses(actor_id: int, patient_ids: Iterable[int], action: str, ip_address: str = None) -> None:
+    """Queue one event per patient, e.g. for every patient shown on a dashboard page."""
+    writer = get_audit_writer()
+    occurred_at = datetime.utcnow()
+    for patient_id in patient_ids:
+        writer.put((occurred_at, actor_id, patient_id, None, action, ip_address))
+
+
+def flush_audit_log(timeout: Optional[float] = None) -> bool:
+    """Block until queued events are in the database, e.g. before reading the trail back."""
+    if _writer is None or _writer_pid != os.getpid():
+        return True
+    return _writer.flush(timeout)
+
+
+def discard_audit_log() -> None:
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.discard()
+
+
+def get_access_history(patient_id: int, cursor: Optional[str] = None, per_page: int = REPORTS_PER_PAGE,
+                       action: Optional[str] = None) -> Dict[str, Any]:
+    """A patient's audit events newest first, keyset-paginated like the report list."""
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    query = db.session.query(
+        AuditEvent.id, AuditEvent.occurred_at, AuditEvent.actor_id, User.full_name, User.role,
+        AuditEvent.report_id, AuditEvent.action
+    ).join(User, User.id == AuditEvent.actor_id).filter(AuditEvent.patient_id == patient_id)
+    if action:
+        query = query.filter(AuditEvent.action == action)
+    if cursor:
+        occurred_at, event_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(tuple_(AuditEvent.occurred_at, AuditEvent.id) < tuple_(occurred_at, event_id))
+
+    rows = query.order_by(AuditEvent.occurred_at.desc(), AuditEvent.id.desc()).limit(per_page + 1).all()
+    events = [{
+        'occurred_at': row.occurred_at.isoformat(),
+        'actor': {'id': row.actor_id, 'full_name': row.full_name, 'role': row.role},
+        'report_id': row.report_id,
+        'action': row.action
+    } for row in rows[:per_page]]
+    next_cursor = encode_cursor(rows[per_page - 1].occurred_at, rows[per_page - 1].id) \
+        if len(rows) > per_page else None
+    return {'events': events, 'next_cursor': next_cursor}
+
+
+# Write what is still queued when the worker shuts down, unless the database is unreachable
+atexit.register(flush_audit_log, timeout=10)
@@ -0,0 +1,160 @@
+"""
+Authorization decision cache for user identity and (doctor, patient) grants.
+
+Entries live in a per-process dict, optionally backed by a shared SQLite tier so workers
+warm each other's caches. Every grant decision is tagged with the doctor's data version,
+which grant_access and revoke_access bump in the same transaction as the grant change. A
+check reads that one row by primary key and only trusts entries carrying the current
+version, so a revoke committed by any worker on any host is seen by the next check.
+
+Cached users are not invalidated: no route changes a user row, so a cached identity is only
+as stale as AUTHZ_CACHE_TTL allows if one is edited directly in the database.
+"""
+import time
+import sqlite3
+import threading
+from typing import Optional
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+from app import db, get_setting
+from data_access import get_data_version
+
+DEFAULT_TTL_SECONDS = 300
+MAX_LOCAL_ENTRIES = 50000
+
+_local_cache = {}
+_local_lock = threading.Lock()
+_shared_tier = None
+_shared_path = None
+
+
+def clear_local_cache() -> None:
+    with _local_lock:
+        _local_cache.clear()
+
+
+class SharedAuthzTier:
+    """Cross-process decision store in a SQLite file; entries carry their generation tag."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS authz_cache ("
+                " key TEXT PRIMARY KEY, value INTEGER NOT NULL, generation TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, generation: int) -> Optional[int]:
+        row = self._connect().execute(
+            "SELECT value FROM authz_cache WHERE key = ? AND generation = ? AND expires_at >= ?",
+            (key, str(generation), time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: int, generation: int, ttl: float) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO authz_cache (key, value, generation, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, str(generation), time.time() + ttl)
+            )
+
+
+def get_shared_tier() -> Optional[SharedAuthzTier]:
+    """Shared tier configured by AUTHZ_SHARED_CACHE_PATH; disabled when unset."""
+    global _shared_tier, _shared_path
+    path = get_setting('AUTHZ_SHARED_CACHE_PATH')
+    if not path:
+        return None
+    if _shared_tier is None or _shared_path != path:
+        _shared_tier = SharedAuthzTier(path)
+        _shared_path = path
+    return _shared_tier
+
+
+def _ttl() -> float:
+    return float(current_app.config.get('AUTHZ_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+
+def _cached(key: str, generation: int, load):
+    """Look a decision up in the local then shared tier, falling back to load() on a miss."""
+    now = time.time()
+
+    with _local_lock:
+        entry = _local_cache.get(key)
+        if entry is not None and entry[1] == generation and entry[2] >= now:
+            return entry[0]
+
+    shared = get_shared_tier()
+    value = shared.get(key, generation) if shared else None
+    if value is None:
+        # The generation was read before the database, so a concurrent revoke leaves this entry stale-tagged
+        value = load()
+        if shared:
+            shared.set(key, value, generation, _ttl())
+
+    with _local_lock:
+        if len(_local_cache) >= MAX_LOCAL_ENTRIES:
+            _local_cache.clear()
+        _local_cache[key] = (value, generation, now + _ttl())
+    return value
+
+
+def has_grant(doctor_id: int, patient_id: int) -> bool:
+    """Whether the patient has granted this doctor access, usually with only the version lookup."""
+    from models import DoctorAccess
+
+    def load():
+        exists = db.session.query(
+            DoctorAccess.query.filter_by(patient_id=patient_id, doctor_id=doctor_id).exists()
+        ).scalar()
+        return 1 if exists else 0
+
+    return bool(_cached(f'grant:{doctor_id}:{patient_id}', get_data_version(doctor_id), load))
+
+
+_users = {}
+_users_lock = threading.Lock()
+
+
+def load_user_cached(user_id: int):
+    """
+    Flask-Login user loader backed by the cache. The cached row is merged into the current
+    session with load=False, which attaches it without issuing a query.
+    """
+    from models import User
+
+    now = time.time()
+    with _users_lock:
+        entry = _users.get(user_id)
+    if entry is not None and entry[1] >= now:
+        return db.session.merge(entry[0], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    # Keep a detached snapshot so later requests never reuse another request's session
+    snapshot = User(**{column.name: getattr(user, column.name) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    with _users_lock:
+        if len(_users) >= MAX_LOCAL_ENTRIES:
+            _users.clear()
+        _users[user_id] = (snapshot, now + _ttl())
+    return user
+
+
+def clear_authz_cache() -> None:
+    """Drop every cached identity and grant decision held by this process."""
+    clear_local_cache()
+    with _users_lock:
+        _users.clear()
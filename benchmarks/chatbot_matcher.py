@@ -0,0 +1,90 @@
+"""
+Per-query cost of chatbot intent and disease matching as the vocabulary grows.
+
+The legacy path is the original process_chatbot_query logic: a substring test for every
+disease keyword followed by substring tests for the intent words, so its cost grows with
+the vocabulary. The compiled path is one Aho-Corasick scan over the normalized query.
+Synthetic vocabularies extend the shipped one with generated terms.
+
+    python benchmarks/chatbot_matcher.py --sizes 5000 20000 50000 --queries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_matcher import DEFAULT_VOCABULARY_PATH, QueryMatcher, load_vocabulary  # noqa: E402
+
+QUERIES = [
+    "show patients with type 2 diabetes",
+    "how many patients have high blood pressure?",
+    "find patient ID 102",
+    "count patients with heartburn or asthma",
+    "list everyone with a malignant tumour in the last year",
+    "what is the recommended treatment for chronic kidney disease",
+    "help",
+]
+
+SYLLABLES = ['car', 'dio', 'neu', 'ro', 'path', 'itis', 'osis', 'gen', 'derm', 'hem', 'ato', 'lym', 'pho', 'ma']
+
+
+def synthetic_vocabulary(size: int, seed: int = 1) -> dict:
+    """The shipped vocabulary padded with generated one- and two-word terms up to size terms."""
+    rng = random.Random(seed)
+    vocabulary = load_vocabulary(DEFAULT_VOCABULARY_PATH)
+    terms = sum(len(synonyms) for synonyms in vocabulary.values())
+    while terms < size:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 2))]
+        vocabulary.setdefault(' '.join(words), []).append(' '.join(words))
+        terms += 1
+    return vocabulary
+
+
+def legacy_match(query: str, terms: list, role: str = 'doctor'):
+    query = query.lower().strip()
+    diseases = [term for term in terms if term in query]
+    if 'show' in query or 'find' in query or 'list' in query:
+        intent = 'search'
+    elif 'count' in query or 'how many' in query or 'total' in query:
+        intent = 'count'
+    elif 'help' in query or 'commands' in query:
+        intent = 'help'
+    else:
+        intent = None
+    return intent, diseases
+
+
+def time_per_query(func, queries, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - started) / (rounds * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 20000, 50000])
+    parser.add_argument('--queries', type=int, default=2000, help='Queries timed per run.')
+    args = parser.parse_args()
+    rounds = max(1, args.queries // len(QUERIES))
+
+    print(f"{'terms':>8} {'build ms':>9} {'legacy us/q':>12} {'compiled us/q':>14} {'speedup':>8}")
+    for size in args.sizes:
+        vocabulary = synthetic_vocabulary(size)
+        terms = [term.lower() for synonyms in vocabulary.values() for term in synonyms]
+
+        started = time.perf_counter()
+        matcher = QueryMatcher(vocabulary)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        legacy = time_per_query(lambda q: legacy_match(q, terms), QUERIES, rounds)
+        compiled = time_per_query(lambda q: matcher.match(q, 'doctor'), QUERIES, rounds)
+        print(f"{len(terms):>8} {build_ms:>9.1f} {legacy:>12.1f} {compiled:>14.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
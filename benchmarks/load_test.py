@@ -0,0 +1,279 @@
+"""
+Concurrent load test against a local server, with the LLM stubbed.
+
+Virtual users log in as accounts created by seed_data.py and loop over a weighted mix of
+requests for --seconds: doctors load their dashboard, query the chatbot, fetch analytics
+and download reports; patients load their dashboard, upload and download reports and ask
+the chatbot. Latency is recorded per endpoint and reported as p50/p95/p99 and
+requests per second. --json saves the results and --compare prints the change against a
+saved run, so performance can be compared run over run.
+
+LLM calls go to a stub OpenAI-compatible server started by this script, answering after
+--llm-latency milliseconds. Without --url the app is started too, pointed at the stub:
+
+    python benchmarks/seed_data.py --doctors 10 --patients 500
+    python benchmarks/load_test.py --users 16 --seconds 30 --json run.json
+    python benchmarks/load_test.py --server "gunicorn -w 4 --threads 4 -b 127.0.0.1:{port} main:app" \\
+        --compare run.json
+
+With --url the server must already be running with GROQ_API_URL set to the stub address
+printed at startup (and GROQ_API_KEY set to anything).
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PASSWORD = 'loadtest-password'
+DEFAULT_SERVER = f"{shlex.quote(sys.executable)} -m flask --app main run --port {{port}} --with-threads --no-reload"
+
+DISEASES = ['diabetes', 'asthma', 'hypertension', 'cancer', 'heart disease', 'migraine', 'arthritis']
+
+# (action, weight) per role
+DOCTOR_MIX = [('doctor_dashboard', 3), ('api_patients', 1), ('chatbot_search', 2), ('chatbot_llm', 1),
+              ('api_analytics', 2), ('analytics_trends', 1), ('download', 2)]
+PATIENT_MIX = [('patient_dashboard', 3), ('api_reports', 1), ('upload', 1), ('download', 2), ('chatbot_llm', 1)]
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = json.dumps({'choices': [{'message': {'content': 'Stub answer from the load test LLM.'}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_llm_stub(latency: float) -> str:
+    handler = type('Handler', (StubLLMHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command: str, llm_url: str) -> (subprocess.Popen, str):
+    port = free_port()
+    env = dict(os.environ, GROQ_API_KEY='load-test', GROQ_API_URL=llm_url, CHATBOT_CACHE_BACKEND='none')
+    process = subprocess.Popen(shlex.split(command.format(port=port)), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with status {process.returncode}: {command}")
+        try:
+            requests.get(url + '/login', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not start within 60s")
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, username: str, role: str, password: str, recorder: Recorder,
+                 rng: random.Random):
+        self.base_url = base_url
+        self.username = username
+        self.role = role
+        self.password = password
+        self.recorder = recorder
+        self.rng = rng
+        self.session = requests.Session()
+        self.report_ids = []
+
+    def request(self, name: str, method: str, path: str, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False, timeout=60,
+                                            **kwargs)
+            # Read the whole body so downloads and streamed responses are timed to the last byte
+            response.content
+            ok = response.status_code in expect
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(name, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def login(self) -> bool:
+        return self.request('login', 'POST', '/login', expect=(302,),
+                            data={'username': self.username, 'password': self.password}) is not None
+
+    def refresh_report_ids(self):
+        response = self.request('api_reports', 'GET', '/api/reports?limit=50&fields=patient_id')
+        if response is not None:
+            self.report_ids = [report['id'] for report in response.json()['reports']] or self.report_ids
+
+    def run_action(self, action: str) -> None:
+        disease = self.rng.choice(DISEASES)
+        if action in ('doctor_dashboard', 'patient_dashboard'):
+            self.request(action, 'GET', f'/{action}')
+        elif action == 'api_patients':
+            self.request(action, 'GET', '/api/patients?limit=20')
+        elif action == 'api_reports':
+            self.refresh_report_ids()
+        elif action == 'chatbot_search':
+            self.request(action, 'POST', '/chatbot', json={'query': f"show patients with {disease}"})
+        elif action == 'chatbot_llm':
+            self.request(action, 'POST', '/chatbot', json={'query': f"what are the risk factors for {disease}"})
+        elif action == 'api_analytics':
+            self.request(action, 'GET', '/api/analytics')
+        elif action == 'analytics_trends':
+            self.request(action, 'GET', f"/api/analytics/trends?period={self.rng.choice(['week', 'month'])}")
+        elif action == 'download':
+            if not self.report_ids:
+                self.refresh_report_ids()
+            if self.report_ids:
+                self.request(action, 'GET', f'/download/{self.rng.choice(self.report_ids)}')
+        elif action == 'upload':
+            content = b'%PDF-1.4\n' + self.rng.randbytes(self.rng.randint(10, 200) * 1024)
+            self.request(action, 'POST', '/upload_report', expect=(302,),
+                         data={'disease_name': disease.title(), 'description': 'Load test upload'},
+                         files={'file': ('load_test.pdf', content, 'application/pdf')})
+
+    def run(self, deadline: float) -> None:
+        if not self.login():
+            return
+        self.refresh_report_ids()
+        mix = DOCTOR_MIX if self.role == 'doctor' else PATIENT_MIX
+        actions, weights = zip(*mix)
+        while time.monotonic() < deadline:
+            self.run_action(self.rng.choices(actions, weights=weights)[0])
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    results = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        results[name] = {
+            'requests': len(values),
+            'errors': recorder.errors[name],
+            'rps': len(values) / elapsed,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+    return results
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    header = f"{'endpoint':<20} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header + ('  p95 vs baseline' if baseline else ''))
+    for name, row in results.items():
+        line = (f"{name:<20} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+        previous = (baseline or {}).get(name)
+        if previous and previous['p95_ms']:
+            line += f"  {(row['p95_ms'] / previous['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server; by default one is started.')
+    parser.add_argument('--server', default=DEFAULT_SERVER, help='Command starting the server; {port} is filled in.')
+    parser.add_argument('--users', type=int, default=8, help='Concurrent virtual users.')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--doctor-share', type=float, default=0.3, help='Fraction of virtual users that are doctors.')
+    parser.add_argument('--prefix', default='seed', help='Prefix the accounts were seeded with.')
+    parser.add_argument('--doctors', type=int, default=10, help='Seeded doctors to log in as.')
+    parser.add_argument('--patients', type=int, default=500, help='Seeded patients to log in as.')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--llm-latency', type=float, default=300, help='Stub LLM response time in ms.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='Write the results to this file.')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare p95 latency with.')
+    args = parser.parse_args()
+
+    llm_url = start_llm_stub(args.llm_latency / 1000)
+    process = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        print(f"Stub LLM at {llm_url}; start the server with GROQ_API_URL set to it.")
+    else:
+        process, base_url = start_server(args.server, llm_url)
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    users = []
+    for i in range(args.users):
+        if rng.random() < args.doctor_share:
+            username, role = f"{args.prefix}_doctor_{rng.randrange(args.doctors)}", 'doctor'
+        else:
+            username, role = f"{args.prefix}_patient_{rng.randrange(args.patients)}", 'patient'
+        users.append(VirtualUser(base_url, username, role, args.password, recorder, random.Random(rng.random())))
+
+    try:
+        started = time.monotonic()
+        deadline = started + args.seconds
+        threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    results = summarize(recorder, elapsed)
+    total = sum(row['requests'] for row in results.values())
+    errors = sum(row['errors'] for row in results.values())
+    print(f"{args.users} users, {elapsed:.1f}s, {total} requests ({total / elapsed:.1f} req/s), {errors} errors")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['endpoints']
+    print_results(results, baseline)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'users': args.users, 'seconds': elapsed, 'server': args.url or args.server,
+                       'endpoints': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
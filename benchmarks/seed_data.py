@@ -0,0 +1,163 @@
+"""
+Synthetic population generator for load and performance testing.
+
+Creates doctors, patients, access grants and reports with bulk inserts against the
+database selected by DATABASE_URL. Diseases are drawn from the chatbot vocabulary with a
+Zipf-like distribution, so a few conditions dominate as in real records; upload dates are
+spread over the last --days days. Every seeded user gets the same password, and reports
+point at a handful of small sample files written to the upload folder so downloads work.
+
+    python benchmarks/seed_data.py --doctors 20 --patients 2000 --reports-per-patient 8
+    python benchmarks/seed_data.py --patients 100000 --grant-density 0.02 --prefix big
+
+Rerunning with another --prefix adds a second population next to the first.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_PASSWORD = 'loadtest-password'
+SAMPLE_FILES = 8
+BATCH_SIZE = 5000
+
+
+def zipf_weights(count: int, exponent: float):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def _batches(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def write_sample_files(upload_folder: str, prefix: str, rng: random.Random):
+    """A few small PDFs that every seeded report shares."""
+    os.makedirs(upload_folder, exist_ok=True)
+    paths = []
+    for i in range(SAMPLE_FILES):
+        path = os.path.join(upload_folder, f"{prefix}_sample_{i}.pdf")
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + rng.randbytes(rng.randint(20, 200) * 1024))
+        paths.append(path)
+    return paths
+
+
+def seed(doctors: int = 10, patients: int = 500, reports_per_patient: float = 5, grant_density: float = 0.1,
+         disease_exponent: float = 1.1, days: int = 730, prefix: str = 'seed', password: str = DEFAULT_PASSWORD,
+         random_seed: int = 1, echo=print):
+    """Insert a synthetic population and return the number of rows created per table."""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from main import app
+    from models import User, MedicalReport, DoctorAccess
+    from data_access import bump_data_versions, rebuild_disease_counts
+    from patient_summary import rebuild_patient_summaries
+    from intent_matcher import get_matcher
+    from migrations import init_db
+
+    rng = random.Random(random_seed)
+    diseases = [name.title() for name in get_matcher().vocabulary]
+    rng.shuffle(diseases)
+    weights = zipf_weights(len(diseases), disease_exponent)
+    now = datetime.utcnow()
+    # Hashing is deliberately slow, so every seeded user shares one hash
+    password_hash = generate_password_hash(password)
+
+    with app.app_context():
+        init_db()
+        started = time.perf_counter()
+        users = [
+            {'username': f"{prefix}_doctor_{i}", 'email': f"{prefix}_doctor_{i}@example.com",
+             'password_hash': password_hash, 'role': 'doctor', 'full_name': f"Dr. {prefix.title()} {i}"}
+            for i in range(doctors)
+        ] + [
+            {'username': f"{prefix}_patient_{i}", 'email': f"{prefix}_patient_{i}@example.com",
+             'password_hash': password_hash, 'role': 'patient', 'full_name': f"{prefix.title()} Patient {i}"}
+            for i in range(patients)
+        ]
+        for batch in _batches(users):
+            db.session.execute(insert(User), batch)
+        db.session.commit()
+
+        ids = dict(db.session.query(User.username, User.id).filter(User.username.like(f"{prefix}\\_%", escape='\\')))
+        doctor_ids = [ids[f"{prefix}_doctor_{i}"] for i in range(doctors)]
+        patient_ids = [ids[f"{prefix}_patient_{i}"] for i in range(patients)]
+
+        # Every patient sees at least one doctor, then each other doctor with probability grant_density
+        grants = []
+        for patient_id in patient_ids:
+            chosen = {rng.choice(doctor_ids)} if doctor_ids else set()
+            chosen.update(doctor_id for doctor_id in doctor_ids if rng.random() < grant_density)
+            grants.extend({'patient_id': patient_id, 'doctor_id': doctor_id,
+                           'granted_date': now - timedelta(days=rng.uniform(0, days))} for doctor_id in chosen)
+        for batch in _batches(grants):
+            db.session.execute(insert(DoctorAccess), batch)
+        db.session.commit()
+
+        sample_paths = write_sample_files(app.config['UPLOAD_FOLDER'], prefix, rng)
+        reports = 0
+        pending = []
+        for patient_id in patient_ids:
+            # A patient's reports cluster around a few conditions of their own
+            conditions = rng.choices(diseases, weights=weights, k=rng.randint(1, 3))
+            for _ in range(max(0, round(rng.expovariate(1 / reports_per_patient))) if reports_per_patient else 0):
+                path = rng.choice(sample_paths)
+                pending.append({
+                    'patient_id': patient_id,
+                    'disease_name': rng.choice(conditions),
+                    'description': f"Synthetic report for {prefix} load testing",
+                    'file_path': path,
+                    'file_name': os.path.basename(path),
+                    'file_type': 'pdf',
+                    'upload_date': now - timedelta(seconds=rng.uniform(0, days * 86400))
+                })
+            if len(pending) >= BATCH_SIZE:
+                db.session.execute(insert(MedicalReport), pending)
+                reports += len(pending)
+                pending = []
+        if pending:
+            db.session.execute(insert(MedicalReport), pending)
+            reports += len(pending)
+        db.session.commit()
+
+        # Chunked to stay under SQLite's limit on bound parameters
+        for batch in _batches(patient_ids):
+            rebuild_disease_counts(batch)
+            rebuild_patient_summaries(batch)
+        bump_data_versions(doctor_ids + patient_ids)
+        db.session.commit()
+
+        counts = {'doctors': doctors, 'patients': patients, 'grants': len(grants), 'reports': reports}
+        echo(f"Seeded {counts} in {time.perf_counter() - started:.1f}s; password for every user: {password!r}")
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=10)
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--reports-per-patient', type=float, default=5, help='Mean reports per patient.')
+    parser.add_argument('--grant-density', type=float, default=0.1,
+                        help='Chance that a patient grants each additional doctor access.')
+    parser.add_argument('--disease-exponent', type=float, default=1.1,
+                        help='Zipf exponent of the disease distribution; 0 makes diseases uniform.')
+    parser.add_argument('--days', type=int, default=730, help='Spread upload dates over this many days.')
+    parser.add_argument('--prefix', default='seed', help='Username prefix, unique per seeded population.')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=1, help='Random seed, for reproducible populations.')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    seed(args.doctors, args.patients, args.reports_per_patient, args.grant_density, args.disease_exponent,
+         args.days, args.prefix, args.password, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Worker boot and test collection time.
+
+Each sample runs in a fresh interpreter, so nothing is cached between runs: "boot" times
+`import main` (what a Gunicorn worker does before serving, app creation included) and
+"collect" times `pytest --collect-only`. --baseline REV measures the same for another git
+revision, extracted to a temporary directory, so a change can be compared before and after:
+
+    python benchmarks/startup_time.py --runs 7
+    python benchmarks/startup_time.py --baseline HEAD~1 --importtime 10
+
+--importtime N also lists the N top-level packages that take longest to import at boot.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOT_SCRIPT = 'import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)'
+
+
+def isolated_env(workdir: str) -> dict:
+    # A throwaway database and metrics directory, so runs do not touch the instance folder
+    return dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(workdir, 'startup.db'),
+                METRICS_DIR=os.path.join(workdir, 'metrics'))
+
+
+def time_boot(tree: str, env: dict) -> float:
+    output = subprocess.run([sys.executable, '-c', BOOT_SCRIPT], cwd=tree, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_collect(tree: str, env: dict) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'pytest', '--collect-only', '-q', '-p', 'no:cacheprovider'],
+                   cwd=tree, env=env, check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def slowest_imports(tree: str, env: dict, count: int):
+    """(cumulative ms, package) of the top-level packages that take longest to import, slowest first."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=tree, env=env,
+                            check=True, capture_output=True, text=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        package = name.strip().split('.')[0]
+        # main and app enclose everything else, so they would always top the list
+        if package not in ('main', 'app'):
+            packages[package] = max(packages.get(package, 0), int(cumulative) / 1000)
+    return sorted(((ms, package) for package, ms in packages.items()), reverse=True)[:count]
+
+
+def measure(tree: str, runs: int, collect: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix='srhs-startup-')
+    try:
+        env = isolated_env(workdir)
+        # One untimed run so every sample sees warm OS file caches and compiled bytecode
+        time_boot(tree, env)
+        results = {'boot': [time_boot(tree, env) for _ in range(runs)]}
+        if collect:
+            results['collect'] = [time_collect(tree, env) for _ in range(runs)]
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def extract_revision(revision: str) -> str:
+    tree = tempfile.mkdtemp(prefix='srhs-baseline-')
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help='Git revision to compare with, e.g. HEAD~1.')
+    parser.add_argument('--no-collect', action='store_true', help='Skip timing pytest collection.')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='List the N slowest packages imported at boot.')
+    args = parser.parse_args()
+
+    trees = [('current', ROOT)]
+    if args.baseline:
+        trees.insert(0, (args.baseline, extract_revision(args.baseline)))
+
+    medians = {}
+    try:
+        for label, tree in trees:
+            results = measure(tree, args.runs, not args.no_collect)
+            for name, samples in results.items():
+                medians[(label, name)] = statistics.median(samples)
+                print(f"{label:<12} {name:<8} median {medians[(label, name)] * 1000:8.0f} ms   "
+                      f"min {min(samples) * 1000:8.0f} ms")
+            if args.importtime:
+                workdir = tempfile.mkdtemp(prefix='srhs-startup-')
+                for milliseconds, module in slowest_imports(tree, isolated_env(workdir), args.importtime):
+                    print(f"    {milliseconds:8.1f} ms  {module}")
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        if args.baseline:
+            shutil.rmtree(trees[0][1], ignore_errors=True)
+
+    if args.baseline:
+        for name in ('boot', 'collect'):
+            if ('current', name) in medians:
+                change = medians[('current', name)] / medians[(args.baseline, name)] - 1
+                print(f"{name}: {change * 100:+.0f}% vs {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Bulk ingest of historical report archives: `flask import-reports SOURCE_DIR MANIFEST`.
+
+The manifest (CSV with a header row, a JSON list, or JSON Lines) has one entry per file:
+  file          path of the report, relative to SOURCE_DIR
+  patient       patient id, username or email
+  disease_name  disease the report belongs to
+  description   report description
+  upload_date   optional ISO date; defaults to the import time
+
+Files are copied into the upload folder on a thread pool while the previous batch is
+written to the database, one transaction per batch. Every imported entry is recorded in
+ReportImport in the same transaction as its report, and copies use a name derived from
+the entry, so rerunning the same command after a crash skips what was committed and
+overwrites any half-copied files instead of duplicating them.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_
+from werkzeug.utils import secure_filename
+from app import db
+from models import User, MedicalReport, DoctorAccess, ReportImport
+from data_access import bump_data_versions, increment_disease_count
+from patient_summary import add_reports
+from report_processing import queue_report_extraction
+from routes import allowed_file
+
+DEFAULT_IMPORT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 500
+REQUIRED_COLUMNS = ('file', 'patient', 'disease_name', 'description')
+
+
+def read_manifest(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield manifest entries from a .csv, .json (list) or .jsonl file."""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    elif path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def source_key(entry: Dict[str, Any]) -> str:
+    return hashlib.sha1(f"{entry['file']}\0{entry['patient']}".encode('utf-8')).hexdigest()
+
+
+def _chunks(entries, size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ReportImporter:
+    """Validates, copies and inserts manifest entries in batches, keeping throughput counters."""
+
+    def __init__(self, source_dir: str, workers: int = DEFAULT_IMPORT_WORKERS,
+                 batch_size: int = DEFAULT_BATCH_SIZE, echo=click.echo):
+        self.source_dir = os.path.abspath(source_dir)
+        self.upload_folder = current_app.config['UPLOAD_FOLDER']
+        self.workers = workers
+        self.batch_size = batch_size
+        self.echo = echo
+        self.stats = Counter()
+        self.bytes_copied = 0
+        self._patients = {}
+        self._seen = set()
+
+    def resolve_patients(self, entries: List[Dict[str, Any]]) -> None:
+        """Look up every patient referenced by a batch with one query, by id, username or email."""
+        wanted = {str(entry['patient']).strip() for entry in entries} - set(self._patients)
+        if not wanted:
+            return
+        ids = [int(value) for value in wanted if value.isdigit()]
+        patients = User.query.filter(User.role == 'patient', or_(
+            User.id.in_(ids), User.username.in_(wanted), User.email.in_(wanted)
+        )).all()
+        for patient in patients:
+            for value in (str(patient.id), patient.username, patient.email):
+                if value in wanted:
+                    self._patients[value] = patient.id
+        for value in wanted:
+            self._patients.setdefault(value, None)
+
+    def prepare(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop entries that were already imported or are invalid, reporting the invalid ones."""
+        complete = []
+        for entry in entries:
+            missing = [column for column in REQUIRED_COLUMNS if not entry.get(column)]
+            if missing:
+                self.stats['failed'] += 1
+                self.echo(f"Skipping manifest entry without {', '.join(missing)}: {entry}", err=True)
+            else:
+                complete.append(dict(entry, key=source_key(entry)))
+        entries = complete
+        done = {key for key, in db.session.query(ReportImport.source_key).filter(
+            ReportImport.source_key.in_([entry['key'] for entry in entries])
+        )}
+        self.stats['skipped'] += len(done)
+        self.resolve_patients(entries)
+
+        valid = []
+        for entry in entries:
+            if entry['key'] in done or entry['key'] in self._seen:
+                continue
+            self._seen.add(entry['key'])
+            error = self.validate(entry)
+            if error:
+                self.stats['failed'] += 1
+                self.echo(f"Skipping {entry.get('file')}: {error}", err=True)
+                continue
+            valid.append(entry)
+        return valid
+
+    def validate(self, entry: Dict[str, Any]) -> Optional[str]:
+        entry['patient_id'] = self._patients.get(str(entry['patient']).strip())
+        if entry['patient_id'] is None:
+            return f"unknown patient {entry['patient']!r}"
+        if not str(entry['disease_name']).strip() or not str(entry['description']).strip():
+            return "disease_name and description are required"
+        filename = secure_filename(os.path.basename(entry['file']))
+        if not allowed_file(filename):
+            return "file type not allowed"
+        source_path = os.path.abspath(os.path.join(self.source_dir, entry['file']))
+        if not source_path.startswith(self.source_dir + os.sep) or not os.path.isfile(source_path):
+            return "file not found in source directory"
+        try:
+            entry['upload_date'] = datetime.fromisoformat(entry['upload_date']) if entry.get('upload_date') else None
+        except (TypeError, ValueError):
+            return f"invalid upload_date {entry.get('upload_date')!r}"
+        entry['source_path'] = source_path
+        entry['file_name'] = filename
+        # Named after the manifest entry so a rerun overwrites rather than duplicates a copy
+        entry['file_path'] = os.path.join(self.upload_folder, f"{entry['key'][:16]}_{filename}")
+        return None
+
+    def copy_file(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        tmp_path = entry['file_path'] + '.part'
+        shutil.copyfile(entry['source_path'], tmp_path)
+        os.replace(tmp_path, entry['file_path'])
+        entry['size'] = os.path.getsize(entry['file_path'])
+        return entry
+
+    def insert_batch(self, entries: List[Dict[str, Any]]) -> None:
+        """Insert one batch of reports with their counts, versions and pending extractions, atomically."""
+        reports = []
+        disease_counts = Counter()
+        for entry in entries:
+            report = MedicalReport(
+                patient_id=entry['patient_id'],
+                disease_name=str(entry['disease_name']).strip(),
+                description=str(entry['description']).strip(),
+                file_path=entry['file_path'],
+                file_name=entry['file_name'],
+                file_type=entry['file_name'].rsplit('.', 1)[1].lower(),
+                upload_date=entry['upload_date'] or datetime.utcnow()
+            )
+            reports.append(report)
+            disease_counts[report.patient_id, report.disease_name] += 1
+        db.session.add_all(reports)
+        db.session.flush()
+
+        for entry, report in zip(entries, reports):
+            db.session.add(ReportImport(source_key=entry['key'], report_id=report.id))
+            queue_report_extraction(report)
+        for (patient_id, disease_name), count in disease_counts.items():
+            increment_disease_count(patient_id, disease_name, count)
+        add_reports(reports)
+
+        patient_ids = {report.patient_id for report in reports}
+        doctor_ids = [doctor_id for doctor_id, in db.session.query(DoctorAccess.doctor_id).filter(
+            DoctorAccess.patient_id.in_(patient_ids)
+        )]
+        bump_data_versions([*patient_ids, *doctor_ids])
+        db.session.commit()
+        self.stats['imported'] += len(reports)
+
+    def run(self, entries) -> Counter:
+        """Import every entry, copying batch N+1 while batch N is written to the database."""
+        os.makedirs(self.upload_folder, exist_ok=True)
+        started = time.perf_counter()
+        pending = None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for chunk in _chunks(entries, self.batch_size):
+                batch = self.prepare(chunk)
+                copies = [pool.submit(self.copy_file, entry) for entry in batch]
+                if pending:
+                    self._finish(pending)
+                pending = copies
+                self.report_progress(started)
+            if pending:
+                self._finish(pending)
+        self.report_progress(started, final=True)
+        return self.stats
+
+    def _finish(self, copies) -> None:
+        copied = []
+        for future in copies:
+            try:
+                copied.append(future.result())
+            except OSError as e:
+                self.stats['failed'] += 1
+                self.echo(f"Copy failed: {e}", err=True)
+        self.stats['copied'] += len(copied)
+        self.bytes_copied += sum(entry['size'] for entry in copied)
+        if copied:
+            self.insert_batch(copied)
+
+    def report_progress(self, started: float, final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.echo(
+            f"{'Done' if final else 'Progress'}: {self.stats['imported']} imported, "
+            f"{self.stats['skipped']} already imported, {self.stats['failed']} failed in {elapsed:.1f}s "
+            f"({self.stats['copied'] / elapsed:.1f} files/s, {self.stats['imported'] / elapsed:.1f} rows/s, "
+            f"{self.bytes_copied / elapsed / 1024 / 1024:.1f} MiB/s)"
+        )
+
+
+@click.command('import-reports')
+@click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', default=DEFAULT_IMPORT_WORKERS, show_default=True, help='Parallel file copies.')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Reports per transaction.')
+@with_appcontext
+def import_reports_command(source_dir, manifest, workers, batch_size):
+    """Import report files listed in MANIFEST from SOURCE_DIR. Safe to rerun after an interruption."""
+    importer = ReportImporter(source_dir, workers=workers, batch_size=batch_size)
+    stats = importer.run(read_manifest(manifest))
+    if stats['imported']:
+        click.echo("Text extraction is pending for the new reports; run `flask process-reports` to process them.")
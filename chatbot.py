@@ -1,77 +1,74 @@
+import calendar
+import json
 import re
-from typing import List, Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import List, Any, Iterator, Optional, Tuple, Union
 import os
-import google.generativeai as genai
-import requests
-from dotenv import load_dotenv
+from patient_index import PatientIndex
+from patient_summary import RecordSummary
+from intent_matcher import get_matcher
+from metrics import observe
+from response_cache import get_response_cache, make_cache_key
 
-load_dotenv()
-
-def process_chatbot_query(query: str, data: List[Dict[str, Any]], role: str) -> str:
+def process_chatbot_query(query: str, data: Union[PatientIndex, RecordSummary], role: str,
+                          stream: bool = False) -> Union[str, Iterator[str]]:
     """
     Process chatbot queries and return filtered patient information.
-    Basic keyword-based NLP implementation, with Gemini fallback for open-ended queries.
+    Intents and diseases come from the compiled matcher in intent_matcher, with an LLM fallback
+    for open-ended queries.
+    Doctors pass their cached PatientIndex; patients pass their RecordSummary.
+    With stream=True, open-ended queries return an iterator of LLM text fragments instead of a string.
     """
+    llm = stream_groq_llama3 if stream else call_groq_llama3
     query = query.lower().strip()
-    
-    # Extract patient ID if mentioned
-    patient_id_match = re.search(r'\b(?:patient\s+)?(?:id\s+)?(\d+)\b', query)
-    patient_id = int(patient_id_match.group(1)) if patient_id_match else None
-    
-    # Extract disease names
-    disease_keywords = []
-    common_diseases = [
-        'cancer', 'diabetes', 'hypertension', 'heart', 'lung', 'kidney',
-        'liver', 'brain', 'blood', 'infection', 'fever', 'flu', 'covid',
-        'pneumonia', 'asthma', 'arthritis', 'depression', 'anxiety'
-    ]
-    
-    for disease in common_diseases:
-        if disease in query:
-            disease_keywords.append(disease)
-    
+
+    # Intent, disease concepts and patient id from one pass of the compiled matcher
+    match = get_matcher().match(query, role)
+    patient_id = match.patient_id
+    disease_keywords = match.diseases
+
     # Role-specific logic
     if role == 'doctor':
-        if 'show' in query or 'find' in query or 'list' in query:
+        if match.intent == 'search':
             return handle_search_query(query, data, patient_id, disease_keywords)
-        elif 'count' in query or 'how many' in query or 'total' in query:
+        elif match.intent == 'count':
             return handle_count_query(query, data, disease_keywords)
-        elif 'help' in query or 'commands' in query:
+        elif match.intent == 'help':
             return get_help_message('doctor')
         else:
-            return call_groq_llama3(query, role='doctor')
+            return llm(query, role='doctor')
     
     elif role == 'patient':
-        if not data:
+        if data is None:
             return "Could not retrieve your data. Please try again later."
         
-        patient_data = data[0]  # Patient data is the first element
+        date_range = parse_date_range(query)
         
-        if any(word in query for word in ['help', 'commands', 'options']):
+        if match.intent == 'help':
             return get_help_message('patient')
-        elif any(word in query for word in ['my reports', 'my records']):
-            return handle_patient_reports_query(patient_data)
-        elif any(word in query for word in ['which doctors', 'who has access']):
-            return handle_patient_access_query(patient_data)
+        elif match.intent == 'access':
+            return handle_patient_access_query(data)
+        elif match.intent == 'latest':
+            return handle_patient_latest_query(data, disease_keywords)
+        elif match.intent == 'reports' or date_range:
+            return handle_patient_reports_query(data, disease_keywords, date_range)
         else:
-            return call_groq_llama3(query, role='patient')
+            return llm(query, role='patient')
     
     return "Invalid role specified."
 
-def handle_search_query(query: str, patients_data: List[Dict[str, Any]], 
+def handle_search_query(query: str, index: PatientIndex, 
                        patient_id: int = None, disease_keywords: List[str] = None) -> str:
     """Handle search/filter queries"""
     
     if patient_id:
         # Search by patient ID
-        matching_patients = [
-            p for p in patients_data 
-            if p['patient'].id == patient_id
-        ]
+        patient_data = index.get(patient_id)
         
-        if matching_patients:
-            patient = matching_patients[0]['patient']
-            reports = matching_patients[0]['reports']
+        if patient_data:
+            patient = patient_data['patient']
+            reports = patient_data['reports']
             return f"Found Patient ID {patient.id}: {patient.full_name}\n" \
                    f"Reports: {len(reports)} medical reports\n" \
                    f"Diseases: {', '.join(set(r.disease_name for r in reports))}"
@@ -80,20 +77,13 @@ def handle_search_query(query: str, patients_data: List[Dict[str, Any]],
     
     elif disease_keywords:
         # Search by disease
-        matching_patients = []
-        for patient_data in patients_data:
-            patient_diseases = [r.disease_name.lower() for r in patient_data['reports']]
-            if any(keyword in ' '.join(patient_diseases) for keyword in disease_keywords):
-                matching_patients.append(patient_data)
+        matching_patients = index.patients_matching(disease_keywords)
         
         if matching_patients:
             result = f"Found {len(matching_patients)} patients with {', '.join(disease_keywords)}:\n\n"
             for patient_data in matching_patients[:5]:  # Limit to 5 results
                 patient = patient_data['patient']
-                relevant_reports = [
-                    r for r in patient_data['reports']
-                    if any(keyword in r.disease_name.lower() for keyword in disease_keywords)
-                ]
+                relevant_reports = index.reports_matching(patient_data, disease_keywords)
                 result += f"• Patient ID {patient.id}: {patient.full_name}\n"
                 result += f"  Relevant reports: {len(relevant_reports)}\n"
                 if relevant_reports:
@@ -109,11 +99,11 @@ def handle_search_query(query: str, patients_data: List[Dict[str, Any]],
     
     else:
         # General patient list
-        if not patients_data:
+        if not len(index):
             return "No patients have granted you access yet."
         
-        result = f"You have access to {len(patients_data)} patients:\n\n"
-        for patient_data in patients_data:
+        result = f"You have access to {len(index)} patients:\n\n"
+        for patient_data in index.patients:
             patient = patient_data['patient']
             reports = patient_data['reports']
             diseases = list(set(r.disease_name for r in reports))
@@ -128,50 +118,35 @@ def handle_search_query(query: str, patients_data: List[Dict[str, Any]],
         
         return result
 
-def handle_count_query(query: str, patients_data: List[Dict[str, Any]], 
+def handle_count_query(query: str, index: PatientIndex, 
                       disease_keywords: List[str] = None) -> str:
     """Handle counting queries"""
     
     if disease_keywords:
         # Count patients with specific diseases
-        count = 0
-        for patient_data in patients_data:
-            patient_diseases = [r.disease_name.lower() for r in patient_data['reports']]
-            if any(keyword in ' '.join(patient_diseases) for keyword in disease_keywords):
-                count += 1
+        count = len(index.matching_patient_ids(disease_keywords))
         
         return f"You have {count} patients with {', '.join(disease_keywords)}"
     
     else:
         # Total patient count
-        total_patients = len(patients_data)
-        total_reports = sum(len(p['reports']) for p in patients_data)
-        
-        # Disease distribution
-        disease_counts = {}
-        for patient_data in patients_data:
-            for report in patient_data['reports']:
-                disease = report.disease_name
-                disease_counts[disease] = disease_counts.get(disease, 0) + 1
-        
         result = f"Total Statistics:\n"
-        result += f"• Patients: {total_patients}\n"
-        result += f"• Total Reports: {total_reports}\n"
+        result += f"• Patients: {len(index)}\n"
+        result += f"• Total Reports: {index.total_reports}\n"
         
-        if disease_counts:
+        if index.disease_counts:
             result += f"• Top Diseases:\n"
-            sorted_diseases = sorted(disease_counts.items(), key=lambda x: x[1], reverse=True)
-            for disease, count in sorted_diseases[:5]:
+            for disease, count in index.disease_counts.most_common(5):
                 result += f"  - {disease}: {count} cases\n"
         
         return result
 
-def handle_general_query(query: str, patients_data: List[Dict[str, Any]], 
+def handle_general_query(query: str, index: PatientIndex, 
                         patient_id: int = None, disease_keywords: List[str] = None) -> str:
     """Handle general queries that don't fit other categories"""
     
     if patient_id or disease_keywords:
-        return handle_search_query(query, patients_data, patient_id, disease_keywords)
+        return handle_search_query(query, index, patient_id, disease_keywords)
     
     # Default response with suggestions
     return "I can help you find patients and analyze medical data. Try asking:\n\n" \
@@ -205,7 +180,13 @@ def get_help_message(role: str) -> str:
 
 📄 **My Records**:
 • "Show my reports"
-• "Summarize my recent reports"
+• "Show my asthma reports"
+• "Latest diabetes report"
+
+📅 **Dates**:
+• "Reports from the last 3 months"
+• "Reports between 2024-01-01 and 2024-03-31"
+• "Reports in March 2024"
 
 🔑 **Access**:
 • "Which doctors have access?"
@@ -215,56 +196,266 @@ def get_help_message(role: str) -> str:
 • "Show my reports from the last month"""
 
 
-def call_groq_llama3(prompt: str, role: str) -> str:
-    """Call Groq Cloud Llama 3-70B for generative medical chatbot answers."""
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama3-70b-8192"
+
+_http_session = None
+
+def get_http_session():
+    """Shared keep-alive session so LLM calls reuse pooled connections instead of reconnecting."""
+    global _http_session
+    if _http_session is None:
+        # Imported on the first LLM call rather than at worker boot
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _http_session = session
+    return _http_session
+
+def get_system_prompt(role: str) -> str:
+    if role == 'doctor':
+        return "You are a helpful medical assistant for a doctor. You are analyzing data from patients who have granted this doctor access. Be concise and professional. Always remind users to consult a real doctor for definitive medical advice."
+    else: # Patient
+        return "You are a helpful AI assistant for a patient viewing their own health records. Be supportive and clear. Always strongly remind them that you are an AI and they must consult their real doctor for any medical advice."
+
+def build_groq_request(prompt: str, role: str, stream: bool = False):
+    """Return (url, headers, payload) for a Groq chat completion, or None if no API key is set."""
     api_key = os.getenv('GROQ_API_KEY')
     if not api_key:
-        return "[Error: GROQ_API_KEY not set in environment.]"
-    url = "https://api.groq.com/openai/v1/chat/completions"
+        return None
+    url = os.getenv('GROQ_API_URL', GROQ_API_URL)
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
-    
-    if role == 'doctor':
-        system_prompt = "You are a helpful medical assistant for a doctor. You are analyzing data from patients who have granted this doctor access. Be concise and professional. Always remind users to consult a real doctor for definitive medical advice."
-    else: # Patient
-        system_prompt = "You are a helpful AI assistant for a patient viewing their own health records. Be supportive and clear. Always strongly remind them that you are an AI and they must consult their real doctor for any medical advice."
-
     payload = {
-        "model": "llama3-70b-8192",
+        "model": GROQ_MODEL,
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": get_system_prompt(role)},
             {"role": "user", "content": prompt}
         ],
         "max_tokens": 512,
         "temperature": 0.2
     }
+    if stream:
+        payload["stream"] = True
+    return url, headers, payload
+
+def call_groq_llama3(prompt: str, role: str) -> str:
+    """Call Groq Cloud Llama 3-70B for generative medical chatbot answers."""
+    groq_request = build_groq_request(prompt, role)
+    if groq_request is None:
+        return "[Error: GROQ_API_KEY not set in environment.]"
+    url, headers, payload = groq_request
+
+    cache = get_response_cache()
+    cache_key = make_cache_key(prompt, role, get_system_prompt(role), GROQ_MODEL)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = get_http_session().post(url, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
+        answer = response.json()["choices"][0]["message"]["content"].strip()
     except Exception as e:
+        observe('srhs_llm_request_duration_seconds', time.perf_counter() - started, mode='complete', outcome='error')
         return f"[Groq LLM Error: {e}]"
+    observe('srhs_llm_request_duration_seconds', time.perf_counter() - started, mode='complete', outcome='ok')
+
+    if cache is not None:
+        cache.set(cache_key, answer)
+    return answer
 
-def handle_patient_reports_query(patient_data: Dict[str, Any]) -> str:
-    """Handle queries about a patient's own reports."""
-    reports = patient_data.get('reports', [])
+def stream_groq_llama3(prompt: str, role: str) -> Iterator[str]:
+    """
+    Stream a Groq completion, yielding content fragments as they arrive.
+    Parses the OpenAI-compatible server-sent event stream ("data: {...}" lines ending with "[DONE]").
+    """
+    groq_request = build_groq_request(prompt, role, stream=True)
+    if groq_request is None:
+        yield "[Error: GROQ_API_KEY not set in environment.]"
+        return
+    url, headers, payload = groq_request
+
+    cache = get_response_cache()
+    cache_key = make_cache_key(prompt, role, get_system_prompt(role), GROQ_MODEL)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    fragments = []
+    started = time.perf_counter()
+    try:
+        # (connect timeout, read timeout between chunks) rather than a cap on the whole answer
+        with get_http_session().post(url, headers=headers, json=payload, stream=True, timeout=(5, 30)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    fragments.append(delta["content"])
+                    yield delta["content"]
+    except Exception as e:
+        observe('srhs_llm_request_duration_seconds', time.perf_counter() - started, mode='stream', outcome='error')
+        yield f"[Groq LLM Error: {e}]"
+        return
+    # Measured to the end of the stream; an abandoned stream records nothing
+    observe('srhs_llm_request_duration_seconds', time.perf_counter() - started, mode='stream', outcome='ok')
+
+    # Only complete answers are cached; an aborted stream never reaches this point
+    if cache is not None and fragments:
+        cache.set(cache_key, ''.join(fragments).strip())
+
+# Month names and abbreviations -> month number, for "in March" or "in jan 2024"
+_MONTHS = {}
+for _number, _name in enumerate(calendar.month_name[1:], 1):
+    _MONTHS[_name.lower()] = _MONTHS[_name.lower()[:3]] = _number
+_MONTH_RE = '|'.join(sorted(_MONTHS, key=len, reverse=True))
+_ISO_DATE = r'(\d{4}-\d{2}-\d{2})'
+
+_BETWEEN_RE = re.compile(r'\b(?:between|from)\s+' + _ISO_DATE + r'\s+(?:and|to|until|till)\s+' + _ISO_DATE)
+_SINCE_RE = re.compile(r'\b(since|after|from|before|until)\s+' + _ISO_DATE)
+_TRAILING_RE = re.compile(r'\b(?:last|past)\s+(\d+\s+)?(day|week|month|year)s?\b')
+_THIS_RE = re.compile(r'\bthis\s+(week|month|year)\b')
+_MONTH_NAME_RE = re.compile(r'\b(?:in|during|from)\s+(' + _MONTH_RE + r')\b(?:\s+(\d{4}))?')
+_YEAR_RE = re.compile(r'\b(?:in|during|from)\s+(\d{4})\b')
+
+def _months_before(moment: datetime, months: int) -> datetime:
+    year, month = divmod(moment.year * 12 + moment.month - 1 - months, 12)
+    return moment.replace(year=year, month=month + 1,
+                          day=min(moment.day, calendar.monthrange(year, month + 1)[1]))
+
+def _format_date(moment: datetime) -> str:
+    return moment.strftime('%B %d, %Y')
+
+def parse_date_range(query: str, now: Optional[datetime] = None) -> Optional[Tuple[Optional[datetime], Optional[datetime], str]]:
+    """
+    Find a date range in a patient's question: "between 2024-01-01 and 2024-03-31",
+    "since 2024-02-01", "last 3 months", "past week", "this year", "in March 2024", "in 2023".
+    Returns (start, end, label) with end exclusive and either bound possibly open, or None.
+    """
+    now = now or datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    day = timedelta(days=1)
+    try:
+        found = _BETWEEN_RE.search(query)
+        if found:
+            start, end = (datetime.fromisoformat(value) for value in found.groups())
+            return start, end + day, f"between {_format_date(start)} and {_format_date(end)}"
+
+        found = _SINCE_RE.search(query)
+        if found:
+            word, moment = found.group(1), datetime.fromisoformat(found.group(2))
+            if word in ('since', 'from'):
+                return moment, None, f"since {_format_date(moment)}"
+            if word == 'after':
+                return moment + day, None, f"after {_format_date(moment)}"
+            if word == 'before':
+                return None, moment, f"before {_format_date(moment)}"
+            return None, moment + day, f"until {_format_date(moment)}"
+    except ValueError:
+        return None
+
+    found = _TRAILING_RE.search(query)
+    if found:
+        count, unit = int(found.group(1) or 1), found.group(2)
+        if unit == 'day':
+            start = today - (count - 1) * day
+        elif unit == 'week':
+            start = now - timedelta(weeks=count)
+        else:
+            start = _months_before(now, count * (12 if unit == 'year' else 1))
+        return start, None, f"in the last {count} {unit}s" if count > 1 else f"in the last {unit}"
+
+    found = _THIS_RE.search(query)
+    if found:
+        unit = found.group(1)
+        if unit == 'week':
+            start = today - today.weekday() * day
+        elif unit == 'month':
+            start = today.replace(day=1)
+        else:
+            start = today.replace(month=1, day=1)
+        return start, None, f"this {unit}"
+
+    found = _MONTH_NAME_RE.search(query)
+    if found:
+        month = _MONTHS[found.group(1)]
+        # Without a year, the most recent such month
+        year = int(found.group(2)) if found.group(2) else today.year - (month > today.month)
+        start = datetime(year, month, 1)
+        return start, _months_before(start, -1), f"in {start.strftime('%B %Y')}"
+
+    found = _YEAR_RE.search(query)
+    if found:
+        year = int(found.group(1))
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1), f"in {year}"
+    return None
+
+def _report_lines(reports: List[Any], limit: int = 5) -> str:
+    """Bullet list of the newest reports first, with a count of the rest."""
+    result = ""
+    for report in reversed(reports[-limit:]):
+        result += f"• **{report.disease_name}** - {_format_date(report.upload_date)}\n"
+    if len(reports) > limit:
+        result += f"...and {len(reports) - limit} more."
+    return result
+
+def handle_patient_reports_query(summary: RecordSummary, disease_keywords: List[str] = None,
+                                 date_range: Optional[Tuple] = None) -> str:
+    """Handle queries about a patient's own reports, optionally for some diseases or a date range."""
+    start, end, label = date_range or (None, None, "")
+    reports = summary.reports_between(start, end)
+    if disease_keywords:
+        reports = [r for r in reports if summary.matches(r.disease_name, disease_keywords)]
+    
+    subject = f"{', '.join(disease_keywords)} reports" if disease_keywords else "medical reports"
+    scope = f" {label}" if label else ""
     if not reports:
+        if not summary.reports:
+            return "You have no medical reports uploaded yet."
+        return f"You have no {subject}{scope}."
+    
+    count = f"{len(reports)} {subject}" if len(reports) > 1 else f"1 {subject[:-1]}"
+    return f"You have {count}{scope}:\n" + _report_lines(reports)
+
+def handle_patient_latest_query(summary: RecordSummary, disease_keywords: List[str] = None) -> str:
+    """Handle queries about a patient's most recent report, overall or per disease."""
+    if not summary.reports:
         return "You have no medical reports uploaded yet."
     
-    result = f"You have {len(reports)} medical reports:\n"
-    for r in sorted(reports, key=lambda x: x.upload_date, reverse=True)[:5]:
-        result += f"• **{r.disease_name}** - {r.upload_date.strftime('%B %d, %Y')}\n"
+    if not disease_keywords:
+        report = summary.reports[-1]
+        return f"Your latest report is **{report.disease_name}**, uploaded on {_format_date(report.upload_date)}."
     
-    if len(reports) > 5:
-        result += f"...and {len(reports) - 5} more."
-        
-    return result
+    latest = sorted((report for disease, report in summary.latest.items()
+                     if summary.matches(disease, disease_keywords)), reverse=True)
+    if not latest:
+        return f"You have no reports for {', '.join(disease_keywords)}."
+    
+    result = ""
+    for report in latest:
+        result += f"Your latest **{report.disease_name}** report was uploaded on {_format_date(report.upload_date)}.\n"
+    return result.strip()
 
-def handle_patient_access_query(patient_data: Dict[str, Any]) -> str:
+def handle_patient_access_query(summary: RecordSummary) -> str:
     """Handle queries about which doctors have access."""
-    # This assumes 'granted_accesses' is passed in the patient_data dict.
-    # The route currently doesn't provide this, so this is a placeholder.
-    # For now, we can't answer this question from the patient side.
-    return "I'm sorry, I can't check which doctors have access right now. You can see the list of doctors on your dashboard."
+    if not summary.grants:
+        return "No doctors have access to your reports. You can grant access from your dashboard."
+    
+    result = f"{len(summary.grants)} doctor{'s have' if len(summary.grants) > 1 else ' has'} access to your reports:\n"
+    for grant in summary.grants:
+        result += f"• Dr. {grant.doctor_name} (since {_format_date(grant.granted_date)})\n"
+    return result.strip()
@@ -0,0 +1,336 @@
+import base64
+import binascii
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Any, Hashable, Iterable, List, Optional
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import load_only
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import User, MedicalReport, DoctorAccess, PatientDiseaseCount, DataVersion
+
+PATIENTS_PER_PAGE = 20
+REPORTS_PER_PAGE = 20
+MAX_PAGE_SIZE = 100
+REPORT_FIELDS = ('patient_id', 'disease_name', 'description', 'file_name', 'file_type', 'upload_date')
+RECENT_REPORTS_PER_PATIENT = 5
+
+
+def _upsert(model):
+    """Dialect-specific INSERT that supports ON CONFLICT DO UPDATE."""
+    dialect_insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    return dialect_insert(model)
+
+
+def get_data_version(user_id: int) -> int:
+    """Current data version for a user; caches built at an older version are stale."""
+    version = db.session.query(DataVersion.version).filter_by(user_id=user_id).scalar()
+    return version or 0
+
+
+def bump_data_versions(user_ids: Iterable[int]) -> None:
+    """Invalidate cached views for the given users. Runs inside the caller's transaction."""
+    params = [{'user_id': user_id, 'version': 1} for user_id in set(user_ids)]
+    if not params:
+        return
+    stmt = _upsert(DataVersion).on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': DataVersion.version + 1}
+    )
+    db.session.execute(stmt, params)
+
+
+def touch_patient_data(patient_id: int, doctor_ids: Iterable[int] = ()) -> List[int]:
+    """
+    Bump the data version of a patient and of every doctor who can see that patient.
+    Pass doctor_ids explicitly for doctors whose access is being removed in this transaction.
+    Returns the ids of the users bumped, i.e. everyone whose view of the patient changed.
+    """
+    granted = db.session.query(DoctorAccess.doctor_id).filter_by(patient_id=patient_id).all()
+    user_ids = list(dict.fromkeys([patient_id, *doctor_ids, *(doctor_id for doctor_id, in granted)]))
+    bump_data_versions(user_ids)
+    return user_ids
+
+
+class VersionedCache:
+    """
+    Per-worker LRU of values built from one user's data, each kept until that user's data
+    version moves. A hit costs one version lookup.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, load: Callable[[], Any], key: Hashable = None) -> Any:
+        """Return the cached value for (user_id, key), calling load() on a miss."""
+        # Read the version before loading so a concurrent write can only cause an extra load
+        version = get_data_version(user_id)
+        cache_key = (user_id, key)
+
+        with self._lock:
+            cached = self._entries.get(cache_key)
+            if cached and cached[0] == version:
+                self._entries.move_to_end(cache_key)
+                return cached[1]
+
+        value = load()
+
+        with self._lock:
+            self._entries[cache_key] = (version, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def increment_disease_count(patient_id: int, disease_name: str, amount: int = 1) -> None:
+    """
+    Add to the materialized report count for one patient/disease pair.
+    Runs inside the caller's transaction so the count commits with the report itself.
+    """
+    stmt = _upsert(PatientDiseaseCount).values(
+        patient_id=patient_id, disease_name=disease_name, report_count=amount
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['patient_id', 'disease_name'],
+        set_={'report_count': PatientDiseaseCount.report_count + amount}
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_disease_counts(patient_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute the materialized counts from MedicalReport, for all patients or only the given ones."""
+    delete_query = PatientDiseaseCount.query
+    source = select(
+        MedicalReport.patient_id, MedicalReport.disease_name, func.count(MedicalReport.id)
+    ).group_by(MedicalReport.patient_id, MedicalReport.disease_name)
+
+    if patient_ids is not None:
+        patient_ids = list(patient_ids)
+        delete_query = delete_query.filter(PatientDiseaseCount.patient_id.in_(patient_ids))
+        source = source.where(MedicalReport.patient_id.in_(patient_ids))
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(PatientDiseaseCount).from_select(
+            ['patient_id', 'disease_name', 'report_count'], source
+        )
+    )
+
+
+def ensure_disease_counts() -> None:
+    """Backfill the materialized counts once for databases that predate the table."""
+    has_counts = db.session.query(PatientDiseaseCount.query.exists()).scalar()
+    has_reports = db.session.query(MedicalReport.query.exists()).scalar()
+    if has_reports and not has_counts:
+        rebuild_disease_counts()
+        db.session.commit()
+
+
+def get_doctor_disease_stats(doctor_id: int) -> Dict[str, int]:
+    """Sum the materialized per-patient counts over every patient who granted this doctor access."""
+    rows = db.session.query(
+        PatientDiseaseCount.disease_name, func.sum(PatientDiseaseCount.report_count)
+    ).join(
+        DoctorAccess, DoctorAccess.patient_id == PatientDiseaseCount.patient_id
+    ).filter(
+        DoctorAccess.doctor_id == doctor_id
+    ).group_by(PatientDiseaseCount.disease_name).all()
+
+    return {disease: int(count) for disease, count in rows if count}
+
+
+def get_patient_report_count(patient_id: int) -> int:
+    """Number of reports a patient has, from the materialized counts."""
+    count = db.session.query(func.sum(PatientDiseaseCount.report_count)).filter(
+        PatientDiseaseCount.patient_id == patient_id
+    ).scalar()
+    return int(count or 0)
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor holding the sort key of the last row a client has seen."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Inverse of encode_cursor, converting each value to the given type. Raises ValueError if malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError
+        return tuple(datetime.fromisoformat(value) if kind is datetime else kind(value)
+                     for value, kind in zip(payload, types))
+    except (TypeError, ValueError, binascii.Error, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _report_filters(query, disease: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime]):
+    if disease:
+        query = query.filter(func.lower(MedicalReport.disease_name) == disease.lower())
+    if date_from:
+        query = query.filter(MedicalReport.upload_date >= date_from)
+    if date_to:
+        query = query.filter(MedicalReport.upload_date < date_to)
+    return query
+
+
+def get_reports_page(patient_ids, cursor: Optional[str] = None, per_page: int = REPORTS_PER_PAGE,
+                     disease: Optional[str] = None, date_from: Optional[datetime] = None,
+                     date_to: Optional[datetime] = None, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    One page of reports, newest first, for the given patient ids (a list or a subquery).
+
+    Pages are keyed on (upload_date, id) rather than an offset, so every page is an index
+    range scan that costs the same however deep the client has scrolled. Only the columns
+    named in fields (plus the sort key) are loaded. Raises ValueError for a bad cursor.
+    """
+    per_page = min(max(per_page, 1), MAX_PAGE_SIZE)
+    columns = [getattr(MedicalReport, name) for name in (fields or REPORT_FIELDS)]
+    query = MedicalReport.query.options(
+        load_only(*columns, MedicalReport.id, MedicalReport.upload_date)
+    ).filter(MedicalReport.patient_id.in_(patient_ids))
+    query = _report_filters(query, disease, date_from, date_to)
+
+    if cursor:
+        upload_date, report_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(tuple_(MedicalReport.upload_date, MedicalReport.id) < (upload_date, report_id))
+
+    reports = query.order_by(MedicalReport.upload_date.desc(), MedicalReport.id.desc()).limit(per_page + 1).all()
+    has_more = len(reports) > per_page
+    reports = reports[:per_page]
+    return {
+        'reports': reports,
+        'next_cursor': encode_cursor(reports[-1].upload_date, reports[-1].id) if has_more else None
+    }
+
+
+def current_month_start() -> datetime:
+    return datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_patient_report_stats(patient_id: int, month_start: Optional[datetime] = None) -> Dict[str, Any]:
+    """Headline numbers for the patient dashboard, computed without loading any reports."""
+    disease_counts = db.session.query(
+        PatientDiseaseCount.disease_name, PatientDiseaseCount.report_count
+    ).filter(PatientDiseaseCount.patient_id == patient_id, PatientDiseaseCount.report_count > 0).all()
+    month_start = month_start or current_month_start()
+    this_month = MedicalReport.query.filter(
+        MedicalReport.patient_id == patient_id, MedicalReport.upload_date >= month_start
+    ).count()
+    return {
+        'total_reports': sum(count for _, count in disease_counts),
+        'unique_diseases': len(disease_counts),
+        'reports_this_month': this_month
+    }
+
+
+def get_doctor_patients_page(doctor_id: int, cursor: Optional[str] = None, per_page: int = PATIENTS_PER_PAGE,
+                             disease: Optional[str] = None, date_from: Optional[datetime] = None,
+                             date_to: Optional[datetime] = None, include_reports: bool = True,
+                             patient_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Load one page of a doctor's patients together with their report summaries.
+
+    Patients are ordered by name and paged on (full_name, id) with a keyset cursor. With a
+    disease or date range only patients having matching reports are listed, and with
+    patient_id only that patient if they granted access. Uses a fixed number of queries no
+    matter how many patients or reports exist; include_reports=False skips the summary
+    queries entirely. Raises ValueError for a bad cursor.
+    """
+    per_page = min(max(per_page, 1), MAX_PAGE_SIZE)
+    query = db.session.query(DoctorAccess, User).join(
+        User, DoctorAccess.patient_id == User.id
+    ).filter(DoctorAccess.doctor_id == doctor_id)
+
+    if patient_id is not None:
+        query = query.filter(DoctorAccess.patient_id == patient_id)
+    if disease:
+        query = query.filter(db.session.query(PatientDiseaseCount).filter(
+            PatientDiseaseCount.patient_id == User.id,
+            func.lower(PatientDiseaseCount.disease_name) == disease.lower(),
+            PatientDiseaseCount.report_count > 0
+        ).exists())
+    if date_from or date_to:
+        query = query.filter(_report_filters(
+            MedicalReport.query.filter(MedicalReport.patient_id == User.id), None, date_from, date_to
+        ).exists())
+    if cursor:
+        cursor_name, cursor_patient_id = decode_cursor(cursor, str, int)
+        query = query.filter(tuple_(User.full_name, User.id) > (cursor_name, cursor_patient_id))
+
+    patient_accesses = query.order_by(User.full_name, User.id).limit(per_page + 1).all()
+    has_more = len(patient_accesses) > per_page
+    patient_accesses = patient_accesses[:per_page]
+
+    patient_ids = [patient.id for _, patient in patient_accesses]
+    report_counts = {}
+    diseases = {}
+    recent_reports = {}
+
+    if patient_ids and include_reports:
+        # Report counts and distinct diseases per patient from the materialized counts
+        disease_rows = db.session.query(
+            PatientDiseaseCount.patient_id, PatientDiseaseCount.disease_name, PatientDiseaseCount.report_count
+        ).filter(
+            PatientDiseaseCount.patient_id.in_(patient_ids),
+            PatientDiseaseCount.report_count > 0
+        ).order_by(PatientDiseaseCount.disease_name).all()
+
+        for row_patient_id, disease_name, count in disease_rows:
+            report_counts[row_patient_id] = report_counts.get(row_patient_id, 0) + count
+            diseases.setdefault(row_patient_id, []).append(disease_name)
+
+        # Most recent reports per patient, ranked in SQL so only the shown rows are loaded
+        ranked = db.session.query(
+            MedicalReport.id.label('id'),
+            func.row_number().over(
+                partition_by=MedicalReport.patient_id,
+                order_by=(MedicalReport.upload_date.desc(), MedicalReport.id.desc())
+            ).label('rank')
+        ).filter(MedicalReport.patient_id.in_(patient_ids)).subquery()
+
+        reports = MedicalReport.query.join(
+            ranked, MedicalReport.id == ranked.c.id
+        ).filter(
+            ranked.c.rank <= RECENT_REPORTS_PER_PATIENT
+        ).order_by(MedicalReport.upload_date.desc(), MedicalReport.id.desc()).all()
+
+        for report in reports:
+            recent_reports.setdefault(report.patient_id, []).append(report)
+
+    patients_data = []
+    for access, patient in patient_accesses:
+        patients_data.append({
+            'patient': patient,
+            'recent_reports': recent_reports.get(patient.id, []),
+            'report_count': report_counts.get(patient.id, 0),
+            'diseases': diseases.get(patient.id, []),
+            'access_date': access.granted_date
+        })
+
+    last_patient = patient_accesses[-1][1] if patient_accesses else None
+    return {
+        'patients_data': patients_data,
+        'next_cursor': encode_cursor(last_patient.full_name, last_patient.id) if has_more else None
+    }
+
+
+def get_doctor_dashboard_data(doctor_id: int, cursor: Optional[str] = None,
+                              per_page: int = PATIENTS_PER_PAGE) -> Dict[str, Any]:
+    """Everything the doctor dashboard renders: a page of patients plus panel-wide statistics."""
+    data = get_doctor_patients_page(doctor_id, cursor, per_page)
+    data['total_patients'] = DoctorAccess.query.filter_by(doctor_id=doctor_id).count()
+    disease_stats = get_doctor_disease_stats(doctor_id)
+    data['disease_stats'] = disease_stats
+    data['total_reports'] = sum(disease_stats.values())
+    return data
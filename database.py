@@ -0,0 +1,70 @@
+"""
+Database profiles selected through the environment.
+
+DATABASE_URL picks the backend (default: SQLite in the instance folder). SQLite
+connections get a write-concurrency pragma profile on every connect; PostgreSQL gets a
+sized, pre-pinged connection pool. Both are tunable with the variables listed below.
+"""
+import os
+import sqlite3
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_DATABASE_URL = 'sqlite:///medical_reports.db'
+
+# SQLite: WAL lets readers run alongside the single writer, NORMAL sync is safe with WAL,
+# and busy_timeout makes concurrent writers wait for the lock instead of failing
+SQLITE_PRAGMA_DEFAULTS = {
+    'journal_mode': ('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': ('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': ('SQLITE_BUSY_TIMEOUT_MS', '5000'),
+    'mmap_size': ('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': ('SQLITE_CACHE_SIZE', '-65536'),  # negative means KiB, so 64 MiB
+}
+
+# PostgreSQL pool sizing per web worker
+POSTGRES_POOL_DEFAULTS = {
+    'pool_size': ('DB_POOL_SIZE', 5),
+    'max_overflow': ('DB_MAX_OVERFLOW', 10),
+    'pool_timeout': ('DB_POOL_TIMEOUT', 30),
+    'pool_recycle': ('DB_POOL_RECYCLE', 1800),
+}
+
+
+def get_database_url() -> str:
+    url = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def get_sqlite_pragmas() -> Dict[str, str]:
+    return {pragma: os.getenv(env, default) for pragma, (env, default) in SQLITE_PRAGMA_DEFAULTS.items()}
+
+
+def get_engine_options(url: str) -> Dict[str, Any]:
+    """SQLAlchemy engine options for the backend named by url."""
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        # Pool recycling and pre-ping only matter for server connections
+        return {'connect_args': {'timeout': int(get_sqlite_pragmas()['busy_timeout']) / 1000}}
+    if backend == 'postgresql':
+        options = {name: int(os.getenv(env, default)) for name, (env, default) in POSTGRES_POOL_DEFAULTS.items()}
+        options['pool_pre_ping'] = True
+        return options
+    return {'pool_pre_ping': True}
+
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite pragma profile to every new connection of any engine."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in get_sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
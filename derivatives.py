@@ -0,0 +1,73 @@
+"""
+Thumbnail and preview generation for report files. Pure functions with no app imports,
+so they can run on the extraction process pool as well as inline in a request.
+"""
+import os
+import tempfile
+
+# Longest edge in pixels for each derivative size
+DERIVATIVE_SIZES = {'small': 160, 'medium': 480, 'large': 1200}
+PREVIEWABLE_TYPES = {'pdf', 'png', 'jpg', 'jpeg', 'gif'}
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+FORMAT_MIMETYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def webp_supported() -> bool:
+    from PIL import features
+    return features.check('webp')
+
+
+def derivative_path(folder: str, report_id: int, size: str, image_format: str) -> str:
+    return os.path.join(folder, f"{report_id}_{size}.{FORMAT_EXTENSIONS[image_format]}")
+
+
+def _load_pdf_first_page(file_path: str, max_px: int):
+    import fitz
+    from PIL import Image
+
+    with fitz.open(file_path) as document:
+        page = document[0]
+        # Render straight at the target size instead of rasterizing at full resolution
+        scale = max_px / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def _load_image(file_path: str, max_px: int):
+    from PIL import Image, ImageOps
+
+    image = Image.open(file_path)
+    # Let the JPEG decoder downscale while decoding; a 12 MB photo never decodes at full size
+    image.draft('RGB', (max_px, max_px))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_px, max_px))
+    return image
+
+
+def render_derivative(file_path: str, file_type: str, dest_path: str,
+                      size: str = 'small', image_format: str = 'JPEG') -> str:
+    """Write a thumbnail of the file (first page for PDFs) to dest_path and return the path."""
+    file_type = file_type.lower()
+    if file_type not in PREVIEWABLE_TYPES:
+        raise ValueError(f"No preview available for .{file_type} files")
+    max_px = DERIVATIVE_SIZES[size]
+
+    if file_type == 'pdf':
+        image = _load_pdf_first_page(file_path, max_px)
+    else:
+        image = _load_image(file_path, max_px)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    # Write to a temporary file and rename, so concurrent requests never see a partial image
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, format=image_format, quality=80, optimize=True)
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest_path
@@ -0,0 +1,69 @@
+import os
+import mimetypes
+from flask import current_app, send_file, Response
+from app import get_setting
+
+DELIVERY_MODES = ('direct', 'x-accel', 'x-sendfile')
+DEFAULT_X_ACCEL_PREFIX = '/protected-uploads/'
+
+
+def get_delivery_mode() -> str:
+    mode = get_setting('DOWNLOAD_DELIVERY', 'direct').lower()
+    if mode not in DELIVERY_MODES:
+        raise ValueError(f"Unknown DOWNLOAD_DELIVERY mode {mode!r}; expected one of {', '.join(DELIVERY_MODES)}")
+    return mode
+
+
+def report_file_path(report) -> str:
+    """Absolute path of a report's file: its stored name under UPLOAD_FOLDER."""
+    return os.path.abspath(os.path.join(current_app.config['UPLOAD_FOLDER'], os.path.basename(report.file_path)))
+
+
+def private_revalidate(response: Response) -> Response:
+    # Medical files may sit in the browser cache, but never in shared caches, and must be
+    # revalidated each time so a revoked doctor gets a 403 rather than a cached copy
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def send_report_file(report) -> Response:
+    """
+    Deliver a report file after the caller has checked permissions.
+
+    DOWNLOAD_DELIVERY selects how:
+    - direct: the worker streams the file, answering conditional (ETag/Last-Modified -> 304)
+      and Range (-> 206) requests itself.
+    - x-accel: an empty response with X-Accel-Redirect under X_ACCEL_PREFIX; nginx serves the
+      bytes (including ranges and validators) from an `internal` location.
+    - x-sendfile: an X-Sendfile header with the absolute path, for Apache/lighttpd.
+    Raises FileNotFoundError when the file is missing.
+    """
+    path = report_file_path(report)
+    filename = os.path.basename(path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+
+    mode = get_delivery_mode()
+    if mode == 'x-accel':
+        prefix = get_setting('X_ACCEL_PREFIX', DEFAULT_X_ACCEL_PREFIX)
+        response = Response(mimetype=mimetypes.guess_type(report.file_name)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + filename
+        response.headers.set('Content-Disposition', 'attachment', filename=report.file_name)
+        return private_revalidate(response)
+
+    if mode == 'x-sendfile':
+        response = Response(mimetype=mimetypes.guess_type(report.file_name)[0] or 'application/octet-stream')
+        response.headers['X-Sendfile'] = path
+        response.headers.set('Content-Disposition', 'attachment', filename=report.file_name)
+        return private_revalidate(response)
+
+    response = send_file(
+        path,
+        as_attachment=True,
+        download_name=report.file_name,
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
+    return private_revalidate(response)
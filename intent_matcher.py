@@ -0,0 +1,214 @@
+"""
+Compiled intent and disease matcher for chatbot queries.
+
+Every disease term, synonym and intent phrase goes into a single Aho-Corasick automaton
+that is built once per process, on first use. A query is normalized and scanned in one
+pass, so matching costs O(query length + matches) however large the vocabulary grows.
+Only whole-word matches count ("heart" does not match "heartburn"), and overlapping
+matches resolve to the leftmost, longest term ("high blood pressure" beats "blood").
+"""
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'disease_vocabulary.txt')
+
+# (phrase, weight) per role and intent. The highest total wins; ties go to the earlier intent
+INTENT_PHRASES = {
+    'doctor': {
+        'search': [('show', 2), ('find', 2), ('list', 2), ('search', 2), ('display', 1), ('look up', 2),
+                   ('which patients', 2), ('who has', 1), ('patients with', 1)],
+        'count': [('count', 3), ('how many', 3), ('total', 2), ('number of', 3), ('statistics', 2),
+                  ('stats', 2)],
+        'help': [('help', 3), ('commands', 3), ('what can you do', 3)],
+    },
+    'patient': {
+        'help': [('help', 3), ('commands', 3), ('options', 3), ('what can you do', 3)],
+        # Access questions usually also say "my reports", so these outweigh the reports phrases
+        'access': [('which doctors', 4), ('who has access', 4), ('who can see', 4), ('doctors with access', 4),
+                   ('which doctor', 4), ('have access', 2), ('has access', 2), ('can see', 2)],
+        'latest': [('latest', 3), ('most recent', 3), ('newest', 3), ('last report', 3), ('last upload', 3)],
+        'reports': [('my reports', 3), ('my records', 3), ('my report', 3), ('my record', 3),
+                    ('recent reports', 3), ('reports', 1)],
+    },
+}
+
+# A number only counts as a patient id when it is introduced as one
+_PATIENT_ID_RE = re.compile(r'\b(?:patient(?:\s+id)?|id)\s*(?:#|no\.?|number)?\s*(\d+)\b|#(\d+)\b')
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse punctuation and whitespace runs into single spaces."""
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def load_vocabulary(path: str) -> Dict[str, List[str]]:
+    """Read 'canonical: synonym, synonym' lines into {canonical: [terms]}; # starts a comment."""
+    vocabulary = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            canonical, _, synonyms = line.partition(':')
+            canonical = canonical.strip().lower()
+            terms = [canonical] + [term.strip() for term in synonyms.split(',') if term.strip()]
+            vocabulary.setdefault(canonical, []).extend(terms)
+    return vocabulary
+
+
+class AhoCorasick:
+    """Multi-pattern string automaton; each pattern carries an arbitrary list of payloads."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]  # (pattern length, payload)
+        self._built = False
+
+    def add(self, pattern: str, payload) -> None:
+        if self._built:
+            raise RuntimeError('Cannot add patterns after the automaton is built')
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), payload))
+
+    def build(self) -> 'AhoCorasick':
+        """Compute failure links breadth-first and merge the outputs reachable through them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                # Children of the root fail back to the root itself
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, payload) for every occurrence of every pattern in text."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in output[state]:
+                yield position + 1 - length, position + 1, payload
+
+
+@dataclass
+class QueryMatch:
+    intent: Optional[str]
+    scores: Dict[str, int] = field(default_factory=dict)
+    diseases: List[str] = field(default_factory=list)
+    patient_id: Optional[int] = None
+
+
+class QueryMatcher:
+    """Disease entities and per-role intents for a query, from one automaton scan."""
+
+    def __init__(self, vocabulary: Dict[str, List[str]], intents: Dict[str, Dict[str, list]] = INTENT_PHRASES):
+        self.vocabulary = vocabulary
+        self.intents = intents
+        self.automaton = AhoCorasick()
+        for canonical, terms in vocabulary.items():
+            for term in set(normalize(term) for term in terms):
+                if term:
+                    self.automaton.add(term, ('disease', canonical))
+        for role, role_intents in intents.items():
+            for intent, phrases in role_intents.items():
+                for phrase, weight in phrases:
+                    self.automaton.add(normalize(phrase), ('intent', (role, intent, weight)))
+        self.automaton.build()
+
+    @classmethod
+    def from_files(cls, *paths: str) -> 'QueryMatcher':
+        """Matcher over several vocabulary files; a concept repeated in a later file gains its synonyms."""
+        vocabulary = {}
+        for path in paths:
+            for canonical, terms in load_vocabulary(path).items():
+                vocabulary.setdefault(canonical, []).extend(terms)
+        return cls(vocabulary)
+
+    @property
+    def term_count(self) -> int:
+        return sum(len(terms) for terms in self.vocabulary.values())
+
+    def _whole_word_matches(self, text: str):
+        for start, end, payload in self.automaton.iter_matches(text):
+            if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                yield start, end, payload
+
+    def diseases_in(self, text: str) -> List[str]:
+        """Canonical diseases mentioned in text, in order, using leftmost-longest matching."""
+        text = normalize(text)
+        spans = [(start, end, canonical) for start, end, (kind, canonical) in self._whole_word_matches(text)
+                 if kind == 'disease']
+        spans.sort(key=lambda span: (span[0], span[0] - span[1]))
+
+        diseases = []
+        covered_until = 0
+        for start, end, canonical in spans:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if canonical not in diseases:
+                diseases.append(canonical)
+        return diseases
+
+    def match(self, query: str, role: str) -> QueryMatch:
+        text = normalize(query)
+        scores = {}
+        for _, _, (kind, value) in self._whole_word_matches(text):
+            if kind == 'intent' and value[0] == role:
+                scores[value[1]] = scores.get(value[1], 0) + value[2]
+
+        intent = None
+        for candidate in self.intents.get(role, {}):
+            if scores.get(candidate, 0) > scores.get(intent, 0):
+                intent = candidate
+
+        id_match = _PATIENT_ID_RE.search(query.lower())
+        patient_id = int(id_match.group(1) or id_match.group(2)) if id_match else None
+        return QueryMatch(intent=intent, scores=scores, diseases=self.diseases_in(text), patient_id=patient_id)
+
+
+def get_vocabulary_paths() -> List[str]:
+    """
+    CHATBOT_VOCABULARY lists vocabulary files separated by os.pathsep, e.g. the shipped list
+    plus a site-specific one exported from ICD-10; unset means the shipped list alone.
+    """
+    value = os.getenv('CHATBOT_VOCABULARY')
+    return [path for path in value.split(os.pathsep) if path] if value else [DEFAULT_VOCABULARY_PATH]
+
+
+_matcher_lock = threading.Lock()
+_matcher: Optional[QueryMatcher] = None
+
+
+def get_matcher() -> QueryMatcher:
+    """This process's matcher, built from the configured vocabulary files on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = QueryMatcher.from_files(*get_vocabulary_paths())
+    return _matcher
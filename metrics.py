@@ -0,0 +1,343 @@
+"""
+Request, database, LLM and upload metrics in the Prometheus text format.
+
+Each worker process records into its own in-memory registry and periodically writes a
+snapshot to METRICS_DIR as <pid>-<start time>.json. /metrics merges every snapshot in the
+directory, so counters and histograms add up across all Gunicorn workers however the
+scrape is routed. At each scrape the snapshots of workers that have exited (by pid) are
+folded into retired.json and deleted, so the directory holds one file per live worker while
+totals never go backwards. Liveness is checked by pid, so METRICS_DIR must not be shared
+between hosts or containers. Empty the directory before (re)starting the server, as with the
+multiprocess mode of prometheus_client.
+"""
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pid checks or file locks, exited snapshots are kept
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'srhs_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.', None),
+    'srhs_http_request_duration_seconds': ('histogram', 'Time to produce a response, by endpoint.', LATENCY_BUCKETS),
+    'srhs_db_queries_per_request': ('histogram', 'SQL statements executed per request, by endpoint.',
+                                    QUERY_COUNT_BUCKETS),
+    'srhs_db_seconds_per_request': ('histogram', 'Time spent in SQL statements per request, by endpoint.',
+                                    LATENCY_BUCKETS),
+    'srhs_llm_request_duration_seconds': ('histogram', 'Upstream LLM call latency, by mode and outcome.',
+                                          LLM_BUCKETS),
+    'srhs_upload_bytes_total': ('counter', 'Bytes of report files uploaded.', None),
+    'srhs_upload_size_bytes': ('histogram', 'Size of each uploaded report file.', SIZE_BUCKETS),
+    'srhs_page_cache_requests_total': ('counter', 'Dashboard renders served from or added to the page cache.', None),
+    'srhs_audit_events_dropped_total': ('counter', 'Audit events dropped because the audit queue stayed full.',
+                                        None),
+}
+
+FLUSH_INTERVAL_SECONDS = 1.0
+RETIRED_FILENAME = 'retired.json'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    """Counters and histograms of one process, keyed by metric name and sorted label pairs."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # [count per bucket..., count above the last bucket, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self.dirty = False
+
+    def inc(self, name: str, labels: Labels, amount: float = 1) -> None:
+        with self.lock:
+            self.counters[name, labels] = self.counters.get((name, labels), 0) + amount
+            self.dirty = True
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        buckets = METRICS[name][2]
+        with self.lock:
+            values = self.histograms.get((name, labels))
+            if values is None:
+                values = self.histograms[name, labels] = [0] * (len(buckets) + 2)
+            values[bisect_left(buckets, value)] += 1
+            values[-1] += value
+            self.dirty = True
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            self.dirty = False
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self.histograms.items()]
+            }
+
+
+class MetricsStore:
+    """The registry of the current process plus the directory its snapshots are shared through."""
+
+    def __init__(self):
+        self.directory: Optional[str] = None
+        self.pid = None
+        self.registry = None
+        self.filename = None
+        self.last_flush = 0.0
+
+    def current(self) -> Registry:
+        # A forked worker starts its own registry instead of reporting the parent's numbers again
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.registry = Registry()
+            # The start time keeps a recycled pid from overwriting an exited worker's totals
+            self.filename = f"{self.pid}-{time.time_ns()}.json"
+            self.last_flush = time.monotonic()
+            _start_flusher()
+        return self.registry
+
+    def flush(self) -> None:
+        registry = self.current()
+        self.last_flush = time.monotonic()
+        directory = self.directory
+        if not directory or not registry.dirty:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp_path, os.path.join(directory, self.filename))
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self.last_flush >= FLUSH_INTERVAL_SECONDS:
+            self.flush()
+
+    def snapshots(self) -> Iterable[dict]:
+        """Every process's latest snapshot, this process's taken just now."""
+        if not self.directory:
+            yield self.current().snapshot()
+            return
+        self.flush()
+        self.retire_exited()
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                yield snapshot
+
+    def retire_exited(self) -> None:
+        """Fold the snapshots of exited workers into retired.json and delete them."""
+        if fcntl is None or not os.path.isdir(self.directory):
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            # One scraping worker at a time, so no snapshot is folded in twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited = _exited_snapshot_paths(self.directory, self.filename)
+            if not exited:
+                return
+            retired_path = os.path.join(self.directory, RETIRED_FILENAME)
+            snapshots = [_read_snapshot(path) for path in [retired_path, *exited]]
+            counters, histograms = _merge(snapshot for snapshot in snapshots if snapshot is not None)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                    'histograms': [[name, labels, values] for (name, labels), values in histograms.items()]
+                }, f)
+            os.replace(tmp_path, retired_path)
+            for path in exited:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def _read_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Replaced or removed while being read; the next scrape sees the new file
+        return None
+
+
+def _pid_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_owner(filename: str) -> Optional[Tuple[int, int]]:
+    pid, _, started = filename[:-len('.json')].partition('-')
+    return (int(pid), int(started)) if pid.isdigit() and started.isdigit() else None
+
+
+def _exited_snapshot_paths(directory: str, current: str) -> List[str]:
+    """
+    Snapshot files whose worker is gone: its pid is not running or has been reused since.
+    current is this process's file name, which may not have been written yet.
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        owner = _snapshot_owner(os.path.basename(path))
+        if owner:
+            snapshots.append((*owner, path))
+    # A recycled pid has a newer start time; only the newest file per pid can still be live
+    newest = dict([_snapshot_owner(current)])
+    for pid, started, _ in snapshots:
+        newest[pid] = max(started, newest.get(pid, started))
+    return [path for pid, started, path in snapshots if started < newest[pid] or not _pid_running(pid)]
+
+
+def _merge(snapshots: Iterable[dict]) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+    """Add up counters and histogram buckets with the same name and labels."""
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+    return counters, histograms
+
+
+store = MetricsStore()
+_flusher_pid = None
+
+
+def _start_flusher() -> None:
+    """Flush idle workers in the background so their last requests still reach /metrics."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            try:
+                store.flush()
+            except OSError:
+                pass
+
+    threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    store.current().inc(name, _labels(labels), amount)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    store.current().observe(name, _labels(labels), value)
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = ','.join(
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + pairs + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics() -> str:
+    """Merge every process's snapshot and render it in the Prometheus text exposition format."""
+    counters, histograms = _merge(store.snapshots())
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+    return '\n'.join(lines) + '\n'
+
+
+# The start time lives on the statement's execution context, so a statement that raises
+# leaves nothing behind on the (pooled) connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    sql = g.get('_metrics_sql') if g else None
+    if sql is not None and started is not None:
+        sql[0] += 1
+        sql[1] += time.perf_counter() - started
+
+
+def init_metrics(app) -> None:
+    """Record latency, status and SQL usage for every request the app handles."""
+    directory = app.config.get('METRICS_DIR') or os.getenv('METRICS_DIR') or \
+        os.path.join(app.instance_path, 'metrics')
+    store.directory = directory
+    store.pid = None
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        g._metrics_sql = [0, 0.0]
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('_metrics_started', None)
+        sql = g.pop('_metrics_sql', None)
+        if started is None:
+            return response
+        # Unmatched URLs share one label so scanners cannot create unbounded series
+        endpoint = request.endpoint or 'unmatched'
+        inc('srhs_http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        # For streamed responses this is the time to the first byte, not to the end of the stream
+        observe('srhs_http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+        observe('srhs_db_queries_per_request', sql[0], endpoint=endpoint)
+        observe('srhs_db_seconds_per_request', sql[1], endpoint=endpoint)
+        store.maybe_flush()
+        return response
+
+    atexit.register(lambda: store.flush() if store.pid == os.getpid() else None)
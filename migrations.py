@@ -0,0 +1,124 @@
+"""
+Versioned schema migrations for changes db.create_all() cannot make to existing tables.
+
+Each migration is a (version, description, function) entry in MIGRATIONS and runs once,
+inside its own transaction, in version order. Applied versions are recorded in the
+schema_migrations table. Fresh databases already get the current schema from create_all()
+and then run every migration too, so migrations must be idempotent (IF NOT EXISTS).
+
+Nothing here runs at startup: `flask init-db` creates or upgrades the whole schema and
+`flask migrate` applies pending migrations only.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from app import db
+
+_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+
+def _add_hot_path_indexes(connection) -> None:
+    # Dashboard, chatbot and analytics queries filter reports by patient newest first,
+    # and doctor-side queries walk a doctor's grants before joining patients
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medical_report_patient_date "
+        "ON medical_report (patient_id, upload_date DESC)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_doctor_access_doctor_patient "
+        "ON doctor_access (doctor_id, patient_id)"
+    ))
+
+
+def _add_id_to_patient_report_index(connection) -> None:
+    # Keyset pages order by (upload_date, id); with id in the index they need no sort step
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medical_report_patient_date_id "
+        "ON medical_report (patient_id, upload_date DESC, id DESC)"
+    ))
+    connection.execute(text("DROP INDEX IF EXISTS ix_medical_report_patient_date"))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Indexes for per-patient report and per-doctor access lookups', _add_hot_path_indexes),
+    (2, 'Include id in the per-patient report index for keyset pagination', _add_id_to_patient_report_index),
+]
+
+
+def applied_versions(connection) -> set:
+    connection.execute(text(_MIGRATIONS_TABLE_SQL))
+    return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(connection) -> List[Tuple[int, str, Callable]]:
+    done = applied_versions(connection)
+    return [migration for migration in sorted(MIGRATIONS, key=lambda m: m[0]) if migration[0] not in done]
+
+
+def run_migrations() -> List[int]:
+    """Apply every pending migration in order and return the versions applied."""
+    applied = []
+    with db.engine.connect() as connection:
+        with connection.begin():
+            pending = pending_migrations(connection)
+        for version, description, migrate in pending:
+            with connection.begin():
+                migrate(connection)
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, description, applied_at) "
+                         "VALUES (:version, :description, :applied_at)"),
+                    {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+                )
+            applied.append(version)
+    return applied
+
+
+def init_db() -> List[int]:
+    """Create missing tables, apply pending migrations and build derived tables and indexes."""
+    from data_access import ensure_disease_counts
+    from search import ensure_search_index
+    from patient_summary import ensure_patient_summaries
+    db.create_all()
+    applied = run_migrations()
+    # Populate materialized disease counts for databases created before the table existed
+    ensure_disease_counts()
+    # Likewise the per-patient chatbot summaries
+    ensure_patient_summaries()
+    # Full-text search index over report contents, kept in sync by triggers
+    ensure_search_index()
+    return applied
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database schema, or bring an existing database up to date. Safe to rerun."""
+    applied = init_db()
+    click.echo(f"Database ready ({len(applied)} migrations applied)")
+
+
+@click.command('migrate')
+@click.option('--status', is_flag=True, help='List migrations and whether they have been applied.')
+@with_appcontext
+def migrate_command(status):
+    """Bring an existing database up to the current schema version."""
+    if status:
+        with db.engine.begin() as connection:
+            done = applied_versions(connection)
+        for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+            click.echo(f"{version:4d}  {'applied' if version in done else 'pending':8s} {description}")
+        return
+
+    applied = run_migrations()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        click.echo("Database schema is up to date")
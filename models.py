@@ -34,6 +34,10 @@ class MedicalReport(db.Model):
     def __repr__(self):
         return f'<MedicalReport {self.disease_name}>'
 
+# Existing databases get these indexes from migrations.py; keep the two in step
+db.Index('ix_medical_report_patient_date_id', MedicalReport.patient_id, MedicalReport.upload_date.desc(),
+         MedicalReport.id.desc())
+
 class DoctorAccess(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -41,7 +45,93 @@ class DoctorAccess(db.Model):
     granted_date = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Ensure a patient can't grant access to the same doctor twice
-    __table_args__ = (db.UniqueConstraint('patient_id', 'doctor_id', name='unique_patient_doctor_access'),)
+    __table_args__ = (
+        db.UniqueConstraint('patient_id', 'doctor_id', name='unique_patient_doctor_access'),
+        db.Index('ix_doctor_access_doctor_patient', 'doctor_id', 'patient_id'),
+    )
     
     def __repr__(self):
         return f'<DoctorAccess Patient:{self.patient_id} Doctor:{self.doctor_id}>'
+
+class PatientDiseaseCount(db.Model):
+    """Materialized number of reports per patient and disease, kept in step with MedicalReport."""
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    disease_name = db.Column(db.String(100), primary_key=True)
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PatientDiseaseCount Patient:{self.patient_id} {self.disease_name}={self.report_count}>'
+
+class PatientSummary(db.Model):
+    """
+    Compact JSON summary of one patient's reports and grants for the patient chatbot,
+    updated in the same transaction as every upload, grant and revoke (see patient_summary.py).
+    """
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<PatientSummary Patient:{self.patient_id}>'
+
+class DataVersion(db.Model):
+    """Per-user counter bumped whenever data visible to that user changes; used to validate caches."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion User:{self.user_id} v{self.version}>'
+
+class ReportExtraction(db.Model):
+    """Text extracted from a report file by the background pipeline, with its processing status."""
+    report_id = db.Column(db.Integer, db.ForeignKey('medical_report.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, done or failed
+    text = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    report = db.relationship('MedicalReport', backref=db.backref('extraction', uselist=False, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<ReportExtraction Report:{self.report_id} {self.status}>'
+
+class ReportImport(db.Model):
+    """Manifest entries already ingested by `flask import-reports`, so an interrupted import can resume."""
+    source_key = db.Column(db.String(40), primary_key=True)  # sha1 of manifest file path and patient
+    report_id = db.Column(db.Integer, db.ForeignKey('medical_report.id'), nullable=False)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReportImport {self.source_key} Report:{self.report_id}>'
+
+class AuditEvent(db.Model):
+    """Append-only record of a user viewing or downloading a patient's data, written in batches by audit.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    report_id = db.Column(db.Integer)  # no foreign key: the trail outlives deleted reports
+    action = db.Column(db.String(30), nullable=False)  # download, export, thumbnail, extraction, search, view
+    ip_address = db.Column(db.String(45))
+
+    __table_args__ = (
+        db.Index('ix_audit_event_patient_time', 'patient_id', 'occurred_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<AuditEvent {self.action} Actor:{self.actor_id} Patient:{self.patient_id}>'
+
+class UserEvent(db.Model):
+    """A live dashboard event for one user, fanned out to every worker's open streams by notifications.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # report_uploaded, access_granted, access_revoked
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_user_event_user_id', 'user_id', 'id'),
+        db.Index('ix_user_event_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<UserEvent {self.kind} User:{self.user_id}>'
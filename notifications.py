@@ -0,0 +1,228 @@
+"""
+Live dashboard events, fanned out to every worker process through the database.
+
+Write routes call publish() inside their own transaction, so an event becomes visible exactly
+when the change it describes commits, and a rolled-back write publishes nothing. The
+user_event table is the broker: while a worker has open /events streams, one listener thread
+polls it every EVENTS_POLL_INTERVAL seconds for rows past the last id it has seen (a single
+indexed range query, however many streams are open) and hands each row to the streams of
+its user. The worker serving a stream therefore need not be the one that handled the write.
+
+Event ids are also the Server-Sent Events ids, so a browser that reconnects sends
+Last-Event-ID and is replayed what it missed from the table. Rows older than
+EVENTS_RETENTION seconds are pruned by the listener. Ids are taken to commit in order, as
+they do on SQLite where writes are serialized; on PostgreSQL an event committed after a
+later one can be missed by open streams, and those dashboards catch up on their next load.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import func
+from app import db, get_setting
+from models import UserEvent
+
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_RETENTION_SECONDS = 3600
+PRUNE_INTERVAL_SECONDS = 300
+POLL_BATCH_SIZE = 500
+# Events a stream may be behind before it is closed; the browser reconnects and replays from the table
+STREAM_QUEUE_SIZE = 100
+# A reconnect missing more than this many events is told to reload the page instead
+REPLAY_LIMIT = 100
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class EventStream:
+    """One open /events connection: events for its user with an id above last_id, in order."""
+
+    def __init__(self, user_id: int, last_id: int):
+        self.user_id = user_id
+        self.last_id = last_id
+        self.backlog: List[Event] = []
+        self.queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.overflowed = False
+        self.resync = False
+
+    def put(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """The next undelivered event, or None if none arrived within timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.backlog:
+                event = self.backlog.pop(0)
+            else:
+                try:
+                    event = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    return None
+            # The listener may hand over events the backlog already covered
+            if event[0] > self.last_id:
+                self.last_id = event[0]
+                return event
+
+
+class EventHub:
+    """This worker's open streams by user, and the listener thread that feeds them from user_event."""
+
+    def __init__(self, app, poll_interval: float, retention: float):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.streams: Dict[int, set] = {}
+        # Highest event id handed to the streams; None while no stream is open
+        self.last_id = None
+        self.last_prune = 0.0
+        self.thread = threading.Thread(target=self._run, name='event-listener', daemon=True)
+        self.thread.start()
+
+    def subscribe(self, stream: EventStream) -> None:
+        with self.lock:
+            self.streams.setdefault(stream.user_id, set()).add(stream)
+            if self.last_id is None:
+                self.last_id = stream.last_id
+
+    def unsubscribe(self, stream: EventStream) -> None:
+        with self.lock:
+            streams = self.streams.get(stream.user_id)
+            if streams is not None:
+                streams.discard(stream)
+                if not streams:
+                    del self.streams[stream.user_id]
+
+    def reset(self) -> None:
+        """Forget every open stream. Used between tests, whose tables restart their ids."""
+        with self.lock:
+            self.streams.clear()
+            self.last_id = None
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                if not self.streams:
+                    # The next stream to open brings its own starting point
+                    self.last_id = None
+                    continue
+            with self.app.app_context():
+                try:
+                    self._poll()
+                    if time.monotonic() - self.last_prune >= PRUNE_INTERVAL_SECONDS:
+                        self._prune()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.warning(f"Event listener poll failed: {e}")
+                finally:
+                    db.session.remove()
+
+    def _poll(self) -> None:
+        while True:
+            with self.lock:
+                last_id = self.last_id
+            if last_id is None:
+                return
+            rows = db.session.query(UserEvent.id, UserEvent.user_id, UserEvent.kind, UserEvent.payload).filter(
+                UserEvent.id > last_id
+            ).order_by(UserEvent.id).limit(POLL_BATCH_SIZE).all()
+            with self.lock:
+                # reset() may have run during the query
+                if self.last_id != last_id:
+                    return
+                for event_id, user_id, kind, payload in rows:
+                    streams = self.streams.get(user_id)
+                    if streams:
+                        event = (event_id, kind, json.loads(payload))
+                        for stream in streams:
+                            stream.put(event)
+                if rows:
+                    self.last_id = rows[-1][0]
+            if len(rows) < POLL_BATCH_SIZE:
+                return
+
+    def _prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        db.session.query(UserEvent).filter(UserEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        self.last_prune = time.monotonic()
+
+
+_hub: Optional[EventHub] = None
+_hub_pid = None
+_hub_lock = threading.Lock()
+
+
+def get_event_hub() -> EventHub:
+    """This worker's hub, started on first use so forked workers each get their own listener."""
+    global _hub, _hub_pid
+    if _hub_pid != os.getpid():
+        with _hub_lock:
+            if _hub_pid != os.getpid():
+                _hub = EventHub(
+                    current_app._get_current_object(),
+                    poll_interval=float(get_setting('EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)),
+                    retention=float(get_setting('EVENTS_RETENTION', DEFAULT_RETENTION_SECONDS))
+                )
+                _hub_pid = os.getpid()
+    return _hub
+
+
+def publish(user_ids: Iterable[int], kind: str, data: Dict[str, Any]) -> None:
+    """
+    Add an event for each of these users to the current transaction.
+    Nothing is delivered unless, and until, the caller commits.
+    """
+    payload = json.dumps(data)
+    db.session.add_all([UserEvent(user_id=user_id, kind=kind, payload=payload)
+                        for user_id in dict.fromkeys(user_ids)])
+
+
+def latest_event_id() -> int:
+    return db.session.query(func.max(UserEvent.id)).scalar() or 0
+
+
+def events_after(user_id: int, after_id: int, limit: int = REPLAY_LIMIT) -> List[Event]:
+    rows = db.session.query(UserEvent.id, UserEvent.kind, UserEvent.payload).filter(
+        UserEvent.user_id == user_id, UserEvent.id > after_id
+    ).order_by(UserEvent.id).limit(limit).all()
+    return [(event_id, kind, json.loads(payload)) for event_id, kind, payload in rows]
+
+
+def open_stream(user_id: int, last_event_id: Optional[int] = None) -> EventStream:
+    """
+    Start receiving a user's events: those after last_event_id when a browser reconnects,
+    otherwise only new ones. Already committed events come from the table, the rest from
+    the listener. Call from a request; close_stream() when the connection ends.
+    """
+    hub = get_event_hub()
+    stream = EventStream(user_id, latest_event_id() if last_event_id is None else last_event_id)
+    hub.subscribe(stream)
+    try:
+        # Read after subscribing, so an event committed in between is covered by one or the other
+        stream.backlog = events_after(user_id, stream.last_id)
+    except Exception:
+        hub.unsubscribe(stream)
+        raise
+    # Missed too much to replay; the page has to be reloaded
+    stream.resync = len(stream.backlog) >= REPLAY_LIMIT
+    return stream
+
+
+def close_stream(stream: EventStream) -> None:
+    if _hub is not None and _hub_pid == os.getpid():
+        _hub.unsubscribe(stream)
+
+
+def reset_event_streams() -> None:
+    if _hub is not None and _hub_pid == os.getpid():
+        _hub.reset()
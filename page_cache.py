@@ -0,0 +1,101 @@
+"""
+Fragment cache for the dashboards, keyed by user and data version.
+
+A dashboard's own blocks (title, content, scripts) are rendered once per data version and
+kept per worker; the write routes already bump the version of every user whose view they
+change (uploads, grants, revokes, imports). A repeat view then costs one version lookup:
+the cached blocks are dropped into base.html through cached_page.html, so navigation and
+flashed messages are still rendered per request.
+
+Each page carries a weak ETag derived from its blocks and the templates on disk. A browser
+revalidating with If-None-Match gets a 304 without any rendering, unless a flashed message
+is waiting to be shown.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Tuple
+from flask import current_app, make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from data_access import VersionedCache
+from metrics import inc as inc_metric
+
+CACHED_BLOCKS = ('title', 'content', 'scripts')
+
+# Rendered pages kept in memory per worker process
+PAGE_CACHE_SIZE = 256
+
+
+@dataclass
+class CachedPage:
+    blocks: Dict[str, Markup]
+    etag: str
+    # Whatever the view wants back on a cache hit without querying, e.g. listed patient ids
+    data: Any = None
+
+
+_page_cache = VersionedCache(PAGE_CACHE_SIZE)
+_templates_stamp = None
+
+
+def templates_stamp() -> str:
+    """Changes whenever a template file does, so pages rendered before a deploy get new ETags."""
+    global _templates_stamp
+    if _templates_stamp is None:
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        _templates_stamp = str(max(entry.stat().st_mtime_ns for entry in os.scandir(folder)))
+    return _templates_stamp
+
+
+def render_blocks(template_name: str, context: Dict[str, Any]) -> Dict[str, Markup]:
+    """Render only the named blocks of a template, with the usual Flask template globals."""
+    template = current_app.jinja_env.get_template(template_name)
+    context = dict(context)
+    current_app.update_template_context(context)
+    return {
+        name: Markup(''.join(template.blocks[name](template.new_context(context))))
+        for name in CACHED_BLOCKS if name in template.blocks
+    }
+
+
+def get_cached_page(template_name: str, key: Hashable,
+                    load: Callable[[], Tuple[Dict[str, Any], Any]]) -> CachedPage:
+    """
+    The current user's rendering of template_name, rebuilt only when their data version has
+    moved. load() runs the queries on a miss and returns (template context, data to keep).
+    """
+    rendered = []
+
+    def render() -> CachedPage:
+        context, data = load()
+        blocks = render_blocks(template_name, context)
+        digest = hashlib.sha1(f"{templates_stamp()}:{current_user.id}".encode())
+        for name in sorted(blocks):
+            digest.update(blocks[name].encode())
+        rendered.append(True)
+        return CachedPage(blocks, digest.hexdigest(), data)
+
+    page = _page_cache.get(current_user.id, render, (template_name, key))
+    inc_metric('srhs_page_cache_requests_total', template=template_name, outcome='miss' if rendered else 'hit')
+    return page
+
+
+def page_response(page: CachedPage):
+    """Serve a cached page, answering a matching If-None-Match with 304."""
+    # A pending flash must be rendered now, and that page differs from the one the browser has
+    if session.get('_flashes'):
+        return render_template('cached_page.html', blocks=page.blocks)
+
+    if request.if_none_match.contains_weak(page.etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render_template('cached_page.html', blocks=page.blocks))
+    response.set_etag(page.etag, weak=True)
+    # Browsers may keep the page but must revalidate it, since any write can change it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def clear_page_cache() -> None:
+    _page_cache.clear()
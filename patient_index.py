@@ -0,0 +1,117 @@
+import re
+from collections import Counter, OrderedDict
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterable, Optional
+from app import db
+from models import User, MedicalReport, DoctorAccess
+from data_access import VersionedCache
+from intent_matcher import get_matcher
+
+# Number of doctors whose index is kept in memory per worker process
+INDEX_CACHE_SIZE = 256
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a disease name into lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class PatientIndex:
+    """
+    Inverted index over one doctor's patients.
+    Maps disease token or canonical disease concept -> patient ids and patient id ->
+    {'patient', 'reports'} record, so chatbot searches and counts are dictionary lookups
+    instead of scans.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.records = OrderedDict()
+        self.patients_by_token = {}
+        self.disease_counts = Counter()
+        self.total_reports = 0
+
+        for record in records:
+            patient_id = record['patient'].id
+            self.records[patient_id] = record
+            for report in record['reports']:
+                self.disease_counts[report.disease_name] += 1
+                self.total_reports += 1
+                for token in report.tokens | report.concepts:
+                    self.patients_by_token.setdefault(token, set()).add(patient_id)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def patients(self) -> List[Dict[str, Any]]:
+        return list(self.records.values())
+
+    def get(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        return self.records.get(patient_id)
+
+    def matching_patient_ids(self, keywords: Iterable[str]) -> set:
+        matches = set()
+        for keyword in keywords:
+            matches |= self.patients_by_token.get(keyword, set())
+        return matches
+
+    def patients_matching(self, keywords: Iterable[str]) -> List[Dict[str, Any]]:
+        """Records of patients with a report for any of the keywords, in panel order."""
+        matches = self.matching_patient_ids(keywords)
+        return [record for patient_id, record in self.records.items() if patient_id in matches]
+
+    @staticmethod
+    def reports_matching(record: Dict[str, Any], keywords: Iterable[str]) -> list:
+        keywords = set(keywords)
+        return [r for r in record['reports'] if keywords.intersection(r.tokens) or keywords.intersection(r.concepts)]
+
+
+def build_doctor_index(doctor_id: int) -> PatientIndex:
+    """Load a doctor's patients and reports in two queries and index them."""
+    patients = db.session.query(User.id, User.full_name).join(
+        DoctorAccess, DoctorAccess.patient_id == User.id
+    ).filter(DoctorAccess.doctor_id == doctor_id).order_by(DoctorAccess.granted_date, User.id).all()
+
+    report_rows = db.session.query(
+        MedicalReport.id, MedicalReport.patient_id, MedicalReport.disease_name, MedicalReport.upload_date
+    ).join(
+        DoctorAccess, DoctorAccess.patient_id == MedicalReport.patient_id
+    ).filter(DoctorAccess.doctor_id == doctor_id).order_by(MedicalReport.upload_date.desc()).all()
+
+    # Plain snapshots rather than ORM instances, so cached records never touch a closed session
+    matcher = get_matcher()
+    reports_by_patient = {}
+    for report_id, patient_id, disease_name, upload_date in report_rows:
+        reports_by_patient.setdefault(patient_id, []).append(SimpleNamespace(
+            id=report_id,
+            patient_id=patient_id,
+            disease_name=disease_name,
+            upload_date=upload_date,
+            tokens=frozenset(tokenize(disease_name)),
+            concepts=frozenset(matcher.diseases_in(disease_name))
+        ))
+
+    return PatientIndex(
+        {
+            'patient': SimpleNamespace(id=patient_id, full_name=full_name),
+            'reports': reports_by_patient.get(patient_id, [])
+        }
+        for patient_id, full_name in patients
+    )
+
+
+_index_cache = VersionedCache(INDEX_CACHE_SIZE)
+
+
+def get_doctor_index(doctor_id: int) -> PatientIndex:
+    """
+    Return the cached index for a doctor, rebuilding it only when the doctor's data version
+    has moved (bumped by upload_report, grant_access and revoke_access).
+    """
+    return _index_cache.get(doctor_id, lambda: build_doctor_index(doctor_id))
+
+
+def clear_index_cache() -> None:
+    _index_cache.clear()
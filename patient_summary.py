@@ -0,0 +1,185 @@
+"""
+Per-patient summaries that answer the patient chatbot without touching the report tables.
+
+Each patient has one patient_summary row holding, as compact JSON, their report timeline
+sorted by upload date, the latest report per disease and the doctors they granted access.
+The write paths keep it current inside their own transactions: upload_report and the bulk
+importer add reports, grant_access and revoke_access add and remove grants. A chatbot
+question therefore reads a single row, and the decoded summary is cached per worker until
+the patient's data version moves, so repeat questions cost one version lookup.
+"""
+import json
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from app import db
+from models import User, MedicalReport, DoctorAccess, PatientSummary
+from data_access import VersionedCache
+from intent_matcher import get_matcher
+from patient_index import tokenize
+
+# Number of patients whose decoded summary is kept in memory per worker process
+SUMMARY_CACHE_SIZE = 1024
+
+ReportEntry = namedtuple('ReportEntry', 'upload_date id disease_name')
+GrantEntry = namedtuple('GrantEntry', 'access_id doctor_id doctor_name granted_date')
+
+
+class RecordSummary:
+    """
+    One patient's report timeline (oldest first, by upload date then id), latest report per
+    disease name and current grants. Lookups by date range are binary searches.
+    """
+
+    def __init__(self, reports: Iterable[ReportEntry] = (), grants: Iterable[GrantEntry] = ()):
+        self.reports: List[ReportEntry] = sorted(reports)
+        self.latest: Dict[str, ReportEntry] = {}
+        for report in self.reports:
+            self.latest[report.disease_name] = report
+        self.grants: List[GrantEntry] = sorted(grants, key=lambda grant: (grant.granted_date, grant.access_id))
+        self._terms = {}
+
+    @classmethod
+    def from_json(cls, text: str) -> 'RecordSummary':
+        data = json.loads(text)
+        summary = cls.__new__(cls)
+        summary.reports = [ReportEntry(datetime.fromisoformat(date), report_id, disease)
+                           for date, report_id, disease in data['reports']]
+        summary.latest = {disease: ReportEntry(datetime.fromisoformat(date), report_id, disease)
+                          for disease, (date, report_id) in data['latest'].items()}
+        summary.grants = [GrantEntry(access_id, doctor_id, name, datetime.fromisoformat(date))
+                          for access_id, doctor_id, name, date in data['grants']]
+        summary._terms = {}
+        return summary
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'reports': [[r.upload_date.isoformat(), r.id, r.disease_name] for r in self.reports],
+            'latest': {disease: [r.upload_date.isoformat(), r.id] for disease, r in self.latest.items()},
+            'grants': [[g.access_id, g.doctor_id, g.doctor_name, g.granted_date.isoformat()] for g in self.grants]
+        }, separators=(',', ':'))
+
+    def add_reports(self, reports: Iterable[ReportEntry]) -> None:
+        for report in reports:
+            insort(self.reports, report)
+            latest = self.latest.get(report.disease_name)
+            if latest is None or report > latest:
+                self.latest[report.disease_name] = report
+
+    def add_grant(self, grant: GrantEntry) -> None:
+        self.grants = [g for g in self.grants if g.access_id != grant.access_id] + [grant]
+
+    def remove_grant(self, access_id: int) -> None:
+        self.grants = [g for g in self.grants if g.access_id != access_id]
+
+    def reports_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[ReportEntry]:
+        """Reports uploaded in [start, end), oldest first; either bound may be open."""
+        low = bisect_left(self.reports, (start,)) if start else 0
+        high = bisect_left(self.reports, (end,)) if end else len(self.reports)
+        return self.reports[low:high]
+
+    def disease_terms(self, disease_name: str) -> frozenset:
+        """Word tokens and canonical concepts of a disease name, as the chatbot matcher reports them."""
+        terms = self._terms.get(disease_name)
+        if terms is None:
+            terms = self._terms[disease_name] = frozenset(tokenize(disease_name)) | \
+                frozenset(get_matcher().diseases_in(disease_name))
+        return terms
+
+    def matches(self, disease_name: str, keywords: Iterable[str]) -> bool:
+        return not self.disease_terms(disease_name).isdisjoint(keywords)
+
+
+def _update(changes: Dict[int, Callable[[RecordSummary], None]]) -> None:
+    """Apply each patient's change to their stored summary, creating the row if missing."""
+    rows = {row.patient_id: row for row in db.session.query(PatientSummary).filter(
+        PatientSummary.patient_id.in_(list(changes))
+    ).with_for_update()}
+    for patient_id, change in changes.items():
+        row = rows.get(patient_id)
+        summary = RecordSummary.from_json(row.data) if row else RecordSummary()
+        change(summary)
+        if row is None:
+            db.session.add(PatientSummary(patient_id=patient_id, data=summary.to_json()))
+        else:
+            row.data = summary.to_json()
+
+
+def add_reports(reports: Iterable[MedicalReport]) -> None:
+    """Add new reports to their patients' summaries. Call after a flush, before the commit."""
+    by_patient = {}
+    for report in reports:
+        by_patient.setdefault(report.patient_id, []).append(
+            ReportEntry(report.upload_date, report.id, report.disease_name))
+    if by_patient:
+        _update({patient_id: lambda summary, entries=entries: summary.add_reports(entries)
+                 for patient_id, entries in by_patient.items()})
+
+
+def add_grant(access: DoctorAccess, doctor_name: str) -> None:
+    """Add a new grant to the patient's summary. Call after a flush, before the commit."""
+    grant = GrantEntry(access.id, access.doctor_id, doctor_name, access.granted_date)
+    _update({access.patient_id: lambda summary: summary.add_grant(grant)})
+
+
+def remove_grant(access: DoctorAccess) -> None:
+    _update({access.patient_id: lambda summary: summary.remove_grant(access.id)})
+
+
+def rebuild_patient_summaries(patient_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute summaries from the report and grant tables, for all patients or only the given ones."""
+    reports = db.session.query(MedicalReport.patient_id, MedicalReport.upload_date, MedicalReport.id,
+                               MedicalReport.disease_name)
+    grants = db.session.query(DoctorAccess.patient_id, DoctorAccess.id, DoctorAccess.doctor_id, User.full_name,
+                              DoctorAccess.granted_date).join(User, User.id == DoctorAccess.doctor_id)
+    delete_query = PatientSummary.query
+    if patient_ids is not None:
+        patient_ids = list(patient_ids)
+        reports = reports.filter(MedicalReport.patient_id.in_(patient_ids))
+        grants = grants.filter(DoctorAccess.patient_id.in_(patient_ids))
+        delete_query = delete_query.filter(PatientSummary.patient_id.in_(patient_ids))
+
+    report_entries, grant_entries = {}, {}
+    for patient_id, *entry in reports:
+        report_entries.setdefault(patient_id, []).append(ReportEntry(*entry))
+    for patient_id, *entry in grants:
+        grant_entries.setdefault(patient_id, []).append(GrantEntry(*entry))
+
+    delete_query.delete(synchronize_session=False)
+    db.session.add_all([
+        PatientSummary(patient_id=patient_id, data=RecordSummary(
+            report_entries.get(patient_id, ()), grant_entries.get(patient_id, ())
+        ).to_json())
+        for patient_id in set(report_entries) | set(grant_entries)
+    ])
+
+
+def ensure_patient_summaries() -> None:
+    """Backfill the summaries once for databases that predate the table."""
+    has_summaries = db.session.query(PatientSummary.query.exists()).scalar()
+    has_data = db.session.query(MedicalReport.query.exists()).scalar() or \
+        db.session.query(DoctorAccess.query.exists()).scalar()
+    if has_data and not has_summaries:
+        rebuild_patient_summaries()
+        db.session.commit()
+
+
+_summary_cache = VersionedCache(SUMMARY_CACHE_SIZE)
+
+
+def _load_summary(patient_id: int) -> RecordSummary:
+    data = db.session.query(PatientSummary.data).filter_by(patient_id=patient_id).scalar()
+    return RecordSummary.from_json(data) if data else RecordSummary()
+
+
+def get_patient_summary(patient_id: int) -> RecordSummary:
+    """
+    Return the cached summary for a patient, reloading its row only when the patient's data
+    version has moved (bumped by the same writes that update the summary).
+    """
+    return _summary_cache.get(patient_id, lambda: _load_summary(patient_id))
+
+
+def clear_summary_cache() -> None:
+    _summary_cache.clear()
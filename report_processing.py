@@ -0,0 +1,142 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db, get_setting
+from models import MedicalReport, ReportExtraction
+from text_extraction import extract_text
+from file_delivery import report_file_path
+from derivatives import PREVIEWABLE_TYPES, derivative_path, render_derivative, webp_supported
+
+DEFAULT_EXTRACTION_WORKERS = 2
+MAX_ERROR_LENGTH = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_workers() -> int:
+    return int(get_setting('EXTRACTION_WORKERS', DEFAULT_EXTRACTION_WORKERS))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by this web worker. Uses the spawn start method so children never
+    inherit the parent's threads or open database connections.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=get_extraction_workers(),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def queue_report_extraction(report: MedicalReport) -> None:
+    """Record a pending extraction for a new report. Call before the upload transaction commits."""
+    db.session.add(ReportExtraction(report=report, status='pending'))
+
+
+def store_extraction_result(app, report_id: int, text: str = None, error: str = None) -> None:
+    """Save the outcome of an extraction job. Safe to call from pool callback threads."""
+    with app.app_context():
+        extraction = db.session.get(ReportExtraction, report_id)
+        if extraction is None:
+            extraction = ReportExtraction(report_id=report_id)
+            db.session.add(extraction)
+        extraction.status = 'failed' if error else 'done'
+        extraction.text = text
+        extraction.error = error[:MAX_ERROR_LENGTH] if error else None
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to store extraction for report {report_id}: {e}")
+
+
+def _on_extraction_done(app, report_id: int, future) -> None:
+    try:
+        store_extraction_result(app, report_id, text=future.result())
+    except Exception as e:
+        store_extraction_result(app, report_id, error=f"{type(e).__name__}: {e}")
+
+
+def submit_report_extraction(report: MedicalReport):
+    """
+    Hand a committed report to the process pool and return immediately.
+    With EXTRACTION_WORKERS = 0 the extraction runs inline instead (tests, CLI).
+    """
+    report_id = report.id
+    file_path = os.path.abspath(report.file_path)
+    # Pool callbacks run on another thread, outside this app context
+    app = current_app._get_current_object()
+
+    if get_extraction_workers() == 0:
+        try:
+            store_extraction_result(app, report_id, text=extract_text(file_path, report.file_type))
+        except Exception as e:
+            store_extraction_result(app, report_id, error=f"{type(e).__name__}: {e}")
+        return None
+
+    try:
+        future = get_executor().submit(extract_text, file_path, report.file_type)
+    except Exception as e:
+        # The row stays pending and will be picked up by `flask process-reports`
+        app.logger.error(f"Could not queue extraction for report {report_id}: {e}")
+        return None
+    future.add_done_callback(lambda f: _on_extraction_done(app, report_id, f))
+    return future
+
+
+def get_derivative_folder() -> str:
+    return current_app.config.get('DERIVATIVE_FOLDER') or os.path.join(current_app.instance_path, 'derivatives')
+
+
+def submit_thumbnail(report: MedicalReport, size: str = 'small'):
+    """Pre-render the dashboard thumbnail on the pool; requests render it lazily if this is skipped."""
+    if report.file_type not in PREVIEWABLE_TYPES or get_extraction_workers() == 0:
+        return None
+    image_format = 'WEBP' if webp_supported() else 'JPEG'
+    dest_path = derivative_path(get_derivative_folder(), report.id, size, image_format)
+    try:
+        return get_executor().submit(render_derivative, report_file_path(report),
+                                     report.file_type, dest_path, size, image_format)
+    except Exception as e:
+        current_app.logger.error(f"Could not queue thumbnail for report {report.id}: {e}")
+        return None
+
+
+@click.command('process-reports')
+@click.option('--retry-failed', is_flag=True, help='Also retry reports whose extraction failed.')
+@with_appcontext
+def process_reports_command(retry_failed):
+    """Extract text for reports that are pending, e.g. after a crash or for pre-existing uploads."""
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+
+    # Reports uploaded before the pipeline existed have no extraction row yet
+    missing = MedicalReport.query.filter(~MedicalReport.extraction.has()).all()
+    for report in missing:
+        queue_report_extraction(report)
+    db.session.commit()
+
+    reports = MedicalReport.query.join(ReportExtraction).filter(ReportExtraction.status.in_(statuses)).all()
+    if get_extraction_workers() == 0:
+        for report in reports:
+            submit_report_extraction(report)
+    else:
+        # Store results as jobs finish rather than via callbacks, so the summary below sees them all
+        jobs = {
+            get_executor().submit(extract_text, os.path.abspath(report.file_path), report.file_type): report.id
+            for report in reports
+        }
+        for future in as_completed(jobs):
+            _on_extraction_done(current_app._get_current_object(), jobs[future], future)
+
+    counts = dict(db.session.query(ReportExtraction.status, db.func.count()).group_by(ReportExtraction.status).all())
+    click.echo(f"Processed {len(reports)} reports: {counts}")
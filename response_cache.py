@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation so trivial variants share an entry."""
+    return _WHITESPACE_RE.sub(' ', query.lower()).strip().rstrip('?!. ')
+
+
+def make_cache_key(query: str, role: str, system_prompt: str, model: str) -> str:
+    raw = '\x1f'.join([normalize_query(query), role, system_prompt, model])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache(ABC):
+    """
+    Base class for chatbot answer caches; tracks hit/miss/eviction counters. Backends set
+    `backend` and implement storage in _get, _set (returning the number of evictions),
+    clear and __len__.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        evicted = self._set(key, value)
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache with per-entry expiry."""
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    LRU cache in a shared on-disk SQLite file, so every worker process benefits from
+    answers fetched by the others. Counters are per process.
+    """
+    backend = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def _get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "expires_at = excluded.expires_at, last_access = excluded.last_access",
+                (key, value, now + self.ttl, now)
+            )
+            expired = conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,)).rowcount
+            overflow = conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        return expired + overflow
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM response_cache")
+
+
+_response_cache = None
+_response_cache_configured = False
+_response_cache_lock = threading.Lock()
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    Build the cache selected by the environment:
+    CHATBOT_CACHE_BACKEND = memory (default) | sqlite | none,
+    CHATBOT_CACHE_PATH, CHATBOT_CACHE_SIZE and CHATBOT_CACHE_TTL (seconds).
+    """
+    backend = os.getenv('CHATBOT_CACHE_BACKEND', 'memory').lower()
+    max_entries = int(os.getenv('CHATBOT_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+    ttl = float(os.getenv('CHATBOT_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        path = os.getenv('CHATBOT_CACHE_PATH', os.path.join('instance', 'chatbot_cache.db'))
+        return SQLiteResponseCache(path, max_entries, ttl)
+    return MemoryResponseCache(max_entries, ttl)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    global _response_cache, _response_cache_configured
+    if not _response_cache_configured:
+        with _response_cache_lock:
+            if not _response_cache_configured:
+                _response_cache = create_response_cache()
+                _response_cache_configured = True
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replace the process-wide cache (used by tests and custom deployments)."""
+    global _response_cache, _response_cache_configured
+    _response_cache = cache
+    _response_cache_configured = True
@@ -1,24 +1,62 @@
 import os
+import json
+import time
 import secrets
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, current_app
+from datetime import datetime, timedelta
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_file, current_app, Response, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from sqlalchemy import func
-from app import app, db
+from sqlalchemy import func, select
+from app import db, get_setting
 from models import User, MedicalReport, DoctorAccess
 from chatbot import process_chatbot_query
+from data_access import get_doctor_dashboard_data, get_doctor_disease_stats, get_patient_report_count, increment_disease_count, touch_patient_data, \
+    get_doctor_patients_page, get_reports_page, get_patient_report_stats, current_month_start, REPORT_FIELDS, REPORTS_PER_PAGE
+from patient_index import get_doctor_index
+from patient_summary import get_patient_summary, add_reports, add_grant, remove_grant
+from response_cache import get_response_cache
+from report_processing import queue_report_extraction, submit_report_extraction, submit_thumbnail, get_derivative_folder
+from derivatives import DERIVATIVE_SIZES, PREVIEWABLE_TYPES, FORMAT_MIMETYPES, derivative_path, render_derivative, webp_supported
+from search import search_reports, search_supported, SEARCH_RESULTS_PER_PAGE
+from file_delivery import send_report_file, private_revalidate, report_file_path
+from authz_cache import has_grant
+from zip_export import stream_record_zip
+from metrics import inc as inc_metric, observe as observe_metric, render_metrics
+from page_cache import get_cached_page, page_response
+from audit import record_access, record_accesses, get_access_history
+from notifications import publish, open_stream, close_stream
+from analytics import get_doctor_analytics, PERIODS as ANALYTICS_PERIODS, DEFAULT_TOP_DISEASES, MAX_TOP_DISEASES
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
 
+# Live dashboard event streams (/events)
+EVENTS_STREAM_SECONDS = 120
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+
+# (rule, view, options) of every view below, added to an app by init_routes()
+_routes = []
+
+def route(rule, **options):
+    """Like app.route, but records the view so create_app() can register it on any app."""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def init_routes(app):
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/')
+@route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -67,7 +105,7 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -93,68 +131,74 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('index'))
 
-@app.route('/patient_dashboard')
+@route('/patient_dashboard')
 @login_required
 def patient_dashboard():
     if current_user.role != 'patient':
         flash('Access denied. Patients only.', 'error')
         return redirect(url_for('index'))
     
-    # Get patient's reports
-    reports = MedicalReport.query.filter_by(patient_id=current_user.id).order_by(MedicalReport.upload_date.desc()).all()
-    
-    # Get granted accesses
-    granted_accesses = db.session.query(DoctorAccess, User).join(
-        User, DoctorAccess.doctor_id == User.id
-    ).filter(DoctorAccess.patient_id == current_user.id).all()
-    
-    return render_template('patient_dashboard.html', reports=reports, granted_accesses=granted_accesses)
+    cursor = request.args.get('cursor')
+    month_start = current_month_start()
+
+    def load():
+        # First page of reports only; the dashboard lazy-loads the rest from /api/reports
+        reports_page = get_reports_page([current_user.id], cursor=cursor)
+        stats = get_patient_report_stats(current_user.id, month_start)
+
+        # Get granted accesses
+        granted_accesses = db.session.query(DoctorAccess, User).join(
+            User, DoctorAccess.doctor_id == User.id
+        ).filter(DoctorAccess.patient_id == current_user.id).all()
+
+        return dict(reports=reports_page['reports'], next_cursor=reports_page['next_cursor'], stats=stats,
+                    granted_accesses=granted_accesses, previewable_types=PREVIEWABLE_TYPES), None
+
+    # Rendered once per data version; uploads, grants and revokes bump it. "Reports this month"
+    # also changes when the month does, so the month is part of the key
+    try:
+        page = get_cached_page('patient_dashboard.html', (cursor, month_start), load)
+    except ValueError:
+        return redirect(url_for('patient_dashboard'))
+    return page_response(page)
 
-@app.route('/doctor_dashboard')
+@route('/doctor_dashboard')
 @login_required
 def doctor_dashboard():
     if current_user.role != 'doctor':
         flash('Access denied. Doctors only.', 'error')
         return redirect(url_for('index'))
     
-    # Get patients who granted access to this doctor
-    patient_accesses = db.session.query(DoctorAccess, User).join(
-        User, DoctorAccess.patient_id == User.id
-    ).filter(DoctorAccess.doctor_id == current_user.id).all()
-    
-    # Get reports for each patient
-    patients_data = []
-    for access, patient in patient_accesses:
-        reports = MedicalReport.query.filter_by(patient_id=patient.id).order_by(MedicalReport.upload_date.desc()).all()
-        patients_data.append({
-            'patient': patient,
-            'reports': reports,
-            'access_date': access.granted_date
-        })
-    
-    # Analytics data
-    total_patients = len(patients_data)
-    
-    # Disease statistics
-    disease_stats = {}
-    for patient_data in patients_data:
-        for report in patient_data['reports']:
-            disease = report.disease_name
-            disease_stats[disease] = disease_stats.get(disease, 0) + 1
-    
-    return render_template('doctor_dashboard.html', 
-                         patients_data=patients_data, 
-                         total_patients=total_patients,
-                         disease_stats=disease_stats)
+    cursor = request.args.get('cursor')
+
+    def load():
+        # First page of patients only; the dashboard lazy-loads the rest from /api/patients
+        dashboard_data = get_doctor_dashboard_data(current_user.id, cursor=cursor)
+        context = dict(patients_data=dashboard_data['patients_data'],
+                       total_patients=dashboard_data['total_patients'],
+                       total_reports=dashboard_data['total_reports'],
+                       disease_stats=dashboard_data['disease_stats'],
+                       next_cursor=dashboard_data['next_cursor'],
+                       previewable_types=PREVIEWABLE_TYPES)
+        return context, [data['patient'].id for data in dashboard_data['patients_data']]
 
-@app.route('/upload_report', methods=['GET', 'POST'])
+    # Rendered once per data version; uploads, grants and revokes bump it
+    try:
+        page = get_cached_page('doctor_dashboard.html', cursor, load)
+    except ValueError:
+        return redirect(url_for('doctor_dashboard'))
+    # Cached views are still views of these patients' records
+    audit_access(page.data, 'view')
+    return page_response(page)
+
+@route('/upload_report', methods=['GET', 'POST'])
 @login_required
 def upload_report():
     if current_user.role != 'patient':
@@ -186,6 +230,7 @@ def upload_report():
             
             try:
                 file.save(file_path)
+                file_size = os.path.getsize(file_path)
                 report = MedicalReport(
                     patient_id=current_user.id,
                     disease_name=disease_name,
@@ -195,7 +240,23 @@ def upload_report():
                     file_type=filename.rsplit('.', 1)[1].lower()
                 )
                 db.session.add(report)
+                increment_disease_count(current_user.id, disease_name)
+                recipients = touch_patient_data(current_user.id)
+                queue_report_extraction(report)
+                # The event and the chatbot summary need the new report's id; both commit with it
+                db.session.flush()
+                add_reports([report])
+                publish(recipients, 'report_uploaded', {
+                    'patient_id': current_user.id,
+                    'patient_name': current_user.full_name,
+                    'report': report_json(report, REPORT_FIELDS + REPORT_LINK_FIELDS)
+                })
                 db.session.commit()
+                # Text extraction/OCR runs on the process pool; the upload returns right away
+                submit_report_extraction(report)
+                submit_thumbnail(report)
+                inc_metric('srhs_upload_bytes_total', file_size)
+                observe_metric('srhs_upload_size_bytes', file_size)
                 flash('Medical report uploaded successfully!', 'success')
                 return redirect(url_for('patient_dashboard'))
             except Exception as e:
@@ -209,7 +270,7 @@ def upload_report():
     
     return render_template('upload_report.html')
 
-@app.route('/grant_access', methods=['GET', 'POST'])
+@route('/grant_access', methods=['GET', 'POST'])
 @login_required
 def grant_access():
     if current_user.role != 'patient':
@@ -247,6 +308,11 @@ def grant_access():
                 doctor_id=doctor.id
             )
             db.session.add(access)
+            touch_patient_data(current_user.id, [doctor.id])
+            db.session.flush()
+            add_grant(access, doctor.full_name)
+            publish([current_user.id, doctor.id], 'access_granted',
+                    access_event_data(access, doctor.full_name))
             db.session.commit()
             
             flash(f'Access granted to Dr. {doctor.full_name} successfully!', 'success')
@@ -259,40 +325,356 @@ def grant_access():
     
     return render_template('grant_access.html')
 
-@app.route('/download/<int:report_id>')
+def can_access_patient(patient_id):
+    """Patients see their own records; doctors see records of patients who granted them access."""
+    if current_user.role == 'patient':
+        return patient_id == current_user.id
+    elif current_user.role == 'doctor':
+        return has_grant(current_user.id, patient_id)
+    return False
+
+def audit_access(patient_ids, action, report_id=None):
+    """Queue audit events for another user's view of these patients' records; self-access is not logged."""
+    patient_ids = {patient_ids} if isinstance(patient_ids, int) else set(patient_ids)
+    patient_ids.discard(current_user.id)
+    if report_id is not None and patient_ids:
+        record_access(current_user.id, patient_ids.pop(), action, report_id, request.remote_addr)
+    elif patient_ids:
+        record_accesses(current_user.id, patient_ids, action, request.remote_addr)
+
+def access_event_data(access, doctor_name):
+    """
+    Payload of the access_granted and access_revoked events sent to the patient and the doctor.
+    report_count lets the doctor's dashboard adjust its totals without the patient's card.
+    """
+    return {
+        'access_id': access.id,
+        'patient_id': access.patient_id,
+        'patient_name': current_user.full_name,
+        'doctor_id': access.doctor_id,
+        'doctor_name': doctor_name,
+        'report_count': get_patient_report_count(access.patient_id)
+    }
+
+def access_denied_redirect():
+    flash('Access denied.', 'error')
+    if current_user.role == 'patient':
+        return redirect(url_for('patient_dashboard'))
+    elif current_user.role == 'doctor':
+        return redirect(url_for('doctor_dashboard'))
+    return redirect(url_for('index'))
+
+@route('/download/<int:report_id>')
 @login_required
 def download_file(report_id):
     report = MedicalReport.query.get_or_404(report_id)
     
     # Check access permissions
-    if current_user.role == 'patient':
-        if report.patient_id != current_user.id:
-            flash('Access denied.', 'error')
-            return redirect(url_for('patient_dashboard'))
-    elif current_user.role == 'doctor':
-        access = DoctorAccess.query.filter_by(
-            patient_id=report.patient_id,
-            doctor_id=current_user.id
-        ).first()
-        if not access:
-            flash('Access denied.', 'error')
-            return redirect(url_for('doctor_dashboard'))
-    else:
-        flash('Access denied.', 'error')
-        return redirect(url_for('index'))
+    if not can_access_patient(report.patient_id):
+        return access_denied_redirect()
+    audit_access(report.patient_id, 'download', report.id)
     
     try:
-        return send_from_directory(
-            current_app.config['UPLOAD_FOLDER'],
-            os.path.basename(report.file_path),
-            as_attachment=True,
-            download_name=report.file_name
-        )
+        return send_report_file(report)
     except FileNotFoundError:
         flash('File not found.', 'error')
         return redirect(request.referrer or url_for('index'))
 
-@app.route('/chatbot', methods=['POST'])
+@route('/export/<int:patient_id>')
+@login_required
+def export_record(patient_id):
+    if not can_access_patient(patient_id):
+        return access_denied_redirect()
+    audit_access(patient_id, 'export')
+    
+    # Only metadata is loaded here; file bytes are streamed chunk by chunk as the ZIP is built
+    reports = db.session.query(
+        MedicalReport.id, MedicalReport.disease_name, MedicalReport.description, MedicalReport.file_path,
+        MedicalReport.file_name, MedicalReport.file_type, MedicalReport.upload_date
+    ).filter_by(patient_id=patient_id).order_by(MedicalReport.upload_date, MedicalReport.id).all()
+    filename = f"medical-record-{patient_id}-{datetime.utcnow():%Y%m%d}.zip"
+    response = Response(stream_record_zip(reports, current_app.config['UPLOAD_FOLDER']), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+def sse_event(data, event=None, event_id=None):
+    """Format one Server-Sent Events message."""
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    if event:
+        message += f"event: {event}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def chatbot_event_stream(response):
+    """
+    Relay a chatbot answer as Server-Sent Events: one 'message' event per text fragment,
+    then a 'done' event. Keyword answers arrive as a single fragment.
+    """
+    fragments = [response] if isinstance(response, str) else response
+    # The generator outlives the request context
+    logger = current_app.logger
+
+    def generate():
+        try:
+            for fragment in fragments:
+                yield sse_event({'delta': fragment})
+        except Exception as e:
+            logger.error(f"Chatbot stream error: {e}")
+            yield sse_event({'error': 'Failed to process query'}, event='error')
+        yield sse_event({}, event='done')
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream so tokens reach the browser as they arrive
+        'X-Accel-Buffering': 'no'
+    })
+
+@route('/events')
+@login_required
+def events():
+    """
+    Server-Sent Events feed of the current user's dashboard events: report_uploaded,
+    access_granted and access_revoked. A stream ends after EVENTS_STREAM_SECONDS and the
+    browser reconnects with Last-Event-ID, so no worker thread is held indefinitely and
+    nothing published in between is lost. Not served unless LIVE_UPDATES is on.
+    """
+    if not current_app.config.get('LIVE_UPDATES'):
+        abort(404)
+    stream = open_stream(current_user.id, request.headers.get('Last-Event-ID', type=int))
+    duration = float(current_app.config.get('EVENTS_STREAM_SECONDS', EVENTS_STREAM_SECONDS))
+
+    def generate():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            if stream.resync:
+                yield sse_event({}, event='resync')
+                return
+            deadline = time.monotonic() + duration
+            # An overflowed stream just ends; the reconnect replays what it missed
+            while not stream.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                event = stream.get(timeout=min(remaining, EVENTS_KEEPALIVE_SECONDS))
+                if event is None:
+                    # A comment line, so proxies do not close an idle connection
+                    yield ": keepalive\n\n"
+                else:
+                    event_id, kind, data = event
+                    yield sse_event(data, event=kind, event_id=event_id)
+        finally:
+            close_stream(stream)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@route('/thumbnail/<int:report_id>')
+@login_required
+def report_thumbnail(report_id):
+    size = request.args.get('size', 'small')
+    if size not in DERIVATIVE_SIZES:
+        abort(404)
+    
+    report = MedicalReport.query.get_or_404(report_id)
+    if not can_access_patient(report.patient_id):
+        abort(403)
+    if report.file_type not in PREVIEWABLE_TYPES:
+        abort(404)
+    audit_access(report.patient_id, 'thumbnail', report.id)
+    
+    accepts_webp = 'image/webp' in request.headers.get('Accept', '')
+    image_format = 'WEBP' if accepts_webp and webp_supported() else 'JPEG'
+    path = derivative_path(get_derivative_folder(), report.id, size, image_format)
+    
+    if not os.path.exists(path):
+        # First request for this size: render it now and keep it for every later view
+        try:
+            render_derivative(report_file_path(report), report.file_type, path, size, image_format)
+        except Exception as e:
+            current_app.logger.error(f"Thumbnail error for report {report.id}: {e}")
+            abort(404)
+    
+    # Revalidated like report downloads, so access is rechecked on every view; an unchanged
+    # thumbnail costs a 304 rather than its bytes
+    response = send_file(path, mimetype=FORMAT_MIMETYPES[image_format], conditional=True, etag=True, max_age=0)
+    response.vary.add('Accept')
+    return private_revalidate(response)
+
+@route('/api/search')
+@login_required
+def search_api():
+    if not search_supported():
+        return jsonify({'error': 'Full-text search requires the SQLite backend'}), 501
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    
+    try:
+        results = search_reports(
+            current_user, query,
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', SEARCH_RESULTS_PER_PAGE, type=int)
+        )
+        for result in results['results']:
+            result['download_url'] = url_for('download_file', report_id=result['id'])
+        audit_access([result['patient_id'] for result in results['results']], 'search')
+        return jsonify(results)
+    except Exception as e:
+        current_app.logger.error(f"Search error: {e}")
+        return jsonify({'error': 'Failed to search reports'}), 500
+
+@route('/api/reports/<int:report_id>/extraction')
+@login_required
+def report_extraction(report_id):
+    report = MedicalReport.query.get_or_404(report_id)
+    if not can_access_patient(report.patient_id):
+        return jsonify({'error': 'Access denied'}), 403
+    audit_access(report.patient_id, 'extraction', report.id)
+    
+    extraction = report.extraction
+    if extraction is None:
+        return jsonify({'report_id': report.id, 'status': 'pending', 'text': None})
+    return jsonify({
+        'report_id': report.id,
+        'status': extraction.status,
+        'text': extraction.text,
+        'error': extraction.error,
+        'updated_at': extraction.updated_at.isoformat() if extraction.updated_at else None
+    })
+
+def parse_list_args():
+    """Cursor, page size and disease/date-range filters shared by the list APIs. Raises ValueError."""
+    def parse_date(name, end_of_day=False):
+        value = request.args.get(name, '').strip()
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value)
+        # A bare date as the upper bound includes that whole day
+        if end_of_day and len(value) == 10:
+            parsed += timedelta(days=1)
+        return parsed
+
+    return {
+        'cursor': request.args.get('cursor') or None,
+        'per_page': request.args.get('limit', REPORTS_PER_PAGE, type=int),
+        'disease': request.args.get('disease', '').strip() or None,
+        'date_from': parse_date('from'),
+        'date_to': parse_date('to', end_of_day=True)
+    }
+
+def parse_fields(allowed, default):
+    """Comma-separated ?fields= selection, validated against the allowed names."""
+    requested = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    unknown = set(requested) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested or list(default)
+
+REPORT_LINK_FIELDS = ('download_url', 'thumbnail_url')
+PATIENT_FIELDS = ('full_name', 'email', 'access_date', 'report_count', 'diseases', 'recent_reports')
+PATIENT_SUMMARY_FIELDS = {'report_count', 'diseases', 'recent_reports'}
+
+def report_json(report, fields):
+    data = {'id': report.id}
+    for field in fields:
+        if field == 'download_url':
+            data[field] = url_for('download_file', report_id=report.id)
+        elif field == 'thumbnail_url':
+            data[field] = url_for('report_thumbnail', report_id=report.id) \
+                if report.file_type in PREVIEWABLE_TYPES else None
+        elif field == 'upload_date':
+            data[field] = report.upload_date.isoformat() if report.upload_date else None
+        else:
+            data[field] = getattr(report, field)
+    return data
+
+@route('/api/reports')
+@login_required
+def reports_api():
+    try:
+        args = parse_list_args()
+        fields = parse_fields(REPORT_FIELDS + REPORT_LINK_FIELDS, REPORT_FIELDS + REPORT_LINK_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    patient_id = request.args.get('patient_id', type=int)
+    if patient_id is not None:
+        if not can_access_patient(patient_id):
+            return jsonify({'error': 'Access denied'}), 403
+        patient_ids = [patient_id]
+    elif current_user.role == 'doctor':
+        patient_ids = select(DoctorAccess.patient_id).where(DoctorAccess.doctor_id == current_user.id)
+    else:
+        patient_ids = [current_user.id]
+    
+    # thumbnail_url depends on the file type, so load it whenever links are requested
+    columns = [field for field in fields if field in REPORT_FIELDS]
+    if 'thumbnail_url' in fields and 'file_type' not in columns:
+        columns.append('file_type')
+    # The audit trail records whose reports were viewed, whatever the projection
+    if 'patient_id' not in columns:
+        columns.append('patient_id')
+    try:
+        page = get_reports_page(patient_ids, fields=columns, **args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    audit_access([report.patient_id for report in page['reports']], 'view')
+    return jsonify({
+        'reports': [report_json(report, fields) for report in page['reports']],
+        'next_cursor': page['next_cursor']
+    })
+
+@route('/api/patients')
+@login_required
+def patients_api():
+    if current_user.role != 'doctor':
+        return jsonify({'error': 'Access denied'}), 403
+    try:
+        args = parse_list_args()
+        fields = parse_fields(PATIENT_FIELDS, PATIENT_FIELDS)
+        page = get_doctor_patients_page(current_user.id, include_reports=bool(PATIENT_SUMMARY_FIELDS & set(fields)),
+                                        patient_id=request.args.get('patient_id', type=int), **args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    patients = []
+    for patient_data in page['patients_data']:
+        patient = patient_data['patient']
+        data = {'id': patient.id}
+        for field in fields:
+            if field in ('full_name', 'email'):
+                data[field] = getattr(patient, field)
+            elif field == 'access_date':
+                data[field] = patient_data['access_date'].isoformat() if patient_data['access_date'] else None
+            elif field == 'recent_reports':
+                data[field] = [report_json(report, REPORT_FIELDS + REPORT_LINK_FIELDS)
+                               for report in patient_data['recent_reports']]
+            else:
+                data[field] = patient_data[field]
+        patients.append(data)
+    audit_access([patient['id'] for patient in patients], 'view')
+    return jsonify({'patients': patients, 'next_cursor': page['next_cursor']})
+
+@route('/api/access_log')
+@login_required
+def access_log_api():
+    """The current patient's audit trail: who viewed or downloaded their records, newest first."""
+    if current_user.role != 'patient':
+        return jsonify({'error': 'Access denied'}), 403
+    try:
+        page = get_access_history(current_user.id, cursor=request.args.get('cursor') or None,
+                                  per_page=request.args.get('limit', REPORTS_PER_PAGE, type=int),
+                                  action=request.args.get('action') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+@route('/chatbot', methods=['POST'])
 @login_required
 def chatbot():
     query = request.json.get('query', '').strip()
@@ -300,36 +682,69 @@ def chatbot():
         return jsonify({'error': 'Query is required'}), 400
 
     try:
-        data_for_chatbot = []
+        data_for_chatbot = None
         if current_user.role == 'doctor':
-            # For doctors, get all accessible patients' data
-            patient_accesses = db.session.query(DoctorAccess, User).join(
-                User, DoctorAccess.patient_id == User.id
-            ).filter(DoctorAccess.doctor_id == current_user.id).all()
-            
-            for access, patient in patient_accesses:
-                reports = MedicalReport.query.filter_by(patient_id=patient.id).all()
-                data_for_chatbot.append({
-                    'patient': patient,
-                    'reports': reports
-                })
+            # For doctors, use the cached index of all accessible patients' data
+            data_for_chatbot = get_doctor_index(current_user.id)
         
         elif current_user.role == 'patient':
-            # For patients, get their own data
-            reports = MedicalReport.query.filter_by(patient_id=current_user.id).all()
-            data_for_chatbot.append({
-                'patient': current_user,
-                'reports': reports
-            })
-
-        response = process_chatbot_query(query, data_for_chatbot, current_user.role)
+            # For patients, their summary kept up to date by every upload, grant and revoke
+            data_for_chatbot = get_patient_summary(current_user.id)
+
+        stream = bool(request.json.get('stream')) or \
+            request.accept_mimetypes.best == 'text/event-stream'
+        response = process_chatbot_query(query, data_for_chatbot, current_user.role, stream=stream)
+        if stream:
+            return chatbot_event_stream(response)
         return jsonify({'response': response})
         
     except Exception as e:
         current_app.logger.error(f"Chatbot error: {e}")
         return jsonify({'error': 'Failed to process query'}), 500
 
-@app.route('/revoke_access/<int:access_id>', methods=['POST'])
+@route('/patient_chatbot', methods=['POST'])
+@login_required
+def patient_chatbot():
+    """
+    Patient assistant: own reports, latest report per disease, reports in a date range and
+    which doctors have access, answered from the patient's precomputed summary.
+    """
+    if current_user.role != 'patient':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    query = (request.get_json(silent=True) or {}).get('query', '').strip()
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    
+    try:
+        response = process_chatbot_query(query, get_patient_summary(current_user.id), 'patient')
+        return jsonify({'response': response})
+    except Exception as e:
+        current_app.logger.error(f"Patient chatbot error: {e}")
+        return jsonify({'error': 'Failed to process query'}), 500
+
+@route('/api/chatbot/cache')
+@login_required
+def chatbot_cache_stats():
+    if current_user.role != 'doctor':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    cache = get_response_cache()
+    if cache is None:
+        return jsonify({'backend': 'none'})
+    return jsonify(cache.stats())
+
+@route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint, requiring METRICS_TOKEN as a bearer token. Not served without one."""
+    token = get_setting('METRICS_TOKEN')
+    if not token:
+        abort(404)
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@route('/revoke_access/<int:access_id>', methods=['POST'])
 @login_required
 def revoke_access(access_id):
     if current_user.role != 'patient':
@@ -352,6 +767,9 @@ def revoke_access(access_id):
         doctor_name = doctor.full_name if doctor else "Unknown Doctor"
         
         # Delete the access record
+        touch_patient_data(current_user.id, [access.doctor_id])
+        remove_grant(access)
+        publish([current_user.id, access.doctor_id], 'access_revoked', access_event_data(access, doctor_name))
         db.session.delete(access)
         db.session.commit()
         
@@ -364,27 +782,15 @@ def revoke_access(access_id):
     
     return redirect(url_for('patient_dashboard'))
 
-@app.route('/api/analytics')
+@route('/api/analytics')
 @login_required
 def analytics_api():
     if current_user.role != 'doctor':
         return jsonify({'error': 'Access denied'}), 403
     
     try:
-        # Get patients who granted access to this doctor
-        patient_accesses = db.session.query(DoctorAccess, User).join(
-            User, DoctorAccess.patient_id == User.id
-        ).filter(DoctorAccess.doctor_id == current_user.id).all()
-        
-        # Disease statistics
-        disease_stats = {}
-        total_patients = len(patient_accesses)
-        
-        for access, patient in patient_accesses:
-            reports = MedicalReport.query.filter_by(patient_id=patient.id).all()
-            for report in reports:
-                disease = report.disease_name
-                disease_stats[disease] = disease_stats.get(disease, 0) + 1
+        total_patients = DoctorAccess.query.filter_by(doctor_id=current_user.id).count()
+        disease_stats = get_doctor_disease_stats(current_user.id)
         
         return jsonify({
             'total_patients': total_patients,
@@ -395,24 +801,16 @@ def analytics_api():
         current_app.logger.error(f"Analytics error: {e}")
         return jsonify({'error': 'Failed to get analytics data'}), 500
 
+@route('/api/analytics/trends')
+@login_required
+def analytics_trends_api():
+    """Uploads and new diagnoses per disease per week or month, plus disease co-occurrence."""
+    if current_user.role != 'doctor':
+        return jsonify({'error': 'Access denied'}), 403
 
+    period = request.args.get('period', 'month')
+    if period not in ANALYTICS_PERIODS:
+        return jsonify({'error': f"period must be one of: {', '.join(ANALYTICS_PERIODS)}"}), 400
+    top = min(max(request.args.get('top', DEFAULT_TOP_DISEASES, type=int), 1), MAX_TOP_DISEASES)
 
-    try:
-        # Get patient's reports
-        reports = MedicalReport.query.filter_by(patient_id=current_user.id).all()
-        # Get granted doctor accesses
-        granted_accesses = db.session.query(DoctorAccess, User).join(
-            User, DoctorAccess.doctor_id == User.id
-        ).filter(DoctorAccess.patient_id == current_user.id).all()
-        # Prepare data for chatbot logic
-        patient_data = {
-            'patient': current_user,
-            'reports': reports,
-            'granted_accesses': granted_accesses
-        }
-        from chatbot import process_patient_chatbot_query
-        response = process_patient_chatbot_query(query, patient_data)
-        return jsonify({'response': response})
-    except Exception as e:
-        current_app.logger.error(f"Patient Chatbot error: {e}")
-        return jsonify({'error': 'Failed to process query'}), 500
+    return jsonify(get_doctor_analytics(current_user.id).summary(period, top))
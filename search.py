@@ -0,0 +1,160 @@
+import re
+from typing import Dict, Any
+from sqlalchemy import text
+from app import db
+
+SEARCH_RESULTS_PER_PAGE = 20
+MAX_RESULTS_PER_PAGE = 100
+
+_SEARCH_TABLE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS report_search USING fts5(
+    patient_id UNINDEXED,
+    disease_name,
+    description,
+    extracted_text,
+    tokenize = 'porter unicode61'
+)
+"""
+
+# Triggers keep the index in step with every writer, including bulk imports and the extraction pipeline
+_SEARCH_TRIGGERS_SQL = {
+    'report_search_insert': """
+        CREATE TRIGGER report_search_insert AFTER INSERT ON medical_report BEGIN
+            INSERT INTO report_search (rowid, patient_id, disease_name, description, extracted_text)
+            VALUES (new.id, new.patient_id, new.disease_name, new.description, '');
+        END
+    """,
+    'report_search_update': """
+        CREATE TRIGGER report_search_update AFTER UPDATE OF patient_id, disease_name, description ON medical_report BEGIN
+            UPDATE report_search
+            SET patient_id = new.patient_id, disease_name = new.disease_name, description = new.description
+            WHERE rowid = new.id;
+        END
+    """,
+    'report_search_delete': """
+        CREATE TRIGGER report_search_delete AFTER DELETE ON medical_report BEGIN
+            DELETE FROM report_search WHERE rowid = old.id;
+        END
+    """,
+    'report_search_text_insert': """
+        CREATE TRIGGER report_search_text_insert AFTER INSERT ON report_extraction BEGIN
+            UPDATE report_search SET extracted_text = coalesce(new.text, '') WHERE rowid = new.report_id;
+        END
+    """,
+    'report_search_text_update': """
+        CREATE TRIGGER report_search_text_update AFTER UPDATE OF text ON report_extraction BEGIN
+            UPDATE report_search SET extracted_text = coalesce(new.text, '') WHERE rowid = new.report_id;
+        END
+    """,
+}
+
+_REBUILD_SQL = """
+INSERT INTO report_search (rowid, patient_id, disease_name, description, extracted_text)
+SELECT r.id, r.patient_id, r.disease_name, r.description, coalesce(e.text, '')
+FROM medical_report r LEFT JOIN report_extraction e ON e.report_id = r.id
+"""
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_supported() -> bool:
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_search_index() -> None:
+    """
+    Create the FTS5 table and its sync triggers if missing. When the triggers had to be
+    (re)created the index cannot be trusted, so it is rebuilt from the report tables.
+    """
+    if not search_supported():
+        return
+
+    existing = {row[0] for row in db.session.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'report_search_%'")
+    )}
+    db.session.execute(text(_SEARCH_TABLE_SQL))
+    missing = [name for name in _SEARCH_TRIGGERS_SQL if name not in existing]
+    for name in missing:
+        db.session.execute(text(_SEARCH_TRIGGERS_SQL[name]))
+    if missing:
+        db.session.execute(text("DELETE FROM report_search"))
+        db.session.execute(text(_REBUILD_SQL))
+    db.session.commit()
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 expression: every word must match, and the last word
+    is treated as a prefix so partial input still finds results.
+    """
+    words = _WORD_RE.findall(query.lower())
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_reports(user, query: str, page: int = 1,
+                   per_page: int = SEARCH_RESULTS_PER_PAGE) -> Dict[str, Any]:
+    """
+    Ranked full-text search over report disease names, descriptions and extracted text.
+    Doctors search their granted patients' reports; patients search their own.
+    """
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MAX_RESULTS_PER_PAGE)
+    match = build_match_query(query)
+    result = {'query': query, 'page': page, 'per_page': per_page, 'total': 0, 'results': []}
+    if not match:
+        return result
+
+    if user.role == 'doctor':
+        scope_join = "JOIN doctor_access da ON da.patient_id = report_search.patient_id AND da.doctor_id = :user_id"
+        scope_filter = ""
+    else:
+        scope_join = ""
+        scope_filter = "AND report_search.patient_id = :user_id"
+
+    params = {'match': match, 'user_id': user.id, 'limit': per_page, 'offset': (page - 1) * per_page}
+
+    # One scan of the matches, already narrowed to the user's patients, yields both the page
+    # and the total. The rank is materialized first because bm25() cannot run beside a window
+    # function, and snippets are only built for the rows on the page.
+    rows = db.session.execute(text(f"""
+        WITH matches AS MATERIALIZED (
+            SELECT report_search.rowid AS id, bm25(report_search, 0.0, 10.0, 4.0, 1.0) AS rank
+            FROM report_search {scope_join}
+            WHERE report_search MATCH :match {scope_filter}
+        ),
+        page AS (
+            SELECT id, rank, COUNT(*) OVER () AS total FROM matches
+            ORDER BY rank LIMIT :limit OFFSET :offset
+        )
+        SELECT r.id, r.patient_id, r.disease_name, r.file_name, r.upload_date,
+               snippet(report_search, -1, '[', ']', '...', 12) AS snippet, page.rank, page.total
+        FROM page
+        JOIN report_search ON report_search.rowid = page.id
+        JOIN medical_report r ON r.id = page.id
+        WHERE report_search MATCH :match
+        ORDER BY page.rank
+    """).columns(upload_date=db.DateTime), params).mappings().all()
+
+    if rows:
+        result['total'] = rows[0]['total']
+    elif page > 1:
+        # Past the last page the window has no rows to report the total on
+        result['total'] = db.session.execute(text(f"""
+            SELECT COUNT(*) FROM report_search {scope_join}
+            WHERE report_search MATCH :match {scope_filter}
+        """), params).scalar()
+
+    result['results'] = [{
+        'id': row['id'],
+        'patient_id': row['patient_id'],
+        'disease_name': row['disease_name'],
+        'file_name': row['file_name'],
+        'upload_date': row['upload_date'].isoformat() if row['upload_date'] else None,
+        'snippet': row['snippet'],
+        'rank': row['rank']
+    } for row in rows]
+    return result
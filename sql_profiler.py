@@ -0,0 +1,144 @@
+"""
+Per-request SQL profiling and N+1 detection.
+
+Enabled with SQL_PROFILING=1 or when the app runs in debug mode. Every statement a request
+executes is recorded, and statements are grouped by shape: literals, bound values and
+IN lists are normalized so `... WHERE patient_id = 3` and `... WHERE patient_id = 7` count
+as the same query. A shape repeated N_PLUS_ONE_THRESHOLD times or more in one request is
+reported as a suspected N+1. Each profiled response gets an X-SQL-Profile header and a
+log line; suspected N+1 patterns are logged as warnings with the offending statement.
+
+capture_queries() records statements the same way outside of requests, which is what the
+max_queries test fixture in tests/conftest.py is built on.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = 5
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def normalize_statement(statement: str) -> str:
+    """Shape of a statement with literals and parameter lists collapsed to placeholders."""
+    shape = _STRING_RE.sub('?', statement)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _PLACEHOLDER_LIST_RE.sub('(?)', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+@dataclass(eq=False)
+class QueryLog:
+    """Statements executed while the log was active, with their durations in seconds."""
+    statements: List[Tuple[str, float]] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(normalize_statement(statement) for statement, _ in self.statements)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Shapes executed at least threshold times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes().most_common() if count >= threshold]
+
+    def report(self) -> str:
+        lines = [f"{len(self)} queries in {self.total_time * 1000:.1f}ms"]
+        lines += [f"  {count}x {shape}" for shape, count in self.shapes().most_common()]
+        return '\n'.join(lines)
+
+
+def start_capture() -> QueryLog:
+    """Start recording the statements executed on this thread into a new log."""
+    log = QueryLog()
+    if getattr(_local, 'logs', None) is None:
+        _local.logs = []
+    _local.logs.append(log)
+    return log
+
+
+def stop_capture(log: QueryLog) -> None:
+    logs = getattr(_local, 'logs', None) or []
+    if log in logs:
+        logs.remove(log)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryLog]:
+    """Record every statement executed on this thread inside the block."""
+    log = start_capture()
+    try:
+        yield log
+    finally:
+        stop_capture(log)
+
+
+# Kept on the execution context, like the metrics timings, so a failed statement leaves nothing behind
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'logs', None) and context is not None:
+        context._profiler_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    logs = getattr(_local, 'logs', None)
+    started = getattr(context, '_profiler_started', None)
+    if not logs or started is None:
+        return
+    duration = time.perf_counter() - started
+    for log in logs:
+        log.statements.append((statement, duration))
+
+
+def init_sql_profiler(app) -> None:
+    """Profile every request when SQL_PROFILING is set or the app is in debug mode."""
+    app.config.setdefault('SQL_PROFILING', os.getenv('SQL_PROFILING', '').lower() in ('1', 'true', 'yes'))
+    app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD',
+                                                                    N_PLUS_ONE_THRESHOLD)))
+
+    @app.before_request
+    def start_sql_profile():
+        if current_app.config['SQL_PROFILING'] or current_app.debug:
+            g._sql_profile = start_capture()
+
+    @app.after_request
+    def finish_sql_profile(response):
+        log = g.pop('_sql_profile', None)
+        if log is None:
+            return response
+        stop_capture(log)
+
+        repeated = log.repeated(current_app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+        response.headers['X-SQL-Profile'] = \
+            f"queries={len(log)}; time={log.total_time * 1000:.1f}ms; repeated={len(repeated)}"
+        endpoint = request.endpoint or request.path
+        current_app.logger.info(f"SQL {endpoint}: {len(log)} queries in {log.total_time * 1000:.1f}ms")
+        for shape, count in repeated:
+            current_app.logger.warning(f"Possible N+1 in {endpoint}: {count}x {shape}")
+        return response
+
+    @app.teardown_request
+    def discard_sql_profile(exc):
+        # after_request is skipped when a request fails before a response exists
+        log = g.pop('_sql_profile', None)
+        if log is not None:
+            stop_capture(log)
@@ -66,28 +66,34 @@ class MedicalChatbot {
         this.addMessage(message, 'user');
         
         try {
-            // Send request to backend
+            // Send request to backend, asking for a streamed answer
             const response = await fetch('/chatbot', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
                 },
-                body: JSON.stringify({ query: message })
+                body: JSON.stringify({ query: message, stream: true })
             });
             
             if (!response.ok) {
                 throw new Error(`Server error: ${response.status}`);
             }
             
-            const data = await response.json();
-            
-            if (data.error) {
-                throw new Error(data.error);
+            const contentType = response.headers.get('Content-Type') || '';
+            if (response.body && contentType.includes('text/event-stream')) {
+                await this.readEventStream(response);
+            } else {
+                const data = await response.json();
+                
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                
+                // Add bot response to chat
+                this.addMessage(data.response, 'bot');
             }
             
-            // Add bot response to chat
-            this.addMessage(data.response, 'bot');
-            
         } catch (error) {
             console.error('Chatbot error:', error);
             this.addMessage(
@@ -100,6 +106,57 @@ class MedicalChatbot {
         }
     }
     
+    // Render a Server-Sent Events answer progressively as fragments arrive
+    async readEventStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let messageText = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            
+            for (const rawEvent of events) {
+                let eventName = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                });
+                
+                const payload = data ? JSON.parse(data) : {};
+                if (eventName === 'error') {
+                    throw new Error(payload.error || 'Stream failed');
+                }
+                if (eventName === 'done') {
+                    return;
+                }
+                
+                if (payload.delta) {
+                    text += payload.delta;
+                    if (!messageText) {
+                        this.removeTypingIndicator();
+                        messageText = this.addMessage(text, 'bot');
+                    } else {
+                        messageText.innerHTML = this.formatMessage(text);
+                        this.scrollToBottom();
+                    }
+                }
+            }
+        }
+    }
+    
     addMessage(content, sender, isError = false) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `chat-message ${sender}-message`;
@@ -147,11 +204,20 @@ class MedicalChatbot {
         });
         
         this.scrollToBottom();
+        return messageText;
+    }
+    
+    escapeHtml(text) {
+        const entities = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+        return String(text).replace(/[&<>"']/g, character => entities[character]);
     }
     
     formatMessage(content) {
+        // Answers quote names and LLM text, so escape them before adding our own markup
+        let formatted = this.escapeHtml(content);
+        
         // Convert line breaks to HTML
-        let formatted = content.replace(/\n/g, '<br>');
+        formatted = formatted.replace(/\n/g, '<br>');
         
         // Bold formatting for **text**
         formatted = formatted.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
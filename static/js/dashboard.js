@@ -78,3 +78,265 @@ var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggl
 var tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
     return new bootstrap.Tooltip(tooltipTriggerEl);
 });
+
+// Lazy-loading of further report and patient pages from the keyset-paginated APIs
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value == null ? '' : String(value);
+    return div.innerHTML;
+}
+
+function truncate(text, length) {
+    return text.length > length ? text.slice(0, length) + '...' : text;
+}
+
+function formatShortDate(isoDate) {
+    const date = new Date(isoDate);
+    return date.toLocaleDateString('en-US', { month: '2-digit', day: '2-digit', year: 'numeric' });
+}
+
+function formatLongDate(isoDate) {
+    const date = new Date(isoDate);
+    return date.toLocaleDateString('en-US', { month: 'long', day: '2-digit', year: 'numeric' });
+}
+
+const pageRenderers = {
+    reportRow(report) {
+        const preview = report.thumbnail_url
+            ? `<img src="${escapeHtml(report.thumbnail_url)}" alt="" loading="lazy" class="report-thumbnail me-1" width="48" height="48">`
+            : `<i class="fas fa-file-${report.file_type === 'pdf' ? 'pdf' : 'image'} me-1"></i>`;
+        return `<tr>
+            <td><span class="badge bg-light text-dark">${escapeHtml(report.disease_name)}</span></td>
+            <td><div class="report-description">${escapeHtml(truncate(report.description, 100))}</div></td>
+            <td><div class="file-info">${preview}${escapeHtml(report.file_name)}</div></td>
+            <td>${formatShortDate(report.upload_date)}</td>
+            <td>
+                <a href="${escapeHtml(report.download_url)}" class="btn btn-sm btn-outline-primary">
+                    <i class="fas fa-download me-1"></i>Download
+                </a>
+            </td>
+        </tr>`;
+    },
+
+    patientCard(patient) {
+        const reports = patient.recent_reports.map(report => `
+            <div class="report-item border-bottom py-2">
+                <div class="d-flex justify-content-between align-items-start">
+                    ${report.thumbnail_url ? `<img src="${escapeHtml(report.thumbnail_url)}" alt="" loading="lazy" class="report-thumbnail me-2" width="48" height="48">` : ''}
+                    <div class="flex-grow-1">
+                        <h6 class="mb-1 fs-6">${escapeHtml(report.disease_name)}</h6>
+                        <p class="mb-1 small text-muted">${escapeHtml(truncate(report.description, 80))}</p>
+                        <small class="text-muted">${formatShortDate(report.upload_date)}</small>
+                    </div>
+                    <div class="ms-2">
+                        <a href="${escapeHtml(report.download_url)}" class="btn btn-sm btn-outline-primary">
+                            <i class="fas fa-download"></i>
+                        </a>
+                    </div>
+                </div>
+            </div>`).join('');
+        const more = patient.report_count - patient.recent_reports.length;
+        const summary = patient.report_count ? `
+            <div class="disease-overview mb-3">
+                <h6 class="fw-semibold mb-2">Disease Overview:</h6>
+                <div class="disease-tags">
+                    ${patient.diseases.map(disease => `<span class="badge bg-light text-dark me-1 mb-1">${escapeHtml(disease)}</span>`).join('')}
+                </div>
+            </div>
+            <div class="reports-section">
+                <h6 class="fw-semibold mb-2">Recent Reports:</h6>
+                <div class="reports-list" style="max-height: 200px; overflow-y: auto;">
+                    ${reports}
+                    ${more > 0 ? `<div class="text-center py-2"><small class="text-muted">... and ${more} more reports</small></div>` : ''}
+                </div>
+            </div>` : `
+            <div class="text-center py-3">
+                <i class="fas fa-file-medical text-muted mb-2" style="font-size: 2rem; opacity: 0.3;"></i>
+                <p class="text-muted small">No reports uploaded yet</p>
+            </div>`;
+        return `<div class="col-lg-6 mb-4 patient-card" data-patient-id="${patient.id}"
+                     data-report-count="${patient.report_count}"
+                     data-diseases="${escapeHtml(patient.diseases.join(' ').toLowerCase())}">
+            <div class="card patient-info-card h-100">
+                <div class="card-header bg-light">
+                    <div class="d-flex justify-content-between align-items-center">
+                        <h6 class="mb-0 fw-semibold">
+                            <i class="fas fa-user-injured text-primary me-2"></i>${escapeHtml(patient.full_name)}
+                        </h6>
+                        <div>
+                            ${patient.report_count ? `<a href="/export/${patient.id}" class="btn btn-sm btn-outline-primary me-1" title="Export all reports"><i class="fas fa-file-archive"></i></a>` : ''}
+                            <span class="badge bg-primary">ID: ${patient.id}</span>
+                        </div>
+                    </div>
+                </div>
+                <div class="card-body">
+                    <div class="patient-overview mb-3">
+                        <p class="text-muted mb-1"><i class="fas fa-envelope me-1"></i>${escapeHtml(patient.email)}</p>
+                        <p class="text-muted mb-1"><i class="fas fa-calendar me-1"></i>Access granted: ${formatLongDate(patient.access_date)}</p>
+                        <p class="text-muted mb-3"><i class="fas fa-file-medical me-1"></i>${patient.report_count} reports</p>
+                    </div>
+                    ${summary}
+                </div>
+            </div>
+        </div>`;
+    }
+};
+
+async function loadNextPage(button) {
+    const url = new URL(button.dataset.api, window.location.origin);
+    url.searchParams.set('cursor', button.dataset.cursor);
+    const originalHtml = button.innerHTML;
+    button.classList.add('disabled');
+    button.innerHTML = '<i class="fas fa-spinner fa-spin me-1"></i>Loading...';
+
+    try {
+        const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const page = await response.json();
+        const items = page.reports || page.patients || [];
+        const render = pageRenderers[button.dataset.render];
+        document.getElementById(button.dataset.target)
+            .insertAdjacentHTML('beforeend', items.map(render).join(''));
+
+        if (page.next_cursor) {
+            button.dataset.cursor = page.next_cursor;
+            button.innerHTML = originalHtml;
+            button.classList.remove('disabled');
+        } else {
+            button.parentElement.remove();
+        }
+    } catch (error) {
+        console.error('Failed to load more items:', error);
+        button.innerHTML = originalHtml;
+        button.classList.remove('disabled');
+    }
+}
+
+document.addEventListener('click', function(event) {
+    const button = event.target.closest('.load-more');
+    if (button) {
+        event.preventDefault();
+        if (!button.classList.contains('disabled')) {
+            loadNextPage(button);
+        }
+    }
+});
+
+// Live updates pushed over Server-Sent Events by /events while a dashboard is open
+const PATIENT_CARD_FIELDS = 'full_name,email,access_date,report_count,diseases,recent_reports';
+
+function adjustLiveStat(name, delta) {
+    document.querySelectorAll(`[data-live-stat="${name}"]`).forEach(element => {
+        element.textContent = Math.max((parseInt(element.textContent, 10) || 0) + delta, 0);
+    });
+}
+
+function showLiveNotice(message, offerReload) {
+    let container = document.getElementById('liveNotices');
+    if (!container) {
+        const main = document.querySelector('.main-content');
+        container = document.createElement('div');
+        container.id = 'liveNotices';
+        container.className = 'container mt-3';
+        main.parentNode.insertBefore(container, main);
+    }
+    container.insertAdjacentHTML('beforeend', `<div class="alert alert-info alert-dismissible fade show" role="alert">
+        ${escapeHtml(message)}${offerReload ? ' <a href="" class="alert-link">Reload</a> to see it.' : ''}
+        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+    </div>`);
+}
+
+// Re-render one patient's card from /api/patients; returns false if it is not on this page.
+// The card's report count moves total_reports only when the card was already shown.
+async function refreshPatientCard(patientId, insertIfMissing) {
+    const container = document.getElementById('patientsContainer');
+    const existing = container && container.querySelector(`.patient-card[data-patient-id="${patientId}"]`);
+    if (!existing && !(container && insertIfMissing)) {
+        return false;
+    }
+
+    const url = new URL('/api/patients', window.location.origin);
+    url.searchParams.set('patient_id', patientId);
+    url.searchParams.set('fields', PATIENT_CARD_FIELDS);
+    const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    const patients = (await response.json()).patients;
+    const html = patients.map(pageRenderers.patientCard).join('');
+    if (existing) {
+        const oldCount = parseInt(existing.dataset.reportCount, 10) || 0;
+        existing.outerHTML = html;
+        adjustLiveStat('total_reports', (patients.length ? patients[0].report_count : 0) - oldCount);
+    } else {
+        container.insertAdjacentHTML('afterbegin', html);
+    }
+    return true;
+}
+
+const liveUpdateHandlers = {
+    patient: {
+        report_uploaded(data) {
+            const tableBody = document.getElementById('reportsTableBody');
+            if (tableBody) {
+                tableBody.insertAdjacentHTML('afterbegin', pageRenderers.reportRow(data.report));
+                adjustLiveStat('total_reports', 1);
+            } else {
+                showLiveNotice(`New report uploaded: ${data.report.disease_name}.`, true);
+            }
+        },
+        access_granted(data) {
+            showLiveNotice(`Dr. ${data.doctor_name} was granted access to your reports.`, true);
+        },
+        access_revoked(data) {
+            showLiveNotice(`Access revoked for Dr. ${data.doctor_name}.`, true);
+        }
+    },
+
+    doctor: {
+        async report_uploaded(data) {
+            if (!await refreshPatientCard(data.patient_id, false)) {
+                adjustLiveStat('total_reports', 1);
+            }
+            showLiveNotice(`${data.patient_name} uploaded a new report: ${data.report.disease_name}.`);
+        },
+        async access_granted(data) {
+            adjustLiveStat('total_patients', 1);
+            adjustLiveStat('total_reports', data.report_count);
+            if (!await refreshPatientCard(data.patient_id, true)) {
+                showLiveNotice(`${data.patient_name} granted you access to their reports.`, true);
+            }
+        },
+        access_revoked(data) {
+            const card = document.querySelector(`.patient-card[data-patient-id="${data.patient_id}"]`);
+            if (card) {
+                card.remove();
+            }
+            adjustLiveStat('total_patients', -1);
+            adjustLiveStat('total_reports', -data.report_count);
+            showLiveNotice(`${data.patient_name} revoked your access to their reports.`);
+        }
+    }
+};
+
+function connectLiveUpdates(role) {
+    if (!window.EventSource) {
+        return;
+    }
+    // The browser reconnects by itself when a stream ends, sending Last-Event-ID to replay missed events
+    const source = new EventSource('/events');
+    const handlers = liveUpdateHandlers[role];
+    Object.keys(handlers).forEach(kind => {
+        source.addEventListener(kind, async event => {
+            try {
+                await handlers[kind](JSON.parse(event.data));
+            } catch (error) {
+                console.error(`Failed to apply ${kind} update:`, error);
+            }
+        });
+    });
+    // Too many events were missed to replay them one by one
+    source.addEventListener('resync', () => window.location.reload());
+}
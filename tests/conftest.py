@@ -0,0 +1,126 @@
+import os
+import tempfile
+from contextlib import contextmanager
+import pytest
+
+# Run the suite against a throwaway SQLite file rather than the instance database
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='srhs-tests-'), 'test.db'))
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='srhs-metrics-'))
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import User, DoctorAccess  # noqa: E402
+from authz_cache import clear_authz_cache  # noqa: E402
+from sql_profiler import capture_queries  # noqa: E402
+from audit import discard_audit_log  # noqa: E402
+from page_cache import clear_page_cache  # noqa: E402
+from notifications import reset_event_streams  # noqa: E402
+from patient_summary import clear_summary_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_authz_cache():
+    """Each test starts with empty authorization caches."""
+    clear_authz_cache()
+    yield
+    clear_authz_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_page_cache():
+    """Users and data versions restart from scratch with each test's tables, so cached pages must too."""
+    clear_page_cache()
+    yield
+    clear_page_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_summary_cache():
+    """Patient ids and data versions repeat across tests, so decoded summaries must not carry over."""
+    clear_summary_cache()
+    yield
+    clear_summary_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_audit_log():
+    """Audit events a test queued but never flushed are not written into the next test's tables."""
+    discard_audit_log()
+    yield
+    discard_audit_log()
+
+
+@pytest.fixture(autouse=True)
+def isolated_event_streams():
+    """Event ids restart with each test's tables, so the listener must not carry its position over."""
+    reset_event_streams()
+    yield
+    reset_event_streams()
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Fail when a block runs more SQL statements than allowed, listing them grouped by shape:
+
+        with max_queries(6):
+            client.get('/doctor_dashboard')
+    """
+    @contextmanager
+    def check(limit):
+        with capture_queries() as log:
+            yield log
+        assert len(log) <= limit, f"expected at most {limit} queries, got {log.report()}"
+    return check
+
+
+@pytest.fixture
+def make_user():
+    """
+    Add a user to the current session and flush it so it has an id. The email defaults to
+    <username>@example.com and the full name to the capitalized username:
+
+        doctor = make_user('doc', role='doctor', full_name='Doc Tor')
+    """
+    def make(username, role='patient', full_name=None, email=None):
+        user = User(username=username, email=email or f'{username}@example.com', password_hash='x',
+                    role=role, full_name=full_name or username.capitalize())
+        db.session.add(user)
+        db.session.flush()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_grant():
+    """Add, and flush, a patient's grant of access to a doctor."""
+    def grant(patient, doctor):
+        access = DoctorAccess(patient_id=patient.id, doctor_id=doctor.id)
+        db.session.add(access)
+        db.session.flush()
+        return access
+    return grant
+
+
+@pytest.fixture
+def client_for():
+    """A test client logged in as the given user (or user id)."""
+    def login(user):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(getattr(user, 'id', user))
+        return client
+    return login
+
+
+@pytest.fixture
+def factories(request, make_user, make_grant, client_for):
+    """
+    The factories above as attributes of a unittest-style test case, for use in setUp:
+
+        @pytest.mark.usefixtures('factories')
+        class TestSomething(unittest.TestCase):
+    """
+    request.instance.make_user = make_user
+    request.instance.make_grant = make_grant
+    request.instance.client_for = client_for
@@ -0,0 +1,113 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from main import app
+from models import User, MedicalReport, DoctorAccess
+from data_access import bump_data_versions
+from analytics import get_doctor_analytics, clear_analytics_cache
+
+
+@pytest.mark.usefixtures('factories')
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        clear_analytics_cache()
+
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.carol = self.make_user('carol')
+        self.make_grant(self.alice, self.doctor)
+        self.make_grant(self.bob, self.doctor)
+
+        db.session.add_all([
+            # Wednesday 3 Jan and Monday 8 Jan 2024 fall in consecutive weeks
+            self.make_report(self.alice, "Diabetes", datetime(2024, 1, 3)),
+            self.make_report(self.alice, "Diabetes", datetime(2024, 3, 8)),
+            self.make_report(self.alice, "Asthma", datetime(2024, 1, 8)),
+            self.make_report(self.bob, "Diabetes", datetime(2024, 3, 20)),
+            self.make_report(self.bob, "Asthma", datetime(2024, 3, 21)),
+            # No access granted, so never counted
+            self.make_report(self.carol, "Diabetes", datetime(2024, 2, 1)),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        clear_analytics_cache()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_report(self, patient, disease, upload_date):
+        return MedicalReport(patient_id=patient.id, disease_name=disease, description="d",
+                             file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf", upload_date=upload_date)
+
+    def test_monthly_uploads_and_new_diagnoses(self):
+        summary = get_doctor_analytics(self.doctor.id).summary('month')
+        self.assertEqual(summary['total_reports'], 5)
+        self.assertEqual(summary['total_patients'], 2)
+
+        uploads = summary['uploads']
+        self.assertEqual(uploads['periods'], ['2024-01-01', '2024-02-01', '2024-03-01'])
+        self.assertEqual(uploads['series'], {'Diabetes': [1, 0, 2], 'Asthma': [1, 0, 1]})
+        # Alice's second diabetes report is a follow-up, not a new diagnosis
+        self.assertEqual(summary['new_diagnoses']['series'], {'Diabetes': [1, 0, 1], 'Asthma': [1, 0, 1]})
+        self.assertEqual(summary['co_occurrence'], [{'diseases': ['Asthma', 'Diabetes'], 'patients': 2}])
+
+    def test_weeks_start_on_monday(self):
+        uploads = get_doctor_analytics(self.doctor.id).uploads('week', top=1)
+        self.assertEqual(uploads['periods'][:2], ['2024-01-01', '2024-01-08'])
+        self.assertEqual(list(uploads['series']), ['Diabetes'])
+        self.assertEqual(sum(uploads['series']['Diabetes']), 3)
+
+    def test_cached_until_data_version_moves(self):
+        first = get_doctor_analytics(self.doctor.id)
+        self.assertIs(get_doctor_analytics(self.doctor.id), first)
+
+        db.session.add(self.make_report(self.bob, "Flu", datetime(2024, 4, 1)))
+        bump_data_versions([self.doctor.id])
+        db.session.commit()
+        second = get_doctor_analytics(self.doctor.id)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.summary('month')['total_reports'], 6)
+
+    def test_trends_endpoint(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.doctor.id)
+        response = client.get('/api/analytics/trends?period=week&top=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['period'], 'week')
+        self.assertEqual(client.get('/api/analytics/trends?period=day').status_code, 400)
+
+    def test_large_panel_is_fast(self):
+        patients = [User(username=f"p{i}", email=f"p{i}@example.com", password_hash="x",
+                         role="patient", full_name=f"P {i}") for i in range(2000)]
+        db.session.add_all(patients)
+        db.session.commit()
+        db.session.execute(DoctorAccess.__table__.insert(),
+                           [{'patient_id': p.id, 'doctor_id': self.doctor.id} for p in patients])
+        diseases = [f"Disease {i}" for i in range(200)]
+        start = datetime(2020, 1, 1)
+        db.session.execute(MedicalReport.__table__.insert(), [
+            {'patient_id': patients[i % 2000].id, 'disease_name': diseases[(i * 7) % 200], 'description': 'd',
+             'file_path': 'uploads/r.pdf', 'file_name': 'r.pdf', 'file_type': 'pdf',
+             'upload_date': start + timedelta(hours=i)}
+            for i in range(100000)
+        ])
+        db.session.commit()
+
+        started = time.perf_counter()
+        summary = get_doctor_analytics(self.doctor.id).summary('week')
+        elapsed = time.perf_counter() - started
+        self.assertEqual(summary['total_reports'], 100005)
+        self.assertLess(elapsed, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from sqlalchemy import inspect
+from app import create_app, db
+from main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestAppFactory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.database_url = 'sqlite:///' + os.path.join(self.tmp_dir, 'factory.db')
+
+    def test_import_does_no_database_work_or_heavy_imports(self):
+        script = ("import sys, main; "
+                  "print(sorted(m for m in ('pandas', 'numpy', 'requests') if m in sys.modules))")
+        env = dict(os.environ, DATABASE_URL=self.database_url)
+        output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], '[]')
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'factory.db')))
+
+    def test_init_db_command_creates_schema(self):
+        other = create_app({'SQLALCHEMY_DATABASE_URI': self.database_url, 'TESTING': True})
+        self.assertIsNot(other, app)
+        self.assertEqual(sorted(rule.endpoint for rule in other.url_map.iter_rules()),
+                         sorted(rule.endpoint for rule in app.url_map.iter_rules()))
+
+        result = other.test_cli_runner().invoke(args=['init-db'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Database ready', result.output)
+        with other.app_context():
+            tables = set(inspect(db.engine).get_table_names())
+            self.assertTrue({'user', 'medical_report', 'schema_migrations'} <= tables)
+            db.engine.dispose()
+
+        # Rerunning on an up-to-date database changes nothing
+        result = other.test_cli_runner().invoke(args=['init-db'])
+        self.assertIn('0 migrations applied', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
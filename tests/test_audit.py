@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, AuditEvent
+from audit import AuditWriter, record_access, flush_audit_log
+from data_access import bump_data_versions, rebuild_disease_counts
+
+
+@pytest.mark.usefixtures('factories')
+class TestAuditTrail(unittest.TestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        with open(os.path.join(self.upload_dir, 'labs.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4 test')
+
+        app.config['TESTING'] = True
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.make_grant(self.patient, self.doctor)
+        self.report = MedicalReport(patient_id=self.patient.id, disease_name="Diabetes", description="d",
+                                    file_path=os.path.join('uploads', 'labs.pdf'), file_name="labs.pdf",
+                                    file_type="pdf")
+        db.session.add(self.report)
+        rebuild_disease_counts([self.patient.id])
+        bump_data_versions([self.doctor.id, self.patient.id])
+        db.session.commit()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        flush_audit_log(timeout=5)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, user):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+
+    def events(self):
+        self.assertTrue(flush_audit_log(timeout=5))
+        return [(event.actor_id, event.patient_id, event.report_id, event.action)
+                for event in AuditEvent.query.order_by(AuditEvent.id)]
+
+    def test_doctor_download_and_dashboard_are_recorded(self):
+        self.login(self.doctor)
+        self.assertEqual(self.client.get(f'/download/{self.report.id}').status_code, 200)
+        self.assertEqual(self.client.get('/doctor_dashboard').status_code, 200)
+        self.assertEqual(self.events(), [
+            (self.doctor.id, self.patient.id, self.report.id, 'download'),
+            (self.doctor.id, self.patient.id, None, 'view'),
+        ])
+        self.assertEqual(AuditEvent.query.first().ip_address, '127.0.0.1')
+
+    def test_patient_own_access_is_not_recorded(self):
+        self.login(self.patient)
+        self.assertEqual(self.client.get(f'/download/{self.report.id}').status_code, 200)
+        self.assertEqual(self.events(), [])
+
+    def test_access_log_api_paginates_newest_first(self):
+        for _ in range(3):
+            record_access(self.doctor.id, self.patient.id, 'download', self.report.id)
+        record_access(self.doctor.id, self.patient.id, 'export')
+        flush_audit_log(timeout=5)
+
+        self.login(self.patient)
+        first = self.client.get('/api/access_log?limit=3').get_json()
+        self.assertEqual([event['action'] for event in first['events']], ['export', 'download', 'download'])
+        self.assertEqual(first['events'][0]['actor']['full_name'], 'Doc Tor')
+        second = self.client.get(f"/api/access_log?limit=3&cursor={first['next_cursor']}").get_json()
+        self.assertEqual(len(second['events']), 1)
+        self.assertIsNone(second['next_cursor'])
+
+        downloads = self.client.get('/api/access_log?action=download').get_json()
+        self.assertEqual(len(downloads['events']), 3)
+        self.assertEqual(self.client.get('/api/access_log?cursor=bogus').status_code, 400)
+
+    def test_access_log_is_patient_only(self):
+        self.login(self.doctor)
+        self.assertEqual(self.client.get('/api/access_log').status_code, 403)
+
+    def test_full_queue_drops_and_counts(self):
+        class StuckWriter(AuditWriter):
+            def _write(self, batch, generation):
+                return False
+
+        event = (None, self.doctor.id, self.patient.id, None, 'view', None)
+        writer = StuckWriter(app, max_size=1, batch_size=1, put_timeout=0.01)
+        self.assertTrue(writer.put(event))
+        while writer.queue.qsize():
+            time.sleep(0.01)
+        # The writer thread holds the first event; the second fills the queue and the third is dropped
+        self.assertTrue(writer.put(event))
+        with self.assertLogs(app.logger, level='ERROR'):
+            self.assertFalse(writer.put(event))
+        self.assertEqual(writer.dropped, 1)
+        writer.discard()
+
+    def test_record_access_does_not_wait_for_the_database(self):
+        started = time.perf_counter()
+        for _ in range(1000):
+            record_access(self.doctor.id, self.patient.id, 'view')
+        per_call = (time.perf_counter() - started) / 1000
+        self.assertLess(per_call, 0.001)
+        self.assertEqual(len(self.events()), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
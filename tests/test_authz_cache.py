@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+import pytest
+from app import db
+from main import app
+from models import DoctorAccess
+from data_access import bump_data_versions
+from authz_cache import has_grant, load_user_cached, clear_local_cache
+
+
+@pytest.mark.usefixtures('factories')
+class TestAuthzCache(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.access = self.make_grant(self.patient, self.doctor)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_queries(self, func, *args):
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            result = func(*args)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_execute)
+        return result, len(statements)
+
+    def test_grant_decision_cached(self):
+        # A miss reads the doctor's data version and the grant; a hit only the version
+        self.assertEqual(self.count_queries(has_grant, self.doctor.id, self.patient.id), (True, 2))
+        self.assertEqual(self.count_queries(has_grant, self.doctor.id, self.patient.id), (True, 1))
+
+    def test_revoke_invalidates_immediately(self):
+        self.assertTrue(has_grant(self.doctor.id, self.patient.id))
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.patient.id)
+        client.post(f'/revoke_access/{self.access.id}')
+
+        self.assertFalse(has_grant(self.doctor.id, self.patient.id))
+
+    def test_revoke_from_another_worker_is_seen(self):
+        self.assertTrue(has_grant(self.doctor.id, self.patient.id))
+        # Another worker, possibly on another host, revoked: only the database tells us
+        DoctorAccess.query.delete()
+        bump_data_versions([self.doctor.id])
+        db.session.commit()
+        self.assertFalse(has_grant(self.doctor.id, self.patient.id))
+
+    def test_shared_tier_serves_other_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        app.config['AUTHZ_SHARED_CACHE_PATH'] = os.path.join(directory, 'authz.db')
+        self.addCleanup(app.config.pop, 'AUTHZ_SHARED_CACHE_PATH', None)
+
+        self.assertTrue(has_grant(self.doctor.id, self.patient.id))
+        clear_local_cache()
+        self.assertEqual(self.count_queries(has_grant, self.doctor.id, self.patient.id), (True, 1))
+
+    def test_user_loader_skips_database(self):
+        doctor_id = self.doctor.id
+        db.session.remove()
+        user, queries = self.count_queries(load_user_cached, doctor_id)
+        self.assertEqual((user.full_name, queries), ("Doc Tor", 1))
+
+        db.session.remove()
+        user, queries = self.count_queries(load_user_cached, doctor_id)
+        self.assertEqual((user.full_name, user.role, queries), ("Doc Tor", "doctor", 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
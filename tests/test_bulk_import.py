@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, PatientDiseaseCount, ReportExtraction, ReportImport
+from data_access import get_data_version
+
+
+@pytest.mark.usefixtures('factories')
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.source_dir = tempfile.mkdtemp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir)
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.make_grant(self.patient, self.doctor)
+        db.session.commit()
+
+        os.makedirs(os.path.join(self.source_dir, 'scans'))
+        self.entries = []
+        for i in range(12):
+            name = f"scans/report_{i}.pdf"
+            with open(os.path.join(self.source_dir, name), 'wb') as f:
+                f.write(b'%PDF-1.4 ' + bytes([i]) * 100)
+            self.entries.append({
+                'file': name,
+                'patient': 'pat' if i % 2 else 'pat@example.com',
+                'disease_name': 'Diabetes' if i < 8 else 'Asthma',
+                'description': f'Historical report {i}',
+                'upload_date': f'2019-03-{i + 1:02d}'
+            })
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def write_csv(self, entries):
+        path = os.path.join(self.source_dir, 'manifest.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(entries[0]))
+            writer.writeheader()
+            writer.writerows(entries)
+        return path
+
+    def run_import(self, manifest, *args):
+        return app.test_cli_runner().invoke(args=['import-reports', self.source_dir, manifest,
+                                                  '--batch-size', '5', *args])
+
+    def test_imports_batches_with_counts_and_versions(self):
+        result = self.run_import(self.write_csv(self.entries), '--workers', '4')
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('12 imported', result.output)
+        self.assertIn('files/s', result.output)
+        self.assertIn('rows/s', result.output)
+
+        self.assertEqual(MedicalReport.query.count(), 12)
+        self.assertEqual(len(os.listdir(self.upload_dir)), 12)
+        counts = dict(db.session.query(PatientDiseaseCount.disease_name, PatientDiseaseCount.report_count))
+        self.assertEqual(counts, {'Diabetes': 8, 'Asthma': 4})
+        self.assertEqual(ReportExtraction.query.filter_by(status='pending').count(), 12)
+        self.assertGreater(get_data_version(self.doctor.id), 0)
+
+        report = MedicalReport.query.filter_by(description='Historical report 3').one()
+        self.assertEqual(report.upload_date.day, 4)
+        with open(report.file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 ' + bytes([3]) * 100)
+
+    def test_resumes_without_duplicates(self):
+        # An earlier run that died after committing the first seven entries
+        self.run_import(self.write_csv(self.entries[:7]))
+        self.assertEqual(ReportImport.query.count(), 7)
+
+        path = os.path.join(self.source_dir, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump(self.entries, f)
+        result = self.run_import(path)
+        self.assertIn('5 imported, 7 already imported', result.output)
+        self.assertEqual(MedicalReport.query.count(), 12)
+        self.assertEqual(len(os.listdir(self.upload_dir)), 12)
+
+    def test_invalid_entries_are_reported(self):
+        entries = self.entries[:2] + [
+            dict(self.entries[2], patient='nobody'),
+            dict(self.entries[3], file='scans/missing.pdf'),
+            dict(self.entries[4], file='../outside.pdf'),
+        ]
+        result = self.run_import(self.write_csv(entries))
+        self.assertIn('2 imported, 0 already imported, 3 failed', result.output)
+        self.assertIn("unknown patient 'nobody'", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import pytest
+from app import db
+from main import app
+import chatbot
+from response_cache import set_response_cache
+
+TOKENS = ["Hyper", "tension ", "is high ", "blood pressure."]
+
+
+class FakeCompletionHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint, streaming or not."""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        FakeCompletionHandler.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if not payload.get('stream'):
+            body = json.dumps({'choices': [{'message': {'content': ''.join(TOKENS)}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for token in TOKENS:
+            self.write_chunk(f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.mark.usefixtures('factories')
+class TestChatbotStreaming(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCompletionHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/v1/chat/completions"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {'GROQ_API_KEY': 'test-key', 'GROQ_API_URL': self.url})
+        env.start()
+        self.addCleanup(env.stop)
+        chatbot._http_session = None
+        set_response_cache(None)
+
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_stream_yields_tokens_in_order(self):
+        self.assertEqual(list(chatbot.stream_groq_llama3("what is hypertension", 'doctor')), TOKENS)
+
+    def test_blocking_calls_reuse_connection(self):
+        FakeCompletionHandler.connections = 0
+        for _ in range(3):
+            self.assertEqual(chatbot.call_groq_llama3("what is hypertension", 'doctor'), ''.join(TOKENS))
+        self.assertEqual(FakeCompletionHandler.connections, 1)
+
+    def test_chatbot_endpoint_relays_sse(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.doctor.id)
+
+        response = client.post('/chatbot', json={'query': 'what is hypertension', 'stream': True})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        events = [e for e in response.get_data(as_text=True).split('\n\n') if e]
+        deltas = [json.loads(e[len('data: '):])['delta'] for e in events if e.startswith('data: ')]
+        self.assertEqual(deltas, TOKENS)
+        self.assertTrue(events[-1].startswith('event: done'))
+
+    def test_keyword_answer_streams_as_single_event(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.doctor.id)
+
+        response = client.post('/chatbot', json={'query': 'show all patients', 'stream': True})
+        body = response.get_data(as_text=True)
+        self.assertIn('No patients have granted you access yet.', body)
+        self.assertIn('event: done', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
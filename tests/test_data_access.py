@@ -0,0 +1,156 @@
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from main import app
+from models import User, MedicalReport, DoctorAccess, PatientDiseaseCount
+from data_access import (get_doctor_dashboard_data, get_doctor_disease_stats, rebuild_disease_counts,
+                         bump_data_versions, VersionedCache)
+
+
+@pytest.mark.usefixtures('factories')
+class TestDoctorDashboardData(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        db.session.commit()
+
+        base_date = datetime(2024, 1, 1)
+        for i in range(7):
+            patient = self.make_user(f'patient{i}', full_name=f'Patient {i}')
+            self.make_grant(patient, self.doctor)
+            for j in range(i + 1):
+                db.session.add(MedicalReport(
+                    patient_id=patient.id,
+                    disease_name="Diabetes" if j % 2 == 0 else "Flu",
+                    description="Report",
+                    file_path=f"uploads/{i}_{j}.pdf",
+                    file_name=f"{i}_{j}.pdf",
+                    file_type="pdf",
+                    upload_date=base_date + timedelta(days=j)
+                ))
+        rebuild_disease_counts()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_queries(self, func, *args, **kwargs):
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_execute)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_execute)
+        return result, len(statements)
+
+    def test_versioned_cache(self):
+        cache = VersionedCache(2)
+        loads = []
+
+        def load(value):
+            loads.append(value)
+            return value
+
+        patient_id = User.query.filter_by(username='patient0').one().id
+        self.assertEqual(cache.get(self.doctor.id, lambda: load('a')), 'a')
+        self.assertEqual(cache.get(self.doctor.id, lambda: load('b')), 'a')
+        # Keys are separate entries of the same user, and a version bump reloads them
+        self.assertEqual(cache.get(self.doctor.id, lambda: load('c'), key='other'), 'c')
+        bump_data_versions([self.doctor.id])
+        self.assertEqual(cache.get(self.doctor.id, lambda: load('d')), 'd')
+        self.assertEqual(loads, ['a', 'c', 'd'])
+
+        # Least recently used goes first once the cache is full
+        cache = VersionedCache(1)
+        cache.get(self.doctor.id, lambda: load('e'))
+        cache.get(patient_id, lambda: load('f'))
+        self.assertEqual(cache.get(self.doctor.id, lambda: load('g')), 'g')
+
+    def test_disease_stats_grouped(self):
+        stats = get_doctor_disease_stats(self.doctor.id)
+        # Patient i has i + 1 reports, alternating Diabetes/Flu
+        self.assertEqual(stats, {'Diabetes': 16, 'Flu': 12})
+
+    def test_rebuild_matches_reports(self):
+        counts = {(c.patient_id, c.disease_name): c.report_count for c in PatientDiseaseCount.query.all()}
+        patient = User.query.filter_by(username="patient3").first()
+        self.assertEqual(counts[(patient.id, 'Diabetes')], 2)
+        self.assertEqual(counts[(patient.id, 'Flu')], 2)
+
+    def test_upload_and_revoke_update_stats(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = upload_dir
+        app.config['EXTRACTION_WORKERS'] = 0
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.addCleanup(app.config.pop, 'EXTRACTION_WORKERS', None)
+
+        patient = User.query.filter_by(username="patient0").first()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(patient.id)
+
+        response = client.post('/upload_report', data={
+            'disease_name': 'Asthma',
+            'description': 'Inhaler review',
+            'file': (io.BytesIO(b'%PDF-1.4'), 'asthma.pdf')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(get_doctor_disease_stats(self.doctor.id)['Asthma'], 1)
+
+        access = DoctorAccess.query.filter_by(patient_id=patient.id).first()
+        client.post(f'/revoke_access/{access.id}')
+        stats = get_doctor_disease_stats(self.doctor.id)
+        self.assertNotIn('Asthma', stats)
+        self.assertEqual(stats['Diabetes'], 15)
+
+    def test_pagination_and_recent_reports(self):
+        first = get_doctor_dashboard_data(self.doctor.id, per_page=3)
+        data = get_doctor_dashboard_data(self.doctor.id, cursor=first['next_cursor'], per_page=3)
+        self.assertEqual(data['total_patients'], 7)
+        self.assertEqual(data['total_reports'], 28)
+        self.assertIsNotNone(data['next_cursor'])
+
+        names = [p['patient'].full_name for p in data['patients_data']]
+        self.assertEqual(names, ["Patient 3", "Patient 4", "Patient 5"])
+
+        patient_5 = data['patients_data'][2]
+        self.assertEqual(patient_5['report_count'], 6)
+        self.assertEqual(patient_5['diseases'], ['Diabetes', 'Flu'])
+        self.assertEqual(len(patient_5['recent_reports']), 5)
+        dates = [r.upload_date for r in patient_5['recent_reports']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_query_count_is_constant(self):
+        _, small = self.count_queries(get_doctor_dashboard_data, self.doctor.id, per_page=2)
+        _, large = self.count_queries(get_doctor_dashboard_data, self.doctor.id, per_page=7)
+        self.assertEqual(small, large)
+
+    def test_dashboard_renders_page(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.doctor.id)
+        response = client.get('/doctor_dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Patient 0', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import unittest
+from unittest import mock
+from sqlalchemy import text
+from app import db
+from main import app
+from database import get_database_url, get_engine_options
+
+
+class TestDatabaseProfile(unittest.TestCase):
+    def test_sqlite_connections_get_pragma_profile(self):
+        with app.app_context():
+            with db.engine.connect() as connection:
+                pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()  # noqa: E731
+                self.assertEqual(pragma('journal_mode'), 'wal')
+                self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+                self.assertEqual(pragma('busy_timeout'), 5000)
+                self.assertEqual(pragma('cache_size'), -65536)
+
+    def test_sqlite_has_no_server_pool_options(self):
+        options = get_engine_options('sqlite:///medical_reports.db')
+        self.assertNotIn('pool_recycle', options)
+        self.assertEqual(options['connect_args'], {'timeout': 5.0})
+
+    def test_postgres_pool_from_environment(self):
+        environ = {'DATABASE_URL': 'postgres://srhs:secret@db/srhs', 'DB_POOL_SIZE': '12', 'DB_MAX_OVERFLOW': '4'}
+        with mock.patch.dict(os.environ, environ):
+            url = get_database_url()
+            options = get_engine_options(url)
+        self.assertEqual(url, 'postgresql://srhs:secret@db/srhs')
+        self.assertEqual((options['pool_size'], options['max_overflow'], options['pool_pre_ping']), (12, 4, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
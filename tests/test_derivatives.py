@@ -0,0 +1,91 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import fitz
+import pytest
+from PIL import Image
+from app import db
+from main import app
+from models import MedicalReport
+from derivatives import render_derivative
+
+
+@pytest.mark.usefixtures('factories')
+class TestDerivatives(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.photo_path = os.path.join(self.directory, 'lab_sheet.jpg')
+        Image.new('RGB', (4000, 3000), (200, 180, 160)).save(self.photo_path, quality=95)
+
+        app.config['TESTING'] = True
+        app.config['DERIVATIVE_FOLDER'] = os.path.join(self.directory, 'derivatives')
+        self.addCleanup(app.config.pop, 'DERIVATIVE_FOLDER', None)
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.directory
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.other = self.make_user('other')
+        db.session.commit()
+        # Stored as the upload route stores it; the file itself is found under UPLOAD_FOLDER
+        self.report = MedicalReport(patient_id=self.patient.id, disease_name="Anemia", description="CBC",
+                                    file_path=os.path.join('uploads', 'lab_sheet.jpg'), file_name="lab_sheet.jpg",
+                                    file_type="jpg")
+        db.session.add(self.report)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_image_thumbnail_is_small(self):
+        dest = render_derivative(self.photo_path, 'jpg', os.path.join(self.directory, 'thumb.jpg'))
+        with Image.open(dest) as thumb:
+            self.assertEqual(max(thumb.size), 160)
+        self.assertLess(os.path.getsize(dest), os.path.getsize(self.photo_path) / 10)
+
+    def test_pdf_first_page_preview(self):
+        pdf_path = os.path.join(self.directory, 'report.pdf')
+        document = fitz.open()
+        document.new_page(width=595, height=842)
+        document.save(pdf_path)
+        document.close()
+
+        dest = render_derivative(pdf_path, 'pdf', os.path.join(self.directory, 'preview.jpg'), size='medium')
+        with Image.open(dest) as preview:
+            self.assertEqual(preview.size[1], 480)
+
+    def test_thumbnail_route_caches_and_serves(self):
+        client = self.client_for(self.patient)
+        response = client.get(f'/thumbnail/{self.report.id}', headers={'Accept': 'image/webp,*/*'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.mimetype, ('image/webp', 'image/jpeg'))
+        self.assertTrue(response.cache_control.private)
+        self.assertTrue(response.cache_control.no_cache)
+        self.assertEqual(len(os.listdir(app.config['DERIVATIVE_FOLDER'])), 1)
+
+        # Browsers revalidate, so access is checked again and an unchanged thumbnail is a 304
+        revalidated = client.get(f'/thumbnail/{self.report.id}', headers={
+            'Accept': 'image/webp,*/*', 'If-None-Match': response.headers['ETag']
+        })
+        self.assertEqual(revalidated.status_code, 304)
+
+        jpeg = client.get(f'/thumbnail/{self.report.id}?size=medium')
+        self.assertEqual(jpeg.mimetype, 'image/jpeg')
+        with Image.open(io.BytesIO(jpeg.data)) as image:
+            self.assertEqual(max(image.size), 480)
+
+    def test_thumbnail_requires_access(self):
+        response = self.client_for(self.other).get(f'/thumbnail/{self.report.id}')
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
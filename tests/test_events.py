@@ -0,0 +1,116 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+import pytest
+from app import db
+from main import app
+from models import DoctorAccess, UserEvent
+from notifications import publish, open_stream, close_stream
+
+
+@pytest.mark.usefixtures('factories')
+class TestEvents(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['EVENTS_STREAM_SECONDS'] = 0.2
+        app.config['EXTRACTION_WORKERS'] = 0
+        self.upload_dir = tempfile.mkdtemp()
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.addCleanup(app.config.pop, 'EVENTS_STREAM_SECONDS', None)
+        self.addCleanup(app.config.__setitem__, 'LIVE_UPDATES', app.config['LIVE_UPDATES'])
+        app.config['LIVE_UPDATES'] = True
+        self.addCleanup(app.config.pop, 'EXTRACTION_WORKERS', None)
+
+        # No app context is kept pushed, so each request loads its own user
+        with app.app_context():
+            db.create_all()
+            patient = self.make_user('pat', full_name='Pat Ient')
+            doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+            other = self.make_user('other', role='doctor', full_name='Other Doc')
+            db.session.commit()
+            self.patient_id, self.doctor_id, self.other_id = patient.id, doctor.id, other.id
+
+        self.patient = self.client_for(self.patient_id)
+        self.doctor = self.client_for(self.doctor_id)
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def kinds_for(self, user_id):
+        with app.app_context():
+            return [event.kind for event in UserEvent.query.filter_by(user_id=user_id).order_by(UserEvent.id)]
+
+    def test_write_routes_publish_to_affected_users(self):
+        self.patient.post('/grant_access', data={'doctor_email': 'doc@example.com'})
+        self.patient.post('/upload_report', data={
+            'disease_name': 'Asthma',
+            'description': 'Inhaler review',
+            'file': (io.BytesIO(b'%PDF-1.4'), 'asthma.pdf')
+        }, content_type='multipart/form-data')
+        with app.app_context():
+            access_id = DoctorAccess.query.filter_by(patient_id=self.patient_id).one().id
+        self.patient.post(f'/revoke_access/{access_id}')
+
+        expected = ['access_granted', 'report_uploaded', 'access_revoked']
+        self.assertEqual(self.kinds_for(self.patient_id), expected)
+        self.assertEqual(self.kinds_for(self.doctor_id), expected)
+        self.assertEqual(self.kinds_for(self.other_id), [])
+
+        # Access events carry the patient's report count, so dashboards adjust totals without their card
+        with app.app_context():
+            counts = [json.loads(event.payload)['report_count'] for event in UserEvent.query.filter(
+                UserEvent.user_id == self.doctor_id, UserEvent.kind != 'report_uploaded').order_by(UserEvent.id)]
+        self.assertEqual(counts, [0, 1])
+
+    def test_stream_replays_after_last_event_id(self):
+        self.patient.post('/grant_access', data={'doctor_email': 'doc@example.com'})
+        with app.app_context():
+            event_id = UserEvent.query.filter_by(user_id=self.doctor_id).one().id
+
+        response = self.doctor.get('/events', headers={'Last-Event-ID': str(event_id - 1)})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        body = response.get_data(as_text=True)
+        self.assertIn(f'id: {event_id}\nevent: access_granted\n', body)
+        self.assertIn('"patient_name": "Pat Ient"', body)
+
+        # Reconnecting after that event, or connecting afresh, replays nothing
+        for headers in ({'Last-Event-ID': str(event_id)}, {}):
+            body = self.doctor.get('/events', headers=headers).get_data(as_text=True)
+            self.assertNotIn('event: access_granted', body)
+
+    def test_disabled_without_flag(self):
+        app.config['LIVE_UPDATES'] = False
+        self.assertEqual(self.doctor.get('/events').status_code, 404)
+        # Dashboards do not open a stream either, so sync workers are never tied up
+        self.assertNotIn('connectLiveUpdates(', self.doctor.get('/doctor_dashboard').get_data(as_text=True))
+
+    def test_listener_delivers_events_committed_elsewhere(self):
+        with app.app_context():
+            stream = open_stream(self.doctor_id)
+            self.addCleanup(close_stream, stream)
+            # As if written by another worker process: only the database connects the two
+            publish([self.doctor_id, self.other_id], 'report_uploaded', {'patient_id': self.patient_id})
+            db.session.commit()
+
+        event = stream.get(timeout=5)
+        self.assertIsNotNone(event)
+        self.assertEqual(event[1:], ('report_uploaded', {'patient_id': self.patient_id}))
+        self.assertIsNone(stream.get(timeout=0.1))
+
+    def test_rolled_back_write_publishes_nothing(self):
+        with app.app_context():
+            publish([self.doctor_id], 'access_granted', {})
+            db.session.rollback()
+        self.assertEqual(self.kinds_for(self.doctor_id), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, DoctorAccess
+
+CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+
+@pytest.mark.usefixtures('factories')
+class TestFileDelivery(unittest.TestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        with open(os.path.join(self.upload_dir, 'abc_labs.pdf'), 'wb') as f:
+            f.write(CONTENT)
+
+        app.config['TESTING'] = True
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.addCleanup(app.config.pop, 'DOWNLOAD_DELIVERY', None)
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.make_grant(self.patient, self.doctor)
+        self.report = MedicalReport(patient_id=self.patient.id, disease_name="Flu", description="Labs",
+                                    file_path=os.path.join('uploads', 'abc_labs.pdf'),
+                                    file_name="labs.pdf", file_type="pdf")
+        db.session.add(self.report)
+        db.session.commit()
+
+        self.client = self.client_for(self.doctor)
+        self.url = f'/download/{self.report.id}'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_direct_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, CONTENT)
+        self.assertTrue(response.cache_control.private)
+        etag = response.headers['ETag']
+
+        repeat = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.data, b'')
+
+    def test_direct_range_request(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, CONTENT[100:200])
+        self.assertEqual(response.headers['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+
+    def test_x_accel_redirect(self):
+        app.config['DOWNLOAD_DELIVERY'] = 'x-accel'
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/protected-uploads/abc_labs.pdf')
+        self.assertIn('filename=labs.pdf', response.headers['Content-Disposition'])
+        self.assertEqual(response.data, b'')
+
+    def test_x_sendfile(self):
+        app.config['DOWNLOAD_DELIVERY'] = 'x-sendfile'
+        response = self.client.get(self.url)
+        self.assertEqual(response.headers['X-Sendfile'], os.path.join(self.upload_dir, 'abc_labs.pdf'))
+
+    def test_revoked_doctor_denied(self):
+        DoctorAccess.query.delete()
+        db.session.commit()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('X-Accel-Redirect', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from intent_matcher import (AhoCorasick, QueryMatcher, DEFAULT_VOCABULARY_PATH, get_matcher,
+                            get_vocabulary_paths, load_vocabulary)
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_finds_overlapping_patterns(self):
+        automaton = AhoCorasick()
+        for word in ('he', 'she', 'his', 'hers'):
+            automaton.add(word, word)
+        automaton.build()
+        matches = sorted((start, word) for start, _, word in automaton.iter_matches('ushers'))
+        self.assertEqual(matches, [(1, 'she'), (2, 'he'), (2, 'hers')])
+
+
+class TestQueryMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = get_matcher()
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.matcher.diseases_in("Heartburn"), ['gastroesophageal reflux'])
+        self.assertEqual(self.matcher.diseases_in("heart problems"), ['heart disease'])
+        self.assertEqual(self.matcher.diseases_in("preheart"), [])
+
+    def test_everyday_words_are_not_diseases(self):
+        for query in ("my blood pressure readings", "blood test", "a cold shower", "show all reports",
+                      "ms smith's heart rate", "mi casa", "ra and oa results", "lung function test"):
+            with self.subTest(query=query):
+                self.assertEqual(self.matcher.diseases_in(query), [])
+        # Qualified forms still match
+        self.assertEqual(self.matcher.diseases_in("a head cold"), ['common cold'])
+        self.assertEqual(self.matcher.diseases_in("all leukemia reports"), ['leukemia'])
+
+    def test_synonyms_and_longest_match(self):
+        self.assertEqual(self.matcher.diseases_in("Type 2 Diabetes"), ['diabetes'])
+        self.assertEqual(self.matcher.diseases_in("patients with high blood pressure, T2DM"),
+                         ['hypertension', 'diabetes'])
+
+    def test_doctor_intents(self):
+        self.assertEqual(self.matcher.match("Show patients with cancer", 'doctor').intent, 'search')
+        self.assertEqual(self.matcher.match("How many patients have asthma?", 'doctor').intent, 'count')
+        # "show" and "how many" both appear; the count phrase carries more weight
+        self.assertEqual(self.matcher.match("show me how many patients", 'doctor').intent, 'count')
+        self.assertEqual(self.matcher.match("help", 'doctor').intent, 'help')
+        self.assertIsNone(self.matcher.match("what is hypertension", 'doctor').intent)
+        # Substrings of longer words are not intents
+        self.assertIsNone(self.matcher.match("showcase of listings", 'doctor').intent)
+
+    def test_patient_intents(self):
+        self.assertEqual(self.matcher.match("Show my reports", 'patient').intent, 'reports')
+        self.assertEqual(self.matcher.match("Which doctors can see this?", 'patient').intent, 'access')
+        self.assertEqual(self.matcher.match("Who has access to my records?", 'patient').intent, 'access')
+        self.assertEqual(self.matcher.match("When was my last report for diabetes?", 'patient').intent, 'latest')
+        self.assertIsNone(self.matcher.match("how many", 'patient').intent)
+
+    def test_patient_id_needs_a_marker(self):
+        self.assertEqual(self.matcher.match("find patient ID 102", 'doctor').patient_id, 102)
+        self.assertEqual(self.matcher.match("show #7", 'doctor').patient_id, 7)
+        self.assertIsNone(self.matcher.match("show type 2 diabetes", 'doctor').patient_id)
+
+    def write_vocabulary(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write(text)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_loads_vocabulary_file(self):
+        path = self.write_vocabulary("# comment\nGout: podagra,  uric acid arthritis\n\n")
+        matcher = QueryMatcher.from_files(path)
+        self.assertEqual(load_vocabulary(path), {'gout': ['gout', 'podagra', 'uric acid arthritis']})
+        self.assertEqual(matcher.diseases_in("Podagra flare"), ['gout'])
+
+    def test_later_files_extend_the_vocabulary(self):
+        site = self.write_vocabulary("gout: tophaceous gout\nfamilial mediterranean fever: fmf\n")
+        matcher = QueryMatcher.from_files(DEFAULT_VOCABULARY_PATH, site)
+        self.assertEqual(matcher.diseases_in("FMF and tophaceous gout"), ['familial mediterranean fever', 'gout'])
+        self.assertEqual(matcher.diseases_in("type 2 diabetes"), ['diabetes'])
+
+    def test_vocabulary_paths_from_environment(self):
+        with mock.patch.dict(os.environ, {'CHATBOT_VOCABULARY': os.pathsep.join(['a.txt', 'b.txt'])}):
+            self.assertEqual(get_vocabulary_paths(), ['a.txt', 'b.txt'])
+        with mock.patch.dict(os.environ):
+            os.environ.pop('CHATBOT_VOCABULARY', None)
+            self.assertEqual(get_vocabulary_paths(), [DEFAULT_VOCABULARY_PATH])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+import pytest
+from app import db
+from main import app
+from models import MedicalReport
+from data_access import get_reports_page, encode_cursor, rebuild_disease_counts
+
+
+@pytest.mark.usefixtures('factories')
+class TestListApi(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def use_max_queries(self, max_queries):
+        self.max_queries = max_queries
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.other = self.make_user('other', full_name='Other Patient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.make_grant(self.patient, self.doctor)
+
+        # Pairs of reports share an upload date so the id tie-breaker matters
+        base_date = datetime(2023, 1, 1)
+        for i in range(25):
+            db.session.add(MedicalReport(
+                patient_id=self.patient.id, disease_name="Diabetes" if i % 3 else "Asthma",
+                description=f"Report {i}", file_path=f"uploads/{i}.pdf", file_name=f"{i}.pdf",
+                file_type="pdf" if i % 2 else "docx", upload_date=base_date + timedelta(days=i // 2)
+            ))
+        db.session.add(MedicalReport(patient_id=self.other.id, disease_name="Flu", description="Other",
+                                     file_path="uploads/o.pdf", file_name="o.pdf", file_type="pdf",
+                                     upload_date=base_date))
+        rebuild_disease_counts()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def walk(self, client, url):
+        items, cursor = [], None
+        while True:
+            page = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+            items.extend(page.get('reports', page.get('patients', [])))
+            cursor = page['next_cursor']
+            if not cursor:
+                return items
+
+    def test_cursor_walks_every_report_once_in_order(self):
+        reports = self.walk(self.client_for(self.patient), '/api/reports?limit=4')
+        expected = MedicalReport.query.filter_by(patient_id=self.patient.id).order_by(
+            MedicalReport.upload_date.desc(), MedicalReport.id.desc()).all()
+        self.assertEqual([r['id'] for r in reports], [r.id for r in expected])
+
+    def test_fields_and_filters(self):
+        client = self.client_for(self.patient)
+        page = client.get('/api/reports?fields=disease_name,thumbnail_url&disease=asthma'
+                          '&from=2023-01-03&to=2023-01-06').get_json()
+        self.assertEqual({tuple(sorted(r)) for r in page['reports']}, {('disease_name', 'id', 'thumbnail_url')})
+        self.assertEqual([r['disease_name'] for r in page['reports']], ['Asthma'] * 2)
+
+        self.assertEqual(client.get('/api/reports?fields=file_path').status_code, 400)
+        self.assertEqual(client.get('/api/reports?cursor=garbage').status_code, 400)
+        self.assertEqual(client.get('/api/patients').status_code, 403)
+
+    def test_projection_costs_one_page_query(self):
+        client = self.client_for(self.patient)
+        # As the dashboard's load-more asks: the audit trail still needs each report's patient
+        url = ('/api/reports?limit=20&fields=disease_name,description,file_name,file_type,upload_date,'
+               'download_url,thumbnail_url')
+        with self.max_queries(2):
+            page = client.get(url).get_json()
+        self.assertEqual(len(page['reports']), 20)
+        self.assertNotIn('patient_id', page['reports'][0])
+
+    def test_doctor_sees_only_granted_patients(self):
+        client = self.client_for(self.doctor)
+        reports = self.walk(client, '/api/reports?limit=10&fields=patient_id')
+        self.assertEqual(len(reports), 25)
+        self.assertEqual({r['patient_id'] for r in reports}, {self.patient.id})
+        self.assertEqual(client.get(f'/api/reports?patient_id={self.other.id}').status_code, 403)
+
+    def test_patients_api(self):
+        self.make_grant(self.other, self.doctor)
+        db.session.commit()
+        client = self.client_for(self.doctor)
+
+        patients = self.walk(client, '/api/patients?limit=1')
+        self.assertEqual([p['full_name'] for p in patients], ["Other Patient", "Pat Ient"])
+        self.assertEqual(patients[1]['report_count'], 25)
+        self.assertEqual(len(patients[1]['recent_reports']), 5)
+
+        page = client.get('/api/patients?disease=flu&fields=full_name').get_json()
+        self.assertEqual(page['patients'], [{'id': self.other.id, 'full_name': "Other Patient"}])
+
+        # One patient's card, as refreshed by the dashboard's live updates
+        page = client.get(f'/api/patients?patient_id={self.patient.id}&fields=report_count').get_json()
+        self.assertEqual(page['patients'], [{'id': self.patient.id, 'report_count': 25}])
+
+    def test_deep_page_is_an_index_range_scan(self):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            get_reports_page([self.patient.id], cursor=encode_cursor(datetime(2023, 1, 3), 5), per_page=5)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        statement, parameters = statements[-1]
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, tuple(parameters)).fetchall()
+        plan = ' | '.join(row[3] for row in rows)
+        self.assertIn('ix_medical_report_patient_date_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_dashboard_renders_first_page_only(self):
+        response = self.client_for(self.patient).get('/patient_dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Load more reports', response.data)
+        self.assertEqual(response.data.count(b'report-description'), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from main import app
+import chatbot
+import metrics
+
+
+def sample(text, name, **labels):
+    """Value of one sample in Prometheus text output, or None if it is absent."""
+    for line in text.splitlines():
+        match = re.match(r'^(\w+)(?:\{(.*)\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        if found == {key: str(value) for key, value in labels.items()}:
+            return float(match.group(3))
+    return None
+
+
+@pytest.mark.usefixtures('factories')
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        original = (metrics.store.directory, metrics.store.pid)
+        metrics.store.directory = self.metrics_dir
+        metrics.store.pid = None
+        self.addCleanup(setattr, metrics.store, 'directory', original[0])
+        self.addCleanup(setattr, metrics.store, 'pid', original[1])
+        app.config['METRICS_TOKEN'] = 'secret'
+        self.addCleanup(app.config.pop, 'METRICS_TOKEN', None)
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        db.session.commit()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def scrape(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_records_latency_status_and_sql_per_endpoint(self):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.doctor.id)
+        for _ in range(3):
+            self.client.get('/api/analytics')
+        self.client.get('/no-such-page')
+
+        text = self.scrape()
+        self.assertIn('# TYPE srhs_http_request_duration_seconds histogram', text)
+        self.assertEqual(sample(text, 'srhs_http_requests_total', endpoint='analytics_api', method='GET',
+                                status=200), 3)
+        self.assertEqual(sample(text, 'srhs_http_requests_total', endpoint='unmatched', method='GET',
+                                status=404), 1)
+        self.assertEqual(sample(text, 'srhs_http_request_duration_seconds_count', endpoint='analytics_api'), 3)
+        self.assertEqual(sample(text, 'srhs_http_request_duration_seconds_bucket', endpoint='analytics_api',
+                                le='+Inf'), 3)
+        # Each request loads the user and runs the two analytics queries
+        self.assertGreaterEqual(sample(text, 'srhs_db_queries_per_request_sum', endpoint='analytics_api'), 6)
+        self.assertEqual(sample(text, 'srhs_db_queries_per_request_bucket', endpoint='unmatched', le='0'), 1)
+
+    def test_merges_snapshots_of_other_workers(self):
+        self.client.get('/no-such-page')
+        other = metrics.Registry()
+        other.inc('srhs_http_requests_total', (('endpoint', 'unmatched'), ('method', 'GET'), ('status', '404')), 4)
+        other.observe('srhs_upload_size_bytes', (), 100 * 1024)
+        with open(os.path.join(self.metrics_dir, '99999-1.json'), 'w') as f:
+            json.dump(other.snapshot(), f)
+
+        text = self.scrape()
+        self.assertEqual(sample(text, 'srhs_http_requests_total', endpoint='unmatched', method='GET',
+                                status=404), 5)
+        self.assertEqual(sample(text, 'srhs_upload_size_bytes_bucket', le='65536'), 0)
+        self.assertEqual(sample(text, 'srhs_upload_size_bytes_bucket', le='262144'), 1)
+        self.assertEqual(sample(text, 'srhs_upload_size_bytes_sum'), 100 * 1024)
+
+    def test_llm_latency(self):
+        session = mock.Mock()
+        session.post.return_value.json.return_value = {'choices': [{'message': {'content': 'answer'}}]}
+        with mock.patch.dict(os.environ, {'GROQ_API_KEY': 'k'}), \
+                mock.patch('chatbot.get_response_cache', return_value=None), \
+                mock.patch('chatbot.get_http_session', return_value=session):
+            self.assertEqual(chatbot.call_groq_llama3("what is flu", 'doctor'), 'answer')
+            session.post.side_effect = OSError('down')
+            chatbot.call_groq_llama3("what is flu", 'doctor')
+
+        text = self.scrape()
+        self.assertEqual(sample(text, 'srhs_llm_request_duration_seconds_count', mode='complete', outcome='ok'), 1)
+        self.assertEqual(sample(text, 'srhs_llm_request_duration_seconds_count', mode='complete',
+                                outcome='error'), 1)
+
+    def test_failed_statement_leaves_no_timing_behind(self):
+        with db.engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.execute(text('SELECT 1'))
+            self.assertEqual(conn.info, {})
+
+    def test_exited_workers_are_retired(self):
+        def write_snapshot(filename, amount):
+            registry = metrics.Registry()
+            registry.inc('srhs_upload_bytes_total', (), amount)
+            with open(os.path.join(self.metrics_dir, filename), 'w') as f:
+                json.dump(registry.snapshot(), f)
+
+        # An exited worker, this pid's previous owner, and a live process (the test runner's parent)
+        write_snapshot('99999-1.json', 1)
+        write_snapshot(f'{os.getpid()}-1.json', 2)
+        live = f'{os.getppid()}-{time.time_ns()}.json'
+        write_snapshot(live, 4)
+
+        with mock.patch('metrics._pid_running', side_effect=lambda pid: pid != 99999):
+            self.assertEqual(sample(self.scrape(), 'srhs_upload_bytes_total'), 7)
+            remaining = sorted(name for name in os.listdir(self.metrics_dir) if name.endswith('.json'))
+            self.assertEqual(remaining, sorted([live, metrics.RETIRED_FILENAME]))
+
+            # Later exits add to the retired totals, so the counter never goes backwards
+            write_snapshot('99999-2.json', 8)
+            self.assertEqual(sample(self.scrape(), 'srhs_upload_bytes_total'), 15)
+
+    def test_token_required(self):
+        app.config.pop('METRICS_TOKEN')
+        with mock.patch.dict(os.environ, {'METRICS_TOKEN': ''}):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        app.config['METRICS_TOKEN'] = 'secret'
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from sqlalchemy import text
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, DoctorAccess
+from migrations import run_migrations, MIGRATIONS
+
+
+@pytest.mark.usefixtures('factories')
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        run_migrations()
+
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.make_grant(self.patient, self.doctor)
+        db.session.add(MedicalReport(patient_id=self.patient.id, disease_name="Flu", description="Labs",
+                                     file_path="uploads/x.pdf", file_name="x.pdf", file_type="pdf"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.session.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        db.session.commit()
+        self.app_context.pop()
+
+    def index_names(self):
+        return {row[0] for row in db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'")
+        )}
+
+    def query_plan(self, query):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        return ' | '.join(row[3] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+    def test_upgrades_existing_database_in_place(self):
+        # A database created before the indexes existed: same tables, no indexes, no version table
+        db.session.execute(text("DROP INDEX ix_medical_report_patient_date_id"))
+        db.session.execute(text("DROP INDEX ix_doctor_access_doctor_patient"))
+        db.session.execute(text("DROP TABLE schema_migrations"))
+        db.session.commit()
+
+        self.assertEqual(run_migrations(), [version for version, _, _ in MIGRATIONS])
+        self.assertLessEqual({'ix_medical_report_patient_date_id', 'ix_doctor_access_doctor_patient'},
+                             self.index_names())
+        self.assertEqual(MedicalReport.query.count(), 1)
+        self.assertNotIn('ix_medical_report_patient_date', self.index_names())
+        self.assertEqual(run_migrations(), [])
+
+    def test_patient_reports_use_index(self):
+        query = MedicalReport.query.filter_by(patient_id=self.patient.id).order_by(MedicalReport.upload_date.desc())
+        plan = self.query_plan(query)
+        self.assertIn('ix_medical_report_patient_date_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_doctor_accesses_use_index(self):
+        query = db.session.query(DoctorAccess.patient_id).filter(DoctorAccess.doctor_id == self.doctor.id)
+        self.assertIn('COVERING INDEX ix_doctor_access_doctor_patient', self.query_plan(query))
+
+    def test_doctor_reports_join_uses_indexes(self):
+        query = db.session.query(MedicalReport.id).join(
+            DoctorAccess, DoctorAccess.patient_id == MedicalReport.patient_id
+        ).filter(DoctorAccess.doctor_id == self.doctor.id)
+        plan = self.query_plan(query)
+        self.assertIn('ix_doctor_access_doctor_patient', plan)
+        self.assertIn('ix_medical_report_patient_date_id', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
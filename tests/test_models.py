@@ -1,5 +1,6 @@
 import unittest
-from app import app, db
+from app import db
+from main import app
 from models import User, MedicalReport, DoctorAccess
 from datetime import datetime
 
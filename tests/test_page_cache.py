@@ -0,0 +1,97 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+import pytest
+from app import db
+from main import app
+from models import MedicalReport
+from data_access import rebuild_disease_counts
+
+
+@pytest.mark.usefixtures('factories')
+class TestPageCache(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def use_max_queries(self, max_queries):
+        self.max_queries = max_queries
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        # No app context is kept pushed, so each request loads its own user
+        with app.app_context():
+            db.create_all()
+            patient = self.make_user('pat', full_name='Pat Ient')
+            doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+            for disease in ("Diabetes", "Asthma"):
+                db.session.add(MedicalReport(patient_id=patient.id, disease_name=disease, description="d",
+                                             file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf"))
+            rebuild_disease_counts()
+            db.session.commit()
+            self.patient_id, self.doctor_id = patient.id, doctor.id
+
+        self.patient = self.client_for(self.patient_id)
+        self.doctor = self.client_for(self.doctor_id)
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_repeat_views_use_one_query_and_revalidate(self):
+        first = self.patient.get('/patient_dashboard')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Diabetes', first.get_data(as_text=True))
+        self.assertEqual(first.headers['Cache-Control'], 'private, no-cache')
+        etag = first.headers['ETag']
+
+        with self.max_queries(1):
+            second = self.patient.get('/patient_dashboard')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers['ETag'], etag)
+
+        with self.max_queries(1):
+            revalidated = self.patient.get('/patient_dashboard', headers={'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+
+    def test_new_month_rerenders_without_a_write(self):
+        etag = self.patient.get('/patient_dashboard').headers['ETag']
+        # Both reports were uploaded this month; next month they no longer count
+        with mock.patch('routes.current_month_start', return_value=datetime(2999, 1, 1)):
+            response = self.patient.get('/patient_dashboard', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_grant_invalidates_both_dashboards(self):
+        patient_etag = self.patient.get('/patient_dashboard').headers['ETag']
+        self.assertNotIn('Pat Ient', self.doctor.get('/doctor_dashboard').get_data(as_text=True))
+
+        self.patient.post('/grant_access', data={'doctor_email': 'doc@example.com'})
+
+        # The flash from the grant is shown once, on a freshly rendered page without an ETag
+        flashed = self.patient.get('/patient_dashboard', headers={'If-None-Match': patient_etag})
+        self.assertEqual(flashed.status_code, 200)
+        self.assertIn('Access granted to Dr. Doc Tor', flashed.get_data(as_text=True))
+        self.assertNotIn('ETag', flashed.headers)
+
+        response = self.patient.get('/patient_dashboard', headers={'If-None-Match': patient_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], patient_etag)
+        self.assertNotIn('Access granted to Dr.', response.get_data(as_text=True))
+        self.assertIn('Pat Ient', self.doctor.get('/doctor_dashboard').get_data(as_text=True))
+
+    def test_pages_are_per_user(self):
+        with app.app_context():
+            other = self.make_user('pat2', full_name='Other Patient')
+            db.session.commit()
+            other_id = other.id
+
+        mine = self.patient.get('/patient_dashboard')
+        theirs = self.client_for(other_id).get('/patient_dashboard',
+                                               headers={'If-None-Match': mine.headers['ETag']})
+        self.assertEqual(theirs.status_code, 200)
+        self.assertIn('Other Patient', theirs.get_data(as_text=True))
+        self.assertNotIn('Diabetes', theirs.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
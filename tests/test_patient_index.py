@@ -0,0 +1,74 @@
+import unittest
+import pytest
+from app import db
+from main import app
+from models import MedicalReport
+from chatbot import process_chatbot_query
+from data_access import get_data_version
+from patient_index import get_doctor_index, clear_index_cache
+
+
+@pytest.mark.usefixtures('factories')
+class TestPatientIndex(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        clear_index_cache()
+
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.make_grant(self.alice, self.doctor)
+        db.session.add_all([
+            self.make_report(self.alice, "Type 2 Diabetes"),
+            self.make_report(self.alice, "Heartburn"),
+            self.make_report(self.bob, "Heart Disease"),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        clear_index_cache()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_report(self, patient, disease):
+        return MedicalReport(patient_id=patient.id, disease_name=disease, description="d",
+                             file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf")
+
+    def test_lookup_by_token(self):
+        index = get_doctor_index(self.doctor.id)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.matching_patient_ids(['diabetes']), {self.alice.id})
+        # Token matching, so "heart" no longer hits "Heartburn"
+        self.assertEqual(index.matching_patient_ids(['heart']), set())
+        self.assertEqual(index.total_reports, 2)
+
+    def test_chatbot_search_and_count(self):
+        index = get_doctor_index(self.doctor.id)
+        response = process_chatbot_query("show patients with diabetes", index, 'doctor')
+        self.assertIn("Found 1 patients with diabetes", response)
+        self.assertIn("Alice", response)
+
+        response = process_chatbot_query("count patients with cancer", index, 'doctor')
+        self.assertEqual(response, "You have 0 patients with cancer")
+
+    def test_cache_invalidated_by_grant(self):
+        first = get_doctor_index(self.doctor.id)
+        self.assertIs(get_doctor_index(self.doctor.id), first)
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.bob.id)
+        client.post('/grant_access', data={'doctor_email': 'doc@example.com'})
+
+        self.assertGreater(get_data_version(self.doctor.id), 0)
+        second = get_doctor_index(self.doctor.id)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.matching_patient_ids(['heart']), {self.bob.id})
+
+
+if __name__ == '__main__':
+    unittest.main()
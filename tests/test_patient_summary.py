@@ -0,0 +1,147 @@
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pytest
+from app import db
+from main import app
+from models import User, MedicalReport, DoctorAccess, PatientSummary
+from chatbot import parse_date_range
+from patient_summary import add_reports, rebuild_patient_summaries, get_patient_summary
+
+
+@pytest.mark.usefixtures('factories')
+class TestPatientSummary(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def use_max_queries(self, max_queries):
+        self.max_queries = max_queries
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['EXTRACTION_WORKERS'] = 0
+        self.upload_dir = tempfile.mkdtemp()
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.addCleanup(app.config.pop, 'EXTRACTION_WORKERS', None)
+
+        # No app context is kept pushed, so each request loads its own user
+        with app.app_context():
+            db.create_all()
+            patient = self.make_user('pat', full_name='Pat Ient')
+            self.make_user('doc', role='doctor', full_name='Doc Tor')
+            reports = [
+                MedicalReport(patient_id=patient.id, disease_name=disease, description="d",
+                              file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf",
+                              upload_date=upload_date)
+                for disease, upload_date in [("Type 2 Diabetes", datetime(2023, 3, 5)),
+                                             ("Asthma", datetime(2023, 11, 20)),
+                                             ("Type 2 Diabetes", datetime(2024, 2, 1))]
+            ]
+            db.session.add_all(reports)
+            db.session.flush()
+            add_reports(reports)
+            db.session.commit()
+            self.patient_id = patient.id
+
+        self.patient = self.client_for(self.patient_id)
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def ask(self, query):
+        response = self.patient.post('/patient_chatbot', json={'query': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json['response']
+
+    def stored_summary(self):
+        with app.app_context():
+            return db.session.get(PatientSummary, self.patient_id).data
+
+    def test_answers_from_summary(self):
+        answer = self.ask("Show my reports")
+        self.assertIn("You have 3 medical reports", answer)
+        # Newest first
+        self.assertLess(answer.index("February 01, 2024"), answer.index("March 05, 2023"))
+
+        self.assertEqual(self.ask("latest diabetes report"),
+                         "Your latest **Type 2 Diabetes** report was uploaded on February 01, 2024.")
+        self.assertIn("You have 2 medical reports in 2023", self.ask("reports in 2023"))
+        self.assertIn("You have 1 asthma report between November 01, 2023 and November 30, 2023",
+                      self.ask("my asthma reports between 2023-11-01 and 2023-11-30"))
+        self.assertEqual(self.ask("Which doctors have access?"),
+                         "No doctors have access to your reports. You can grant access from your dashboard.")
+
+        # Repeat questions reuse the decoded summary: one version lookup
+        with self.max_queries(1):
+            self.ask("Show my reports")
+
+    def test_write_routes_keep_summary_current(self):
+        self.patient.post('/grant_access', data={'doctor_email': 'doc@example.com'})
+        self.assertIn("Dr. Doc Tor (since", self.ask("who has access to my records"))
+
+        self.patient.post('/upload_report', data={
+            'disease_name': 'Migraine',
+            'description': 'Neurology visit',
+            'file': (io.BytesIO(b'%PDF-1.4'), 'migraine.pdf')
+        }, content_type='multipart/form-data')
+        self.assertIn("Your latest report is **Migraine**", self.ask("my most recent upload"))
+
+        with app.app_context():
+            access_id = DoctorAccess.query.filter_by(patient_id=self.patient_id).one().id
+        self.patient.post(f'/revoke_access/{access_id}')
+        self.assertIn("No doctors have access", self.ask("which doctors can see my reports"))
+
+        # What the writes maintained equals a rebuild from the tables
+        maintained = self.stored_summary()
+        with app.app_context():
+            rebuild_patient_summaries()
+            db.session.commit()
+        self.assertEqual(self.stored_summary(), maintained)
+
+    def test_patients_only(self):
+        with app.app_context():
+            doctor_id = User.query.filter_by(role='doctor').one().id
+        response = self.client_for(doctor_id).post('/patient_chatbot', json={'query': 'my reports'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.patient.post('/patient_chatbot', json={}).status_code, 400)
+
+    def test_summary_without_row_is_empty(self):
+        with app.app_context():
+            other = self.make_user('new', full_name='New Patient')
+            db.session.commit()
+            self.assertEqual(get_patient_summary(other.id).reports, [])
+
+
+class TestDateRanges(unittest.TestCase):
+    now = datetime(2024, 5, 15, 9, 30)
+
+    def test_ranges(self):
+        cases = {
+            "between 2024-01-01 and 2024-03-31": (datetime(2024, 1, 1), datetime(2024, 4, 1)),
+            "since 2024-02-01": (datetime(2024, 2, 1), None),
+            "before 2024-02-01": (None, datetime(2024, 2, 1)),
+            "from the last 3 months": (datetime(2024, 2, 15, 9, 30), None),
+            "in the last 7 days": (datetime(2024, 5, 9), None),
+            "this year": (datetime(2024, 1, 1), None),
+            "in march 2023": (datetime(2023, 3, 1), datetime(2023, 4, 1)),
+            # Without a year, the most recent such month
+            "in december": (datetime(2023, 12, 1), datetime(2024, 1, 1)),
+            "during 2022": (datetime(2022, 1, 1), datetime(2023, 1, 1)),
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(parse_date_range(query, self.now)[:2], expected)
+
+    def test_no_range(self):
+        self.assertIsNone(parse_date_range("show my reports", self.now))
+        self.assertIsNone(parse_date_range("latest report", self.now))
+        self.assertIsNone(parse_date_range("between 2024-13-01 and 2024-14-01", self.now))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import docx
+import fitz
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, ReportExtraction
+from report_processing import queue_report_extraction, submit_report_extraction
+from text_extraction import extract_text
+
+
+def make_pdf(text):
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+class TestTextExtraction(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_pdf_text_layer(self):
+        path = os.path.join(self.directory, 'report.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf("HbA1c 7.2% diabetes follow-up"))
+        self.assertIn("HbA1c 7.2% diabetes follow-up", extract_text(path, 'pdf'))
+
+    def test_docx_paragraphs(self):
+        path = os.path.join(self.directory, 'report.docx')
+        document = docx.Document()
+        document.add_paragraph("Blood pressure 150/95")
+        document.save(path)
+        self.assertEqual(extract_text(path, 'docx'), "Blood pressure 150/95")
+
+    def test_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            extract_text(os.path.join(self.directory, 'report.doc'), 'doc')
+
+
+@pytest.mark.usefixtures('factories')
+class TestReportProcessing(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        self.original_config = {key: app.config.get(key) for key in ('UPLOAD_FOLDER', 'EXTRACTION_WORKERS')}
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        db.session.commit()
+
+    def tearDown(self):
+        for key, value in self.original_config.items():
+            if value is None:
+                app.config.pop(key, None)
+            else:
+                app.config[key] = value
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_upload_extracts_text(self):
+        app.config['EXTRACTION_WORKERS'] = 0
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.patient.id)
+
+        client.post('/upload_report', data={
+            'disease_name': 'Diabetes',
+            'description': 'Quarterly labs',
+            'file': (io.BytesIO(make_pdf("Fasting glucose 130 mg/dL")), 'labs.pdf')
+        }, content_type='multipart/form-data')
+
+        report = MedicalReport.query.filter_by(patient_id=self.patient.id).one()
+        response = client.get(f'/api/reports/{report.id}/extraction')
+        self.assertEqual(response.json['status'], 'done')
+        self.assertIn("Fasting glucose 130 mg/dL", response.json['text'])
+
+    def test_process_pool_stores_result(self):
+        app.config['EXTRACTION_WORKERS'] = 1
+        path = os.path.join(self.upload_dir, 'scan.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf("Chest X-ray clear"))
+
+        report = MedicalReport(patient_id=self.patient.id, disease_name="Pneumonia", description="X-ray",
+                               file_path=path, file_name="scan.pdf", file_type="pdf")
+        db.session.add(report)
+        queue_report_extraction(report)
+        db.session.commit()
+
+        submit_report_extraction(report).result(timeout=60)
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            db.session.expire_all()
+            if db.session.get(ReportExtraction, report.id).status != 'pending':
+                break
+            time.sleep(0.05)
+
+        extraction = db.session.get(ReportExtraction, report.id)
+        self.assertEqual(extraction.status, 'done')
+        self.assertIn("Chest X-ray clear", extraction.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
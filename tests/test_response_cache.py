@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import chatbot
+from response_cache import (ResponseCache, MemoryResponseCache, SQLiteResponseCache, make_cache_key,
+                            set_response_cache)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_normalizes_query(self):
+        key = make_cache_key("What is  Hypertension?", 'doctor', 'prompt', 'model')
+        self.assertEqual(key, make_cache_key("what is hypertension", 'doctor', 'prompt', 'model'))
+        self.assertNotEqual(key, make_cache_key("what is hypertension", 'patient', 'prompt', 'model'))
+
+    def test_memory_lru_eviction_and_ttl(self):
+        cache = MemoryResponseCache(max_entries=2, ttl=60)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), '1')
+
+        with mock.patch('response_cache.time.time', return_value=10 ** 12):
+            self.assertIsNone(cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 2, 1))
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class NoClear(ResponseCache):
+            backend = 'broken'
+
+            def __len__(self):
+                return 0
+
+            def _get(self, key):
+                return None
+
+            def _set(self, key, value):
+                return 0
+
+        with self.assertRaises(TypeError):
+            NoClear()
+
+    def test_sqlite_cache_shared_between_instances(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'cache.db')
+
+        writer = SQLiteResponseCache(path, max_entries=2, ttl=60)
+        reader = SQLiteResponseCache(path, max_entries=2, ttl=60)
+        writer.set('a', '1')
+        self.assertEqual(reader.get('a'), '1')
+
+        writer.set('b', '2')
+        writer.set('c', '3')
+        self.assertEqual(len(reader), 2)
+        self.assertIsNone(reader.get('a'))
+
+    def test_llm_call_served_from_cache(self):
+        set_response_cache(MemoryResponseCache())
+        self.addCleanup(set_response_cache, None)
+
+        response = mock.Mock()
+        response.json.return_value = {'choices': [{'message': {'content': 'High blood pressure.'}}]}
+        session = mock.Mock()
+        session.post.return_value = response
+
+        with mock.patch.dict(os.environ, {'GROQ_API_KEY': 'test-key'}), \
+                mock.patch('chatbot.get_http_session', return_value=session):
+            first = chatbot.call_groq_llama3("what is hypertension", 'doctor')
+            second = chatbot.call_groq_llama3("What is hypertension?", 'doctor')
+
+        self.assertEqual(first, second)
+        self.assertEqual(session.post.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
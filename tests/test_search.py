@@ -0,0 +1,73 @@
+import unittest
+import pytest
+from app import db
+from main import app
+from models import MedicalReport, ReportExtraction
+from search import ensure_search_index, search_reports, build_match_query
+
+
+@pytest.mark.usefixtures('factories')
+class TestReportSearch(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        ensure_search_index()
+
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.make_grant(self.alice, self.doctor)
+
+        self.kidney = self.make_report(self.alice, "Kidney Stones", "Ultrasound shows a 4mm stone")
+        self.labs = self.make_report(self.alice, "Annual Checkup", "Routine labs, mild kidney concern")
+        self.bob_report = self.make_report(self.bob, "Kidney Infection", "Antibiotics prescribed")
+        db.session.add_all([self.kidney, self.labs, self.bob_report])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_report(self, patient, disease, description):
+        return MedicalReport(patient_id=patient.id, disease_name=disease, description=description,
+                             file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf")
+
+    def test_match_query_is_sanitized(self):
+        self.assertEqual(build_match_query('kidney "stone" OR'), '"kidney" "stone" "or"*')
+        self.assertEqual(build_match_query('*** ()'), '')
+
+    def test_doctor_search_is_scoped_and_ranked(self):
+        results = search_reports(self.doctor, "kidney")
+        self.assertEqual(results['total'], 2)
+        # Disease name hits outrank description hits; Bob never granted access
+        self.assertEqual([r['id'] for r in results['results']], [self.kidney.id, self.labs.id])
+
+    def test_patient_searches_own_reports(self):
+        results = search_reports(self.bob, "kidn")
+        self.assertEqual([r['id'] for r in results['results']], [self.bob_report.id])
+
+    def test_extracted_text_is_indexed(self):
+        db.session.add(ReportExtraction(report_id=self.labs.id, status='done', text="Creatinine 1.4 mg/dL"))
+        db.session.commit()
+        results = search_reports(self.doctor, "creatinine")
+        self.assertEqual([r['id'] for r in results['results']], [self.labs.id])
+        self.assertIn('[Creatinine]', results['results'][0]['snippet'])
+
+    def test_search_api_paginates(self):
+        client = self.client_for(self.doctor)
+        response = client.get('/api/search?q=kidney&per_page=1&page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['total'], 2)
+        self.assertEqual([r['id'] for r in response.json['results']], [self.labs.id])
+        self.assertEqual(response.json['results'][0]['upload_date'], self.labs.upload_date.isoformat())
+
+        # Past the last page there are no results, but the total is still reported
+        response = client.get('/api/search?q=kidney&per_page=1&page=3')
+        self.assertEqual((response.json['total'], response.json['results']), (2, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from main import app
+from models import User, MedicalReport
+from data_access import bump_data_versions, rebuild_disease_counts
+from sql_profiler import capture_queries, normalize_statement
+from patient_index import clear_index_cache
+from analytics import clear_analytics_cache
+
+
+@pytest.mark.usefixtures('factories')
+class TestSqlProfiler(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def use_max_queries(self, max_queries):
+        self.max_queries = max_queries
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        clear_index_cache()
+        clear_analytics_cache()
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        db.session.commit()
+        self.client = self.client_for(self.doctor)
+
+    def tearDown(self):
+        app.config['SQL_PROFILING'] = False
+        clear_index_cache()
+        clear_analytics_cache()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_patients(self, count):
+        start = User.query.count()
+        for i in range(start, start + count):
+            patient = self.make_user(f'p{i}', full_name=f'Patient {i}')
+            self.make_grant(patient, self.doctor)
+            for disease in ("Diabetes", "Asthma"):
+                db.session.add(MedicalReport(patient_id=patient.id, disease_name=disease, description="d",
+                                             file_path="uploads/r.pdf", file_name="r.pdf", file_type="pdf"))
+        rebuild_disease_counts()
+        bump_data_versions([self.doctor.id])
+        db.session.commit()
+
+    def test_normalize_statement(self):
+        self.assertEqual(normalize_statement("SELECT * FROM t WHERE id = 3 AND name = 'O''Neil'"),
+                         "SELECT * FROM t WHERE id = ? AND name = ?")
+        self.assertEqual(normalize_statement("SELECT * FROM t\n WHERE id IN (?, ?, ?)"),
+                         "SELECT * FROM t WHERE id IN (?)")
+
+    def test_flags_repeated_statements(self):
+        self.add_patients(6)
+        with capture_queries() as log:
+            for patient in User.query.filter_by(role='patient').all():
+                MedicalReport.query.filter_by(patient_id=patient.id).all()
+        repeated = log.repeated(threshold=5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][1], 6)
+        self.assertIn('FROM medical_report', repeated[0][0])
+
+    def test_failed_statement_is_not_logged(self):
+        with db.engine.connect() as conn, capture_queries() as log:
+            with self.assertRaises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.execute(text('SELECT 1'))
+            self.assertEqual(conn.info, {})
+        self.assertEqual([statement for statement, _ in log.statements], ['SELECT 1'])
+
+    def test_profile_header_and_log(self):
+        app.config['SQL_PROFILING'] = True
+        with self.assertLogs(app.logger, level='INFO') as logs:
+            response = self.client.get('/api/analytics')
+        self.assertRegex(response.headers['X-SQL-Profile'], r'^queries=\d+; time=[\d.]+ms; repeated=0$')
+        self.assertTrue(any('SQL analytics_api:' in line for line in logs.output))
+
+        app.config['SQL_PROFILING'] = False
+        self.assertNotIn('X-SQL-Profile', self.client.get('/api/analytics').headers)
+
+    def test_query_counts_do_not_grow_with_patients(self):
+        requests = [
+            # First render after a data change; repeat views are covered in test_page_cache
+            ('get', '/doctor_dashboard', {}, 7),
+            ('post', '/chatbot', {'json': {'query': 'show patients with diabetes'}}, 3),
+            ('get', '/api/analytics', {}, 2),
+            ('get', '/api/analytics/trends', {}, 2),
+            ('get', '/api/patients', {}, 3),
+        ]
+        for patients in (3, 12):
+            self.add_patients(patients)
+            for method, url, kwargs, budget in requests:
+                with self.subTest(url=url, patients=patients), self.max_queries(budget):
+                    self.assertEqual(getattr(self.client, method)(url, **kwargs).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
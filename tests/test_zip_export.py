@@ -0,0 +1,106 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from app import db
+from main import app
+from models import MedicalReport
+from data_access import bump_data_versions
+from zip_export import stream_record_zip, CHUNK_SIZE
+
+
+@pytest.mark.usefixtures('factories')
+class TestZipExport(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        original_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.addCleanup(app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.patient = self.make_user('pat', full_name='Pat Ient')
+        self.doctor = self.make_user('doc', role='doctor', full_name='Doc Tor')
+        db.session.commit()
+
+        self.files = {'a_scan.pdf': b'%PDF-1.4 ' + os.urandom(5000), 'b_notes.doc': b'notes ' * 2000}
+        for name, content in self.files.items():
+            with open(os.path.join(self.upload_dir, name), 'wb') as f:
+                f.write(content)
+        db.session.add_all([
+            MedicalReport(patient_id=self.patient.id, disease_name="Flu", description="Scan",
+                          file_path="uploads/a_scan.pdf", file_name="scan.pdf", file_type="pdf",
+                          upload_date=datetime(2024, 1, 1)),
+            MedicalReport(patient_id=self.patient.id, disease_name="Flu", description="Notes",
+                          file_path="uploads/b_notes.doc", file_name="notes.doc", file_type="doc",
+                          upload_date=datetime(2024, 1, 2)),
+            MedicalReport(patient_id=self.patient.id, disease_name="Flu", description="Lost",
+                          file_path="uploads/gone.pdf", file_name="gone.pdf", file_type="pdf",
+                          upload_date=datetime(2024, 1, 3)),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_patient_export_contains_files_and_manifest(self):
+        response = self.client_for(self.patient).get(f'/export/{self.patient.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/zip')
+        self.assertTrue(response.is_streamed)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            self.assertIsNone(archive.testzip())
+            pdf = archive.getinfo('reports/1_scan.pdf')
+            doc = archive.getinfo('reports/2_notes.doc')
+            self.assertEqual(pdf.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(doc.compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.read(pdf), self.files['a_scan.pdf'])
+            self.assertEqual(archive.read(doc), self.files['b_notes.doc'])
+
+            manifest = json.loads(archive.read('manifest.json'))['reports']
+            self.assertEqual([r['description'] for r in manifest], ['Scan', 'Notes', 'Lost'])
+            self.assertEqual([r['missing'] for r in manifest], [False, False, True])
+            self.assertIn('scan.pdf', archive.read('manifest.csv').decode())
+
+    def test_doctor_needs_access(self):
+        client = self.client_for(self.doctor)
+        self.assertEqual(client.get(f'/export/{self.patient.id}').status_code, 302)
+
+        self.make_grant(self.patient, self.doctor)
+        bump_data_versions([self.doctor.id])
+        db.session.commit()
+        response = client.get(f'/export/{self.patient.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(response.data)).namelist()), 4)
+
+    def test_large_file_streams_in_bounded_chunks(self):
+        path = os.path.join(self.upload_dir, 'big_scan.jpg')
+        with open(path, 'wb') as f:
+            f.truncate(32 * 1024 * 1024)
+        report = SimpleNamespace(id=9, disease_name="X", description="Big", file_path=path, file_name="big.jpg",
+                                 file_type="jpg", upload_date=datetime(2024, 1, 1))
+
+        total = 0
+        largest = 0
+        for chunk in stream_record_zip([report], self.upload_dir):
+            total += len(chunk)
+            largest = max(largest, len(chunk))
+        self.assertGreater(total, 32 * 1024 * 1024)
+        self.assertLessEqual(largest, CHUNK_SIZE + 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Text extraction for uploaded reports. Runs inside worker processes, so this module
+must not import the Flask app; the heavy document libraries are imported on use.
+"""
+import io
+
+OCR_DPI = 200
+IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif'}
+
+
+def ocr_image(image) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(image)
+
+
+def extract_pdf_text(file_path: str) -> str:
+    """Use each page's text layer, falling back to OCR only for pages that have none."""
+    import fitz
+    from PIL import Image
+
+    pages = []
+    with fitz.open(file_path) as document:
+        for page in document:
+            text = page.get_text().strip()
+            if not text:
+                pixmap = page.get_pixmap(dpi=OCR_DPI)
+                text = ocr_image(Image.open(io.BytesIO(pixmap.tobytes('png')))).strip()
+            pages.append(text)
+    return '\n\n'.join(page for page in pages if page)
+
+
+def extract_docx_text(file_path: str) -> str:
+    import docx
+
+    document = docx.Document(file_path)
+    paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            paragraphs.append('\t'.join(cell.text for cell in row.cells))
+    return '\n'.join(paragraphs)
+
+
+def extract_image_text(file_path: str) -> str:
+    from PIL import Image
+
+    with Image.open(file_path) as image:
+        return ocr_image(image).strip()
+
+
+def extract_text(file_path: str, file_type: str) -> str:
+    """Extract plain text from a report file. Raises ValueError for unsupported types."""
+    file_type = file_type.lower()
+    if file_type == 'pdf':
+        return extract_pdf_text(file_path)
+    if file_type == 'docx':
+        return extract_docx_text(file_path)
+    if file_type in IMAGE_TYPES:
+        return extract_image_text(file_path)
+    raise ValueError(f"Text extraction is not supported for .{file_type} files")
@@ -0,0 +1,129 @@
+"""
+Streaming ZIP export of a patient's record.
+
+The archive is produced by zipfile writing into an unseekable sink, so every entry uses a
+data descriptor and the bytes can be handed to the client as soon as they are written.
+Files are read in fixed-size chunks and the sink is drained after each one, keeping memory
+constant however large the archive grows; ZIP64 records are used when it passes 4 GiB.
+"""
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, List
+
+CHUNK_SIZE = 64 * 1024
+
+# Already compressed: deflating them again costs CPU for no gain (DOCX is itself a ZIP)
+STORED_TYPES = {'pdf', 'jpg', 'jpeg', 'png', 'gif', 'docx'}
+
+MANIFEST_FIELDS = ('id', 'disease_name', 'description', 'file_name', 'file_type', 'upload_date', 'archive_path',
+                   'missing')
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, unseekable file object that collects bytes until they are drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile records entry offsets through tell(); seeking stays unsupported
+        return self._position
+
+    @property
+    def pending(self) -> int:
+        return len(self._chunks)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname: str, timestamp: float, compress_type: int, size: int = 0) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(timestamp, 315532800))[:6])
+    info.compress_type = compress_type
+    info.file_size = size
+    info.external_attr = 0o600 << 16
+    return info
+
+
+def archive_path(report) -> str:
+    return f"reports/{report.id}_{report.file_name}"
+
+
+def build_manifest(reports, missing_ids) -> Iterator[tuple]:
+    """(arcname, bytes) for the JSON and CSV manifests describing every report."""
+    rows = []
+    for report in reports:
+        rows.append({
+            'id': report.id,
+            'disease_name': report.disease_name,
+            'description': report.description,
+            'file_name': report.file_name,
+            'file_type': report.file_type,
+            'upload_date': report.upload_date.isoformat() if report.upload_date else None,
+            'archive_path': None if report.id in missing_ids else archive_path(report),
+            'missing': report.id in missing_ids
+        })
+    yield 'manifest.json', json.dumps({'reports': rows}, indent=2).encode('utf-8')
+
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=MANIFEST_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    yield 'manifest.csv', text.getvalue().encode('utf-8')
+
+
+def stream_record_zip(reports: Iterable, upload_folder: str) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of the given reports' files plus manifest.json and manifest.csv.
+
+    reports only needs the MedicalReport metadata columns; files are opened one at a time
+    from upload_folder. Files missing on disk are left out and flagged in the manifest.
+    """
+    reports = list(reports)
+    sink = _StreamSink()
+    missing_ids = set()
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for report in reports:
+            path = os.path.join(upload_folder, os.path.basename(report.file_path))
+            try:
+                source = open(path, 'rb')
+            except OSError:
+                missing_ids.add(report.id)
+                continue
+            with source:
+                stat = os.fstat(source.fileno())
+                compress_type = zipfile.ZIP_STORED if report.file_type in STORED_TYPES else zipfile.ZIP_DEFLATED
+                info = _zip_info(archive_path(report), stat.st_mtime, compress_type, stat.st_size)
+                with archive.open(info, mode='w', force_zip64=stat.st_size > zipfile.ZIP64_LIMIT) as entry:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        if sink.pending:
+                            yield sink.drain()
+            # The entry's data descriptor is written when it closes
+            yield sink.drain()
+
+        for arcname, data in build_manifest(reports, missing_ids):
+            archive.writestr(_zip_info(arcname, time.time(), zipfile.ZIP_DEFLATED), data)
+            yield sink.drain()
+    # Central directory, written when the archive closes
+    yield sink.drain()